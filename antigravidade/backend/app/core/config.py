@@ -27,13 +27,86 @@ class Settings:
     AIDO_INPUT_DIR: Path = Path(os.getenv("AIDO_INPUT_DIR", BASE_DIR / "data" / "input"))
     AIDO_OUTPUT_DIR: Path = Path(os.getenv("AIDO_OUTPUT_DIR", BASE_DIR / "data" / "output"))
     AIDO_TEMPLATES_DIR: Path = Path(os.getenv("AIDO_TEMPLATES_DIR", BASE_DIR / "templates"))
+
+    # Runtime data served by the API (uploads, transcripts, manuals and caches)
+    DATA_DIR: Path = Path(os.getenv("AIDO_DATA_DIR", PROJECT_ROOT / "data"))
+    TRANSCRIPT_CACHE_DIR: Path = Path(os.getenv("AIDO_TRANSCRIPT_CACHE_DIR", DATA_DIR / "saida" / "cache" / "txt"))
+    TRANSCRIPT_CACHE_MAX_MB: int = int(os.getenv("AIDO_TRANSCRIPT_CACHE_MAX_MB", "512"))
+    # Partial transcriptions, so a failed or interrupted decode resumes instead of restarting
+    TRANSCRIPTION_CHECKPOINT_DIR: Path = Path(os.getenv("AIDO_TRANSCRIPTION_CHECKPOINT_DIR", DATA_DIR / "saida" / "cache" / "checkpoints"))
+    # ffprobe results of uploads, by content hash
+    MEDIA_PROBE_CACHE_DIR: Path = Path(os.getenv("AIDO_MEDIA_PROBE_CACHE_DIR", DATA_DIR / "saida" / "cache" / "probe"))
+    # Observed transcription and LLM throughput, used by /pipeline/estimate
+    THROUGHPUT_HISTORY_PATH: Path = Path(os.getenv("AIDO_THROUGHPUT_HISTORY_PATH", DATA_DIR / "saida" / "cache" / "throughput.json"))
+    # Outputs of the LLM stages, reused when a stage sees the same input again
+    LLM_CACHE_DIR: Path = Path(os.getenv("AIDO_LLM_CACHE_DIR", DATA_DIR / "saida" / "cache" / "llm"))
+    LLM_CACHE_MAX_MB: int = int(os.getenv("AIDO_LLM_CACHE_MAX_MB", "256"))
+    LLM_CACHE_TTL_HOURS: float = float(os.getenv("AIDO_LLM_CACHE_TTL_HOURS", "168"))
+    # gzip/brotli copies of text artifacts served under /data
+    ARTIFACT_VARIANT_CACHE_DIR: Path = Path(os.getenv("AIDO_ARTIFACT_VARIANT_CACHE_DIR", DATA_DIR / "saida" / "cache" / "compressed"))
+    ARTIFACT_VARIANT_CACHE_MAX_MB: int = int(os.getenv("AIDO_ARTIFACT_VARIANT_CACHE_MAX_MB", "128"))
+
+    # Chunked uploads: partial files and session state until an upload is finalized
+    UPLOAD_PARTIAL_DIR: Path = Path(os.getenv("AIDO_UPLOAD_PARTIAL_DIR", DATA_DIR / "uploads"))
+    UPLOAD_CHUNK_MB: int = int(os.getenv("AIDO_UPLOAD_CHUNK_MB", "8"))
+    # Sessions without a chunk for this long are discarded
+    UPLOAD_SESSION_TTL_HOURS: float = float(os.getenv("AIDO_UPLOAD_SESSION_TTL_HOURS", "24"))
+    # New audio between decode passes when transcribing an upload while it arrives
+    INGEST_WINDOW_SECONDS: float = float(os.getenv("AIDO_INGEST_WINDOW_SECONDS", "60"))
     
     # Whisper
     WHISPER_MODEL: str = os.getenv("AIDO_WHISPER_MODEL", "tiny")
     WHISPER_DEVICE: str = os.getenv("AIDO_WHISPER_DEVICE", "cpu")
     WHISPER_COMPUTE: str = os.getenv("AIDO_WHISPER_COMPUTE", "int8")
+    # Default speed/accuracy profile: fast, balanced, accurate or auto
+    WHISPER_PROFILE: str = os.getenv("AIDO_WHISPER_PROFILE", "balanced")
+    TRANSCRIPTION_DEADLINE_SECONDS: float = float(os.getenv("AIDO_TRANSCRIPTION_DEADLINE_SECONDS", "300"))
+    WHISPER_POOL_SIZE: int = int(os.getenv("AIDO_WHISPER_POOL_SIZE", "1"))
+    WHISPER_WARMUP: bool = os.getenv("AIDO_WHISPER_WARMUP", "true").lower() in ("1", "true", "yes")
+
+    # Transcription mode: "single" decodes in one stream, "parallel" splits long media
+    # into overlapping windows transcribed by a pool of worker processes, and "batched"
+    # groups concurrent jobs into shared batched-inference calls.
+    TRANSCRIPTION_MODE: str = os.getenv("AIDO_TRANSCRIPTION_MODE", "single")
+    TRANSCRIPTION_WORKERS: int = int(os.getenv("AIDO_TRANSCRIPTION_WORKERS", str(max(1, (os.cpu_count() or 2) // 4))))
+    PARALLEL_WINDOW_SECONDS: float = float(os.getenv("AIDO_PARALLEL_WINDOW_SECONDS", "120"))
+    PARALLEL_OVERLAP_SECONDS: float = float(os.getenv("AIDO_PARALLEL_OVERLAP_SECONDS", "4"))
+    PARALLEL_MIN_DURATION_SECONDS: float = float(os.getenv("AIDO_PARALLEL_MIN_DURATION_SECONDS", "300"))
+    TRANSCRIPTION_BATCH_SIZE: int = int(os.getenv("AIDO_TRANSCRIPTION_BATCH_SIZE", "8"))
+    TRANSCRIPTION_BATCH_MAX_WAIT_MS: int = int(os.getenv("AIDO_TRANSCRIPTION_BATCH_MAX_WAIT_MS", "250"))
+
+    # Voice-activity pre-pass used by profiles with VAD: only speech regions are decoded.
+    VAD_THRESHOLD: float = float(os.getenv("AIDO_VAD_THRESHOLD", "0.5"))
+    VAD_MIN_SPEECH_MS: int = int(os.getenv("AIDO_VAD_MIN_SPEECH_MS", "0"))
+    VAD_MIN_SILENCE_MS: int = int(os.getenv("AIDO_VAD_MIN_SILENCE_MS", "2000"))
+    VAD_SPEECH_PAD_MS: int = int(os.getenv("AIDO_VAD_SPEECH_PAD_MS", "400"))
+
+    # Out-of-process transcription: web workers hand jobs to one daemon that owns the models.
+    TRANSCRIPTION_DAEMON: bool = os.getenv("AIDO_TRANSCRIPTION_DAEMON", "false").lower() in ("1", "true", "yes")
+    TRANSCRIPTION_DAEMON_ADDRESS: str = os.getenv(
+        "AIDO_TRANSCRIPTION_DAEMON_ADDRESS",
+        r"\\.\pipe\aido-transcription" if os.name == "nt" else str(DATA_DIR / "run" / "transcription.sock"),
+    )
+    TRANSCRIPTION_DAEMON_AUTHKEY: str = os.getenv("AIDO_TRANSCRIPTION_DAEMON_AUTHKEY", "")
+    # Without an explicit key, one is generated here (owner-only) and shared by the daemon and the workers.
+    TRANSCRIPTION_DAEMON_AUTHKEY_FILE: Path = Path(os.getenv("AIDO_TRANSCRIPTION_DAEMON_AUTHKEY_FILE", DATA_DIR / "run" / "transcription.key"))
+    # Jobs accepted at once; further jobs are rejected as busy and retried by the caller.
+    TRANSCRIPTION_DAEMON_MAX_JOBS: int = int(os.getenv("AIDO_TRANSCRIPTION_DAEMON_MAX_JOBS", "4"))
     
     # Google
     GOOGLE_API_KEY: str = os.getenv("GOOGLE_API_KEY")
+    # LLM stage text is streamed to /pipeline/run clients at most this often
+    STAGE_DELTA_INTERVAL_MS: int = int(os.getenv("AIDO_STAGE_DELTA_INTERVAL_MS", "150"))
+    # Texts longer than this are structured in chunks of about STRUCTURING_CHUNK_CHARS,
+    # STRUCTURING_CONCURRENCY at a time, and the partial outlines merged in one more call.
+    STRUCTURING_MAP_REDUCE_MIN_CHARS: int = int(os.getenv("AIDO_STRUCTURING_MAP_REDUCE_MIN_CHARS", "24000"))
+    STRUCTURING_CHUNK_CHARS: int = int(os.getenv("AIDO_STRUCTURING_CHUNK_CHARS", "12000"))
+    STRUCTURING_CONCURRENCY: int = int(os.getenv("AIDO_STRUCTURING_CONCURRENCY", "4"))
+    # Gemini quota shared by every pipeline of the process (defaults: gemini-2.5-flash, tier 1).
+    # Calls queue for it; a 429 pauses them all and is retried up to GEMINI_RATE_LIMIT_RETRIES times.
+    GEMINI_REQUESTS_PER_MINUTE: int = int(os.getenv("AIDO_GEMINI_REQUESTS_PER_MINUTE", "1000"))
+    GEMINI_TOKENS_PER_MINUTE: int = int(os.getenv("AIDO_GEMINI_TOKENS_PER_MINUTE", "1000000"))
+    GEMINI_RATE_LIMIT_RETRIES: int = int(os.getenv("AIDO_GEMINI_RATE_LIMIT_RETRIES", "4"))
+    GEMINI_BACKOFF_MAX_SECONDS: float = float(os.getenv("AIDO_GEMINI_BACKOFF_MAX_SECONDS", "60"))
 
 settings = Settings()
@@ -1,32 +1,258 @@
 import asyncio
 import os
-from faster_whisper import WhisperModel
+import threading
+import time
+from types import SimpleNamespace
+from typing import AsyncIterator, Callable, Optional
 
-# Define base paths relative to this file
-# File is in: backend/app/create/subagents/transcription/tools/
-# Project root (antigravidade) is 6 levels up
-current_dir = os.path.dirname(os.path.abspath(__file__))
-project_root = os.path.abspath(os.path.join(current_dir, "../../../../../../"))
-data_dir = os.path.join(project_root, "data")
+from app.core.config import settings
+from app.services.audio_extraction import SAMPLE_RATE, extract_audio, load_audio
+from app.services.cost_estimator import throughput_history
+from app.services.media_hash import file_sha256
+from app.services.media_probe import get_media_info
+from app.services.parallel_transcription import transcribe_parallel
+from app.services.speech_detection import SpeechPlan, detect_speech, vad_signature, vad_stats
+from app.services.streaming_ingest import ingest_jobs
+from app.services.transcription_checkpoint import TranscriptionCheckpoint, resume_prompt
+from app.services.transcription_daemon import transcribe_remote
+from app.services.transcription_profiles import TranscriptionProfile, UnknownProfileError, resolve_profile
+from app.services.transcription_scheduler import transcription_scheduler
+from app.services.segment_store import SegmentStoreBuilder
+from app.services.single_flight import flight_key, transcription_flights
+from app.services.transcript_cache import (
+    link_media_transcript,
+    transcript_cache,
+    transcript_cache_key,
+    transcript_segments_key,
+)
+from app.services.whisper_pool import whisper_pool
 
-TRANSCRIPTION_CACHE_DIR = os.path.join(data_dir, "saida", "txt")
-os.makedirs(TRANSCRIPTION_CACHE_DIR, exist_ok=True)
+# Runtime data directory (AIDO_DATA_DIR); only media under its `entrada` folder is transcribed.
+data_dir = str(settings.DATA_DIR)
 
+SegmentCallback = Callable[[dict], None]
 
-def _run_transcription_sync(video_path: str) -> tuple:
-    model = WhisperModel("tiny", device="cpu", compute_type="int8")
-    segments, info = model.transcribe(video_path, beam_size=5)
-    return segments, info
+# Whisper decodes 30 s windows; the feature frames at the end of one look a few
+# samples past it, so a window is complete once this much more audio is there.
+WHISPER_WINDOW_SECONDS = 30.0
+WINDOW_LOOKAHEAD_SECONDS = 0.1
 
 
-async def transcribe_video(video_path: str) -> str:
-    print(f"--- TOOL: Requesting transcription for {video_path} ---")
+def is_allowed_media_path(path: str) -> bool:
+    """Whether `path` is inside the upload directory, the only media the tool may read."""
+    # Normalize case for Windows comparison
+    allowed_directory = os.path.normcase(os.path.abspath(os.path.join(data_dir, "entrada")))
+    media_path = os.path.normcase(os.path.abspath(path))
+    return media_path.startswith(allowed_directory + os.sep)
 
-    allowed_directory = os.path.join(data_dir, "entrada")
-    video_abs_path = os.path.abspath(video_path)
+# Transcriptions currently decoding in this process; `auto` profiles treat them as CPU load.
+_active_transcriptions = 0
 
-    # Normalize case for Windows comparison
-    if not os.path.normcase(video_abs_path).startswith(os.path.normcase(allowed_directory)):
+
+def profile_cache_key(media_hash: str, profile: TranscriptionProfile) -> str:
+    return transcript_cache_key(
+        media_hash, profile.model_size, profile.beam_size,
+        vad=vad_signature() if profile.vad_filter else None,
+    )
+
+
+def _checkpoint_plan(profile: TranscriptionProfile, mode: str) -> dict:
+    plan = {
+        "mode": mode,
+        "model_size": profile.model_size,
+        "compute_type": profile.compute_type,
+        "beam_size": profile.beam_size,
+        "best_of": profile.best_of,
+        "vad": vad_signature() if profile.vad_filter else None,
+    }
+    if mode == "parallel":
+        plan["window_seconds"] = settings.PARALLEL_WINDOW_SECONDS
+        plan["overlap_seconds"] = settings.PARALLEL_OVERLAP_SECONDS
+    return plan
+
+
+def _decode_sequential(
+    audio,
+    profile: TranscriptionProfile,
+    on_segment: Optional[SegmentCallback],
+    checkpoint: Optional[TranscriptionCheckpoint],
+    speech: Optional[SpeechPlan] = None,
+    growing: bool = False,
+) -> tuple:
+    """
+    Decodes a recording in one Whisper stream. With a speech plan, only the
+    speech regions are decoded (laid end to end) and every segment is mapped
+    back to the recording's timeline.
+
+    A `growing` recording is still arriving: only windows the audio fully
+    covers are committed, and the decode stops at the first one it does not.
+    """
+    duration = len(audio) / SAMPLE_RATE
+    if speech is not None:
+        audio = speech.collapse(audio)
+        if not len(audio):
+            return "", SimpleNamespace(language=None, language_probability=0.0, duration=duration, speech_seconds=0.0)
+    decoded_seconds = len(audio) / SAMPLE_RATE
+
+    units = checkpoint.load() if checkpoint is not None else []
+    texts = []
+    options = {}
+    if units:
+        # Replay what was committed, then restart Whisper at the first unfinished
+        # window with the same language and prompt context it had at that point.
+        last = units[-1]
+        print(f"--- TOOL: Resuming transcription at {last['next_offset']:.1f}s from checkpoint ---")
+        for unit in units:
+            for segment in unit["segments"]:
+                texts.append(segment["text"])
+                if on_segment is not None:
+                    on_segment({
+                        "start": segment["start"],
+                        "end": segment["end"],
+                        "text": segment["text"],
+                        "progress": min(segment["end"] / duration, 1.0) if duration else 0.0,
+                    })
+        options = {
+            "clip_timestamps": [last["next_offset"]],
+            "initial_prompt": resume_prompt(units),
+            "language": last["language"],
+        }
+
+    with whisper_pool.acquire(*profile.model_key) as model:
+        segments, info = model.transcribe(
+            audio,
+            beam_size=profile.beam_size,
+            best_of=profile.best_of,
+            vad_filter=False,
+            **options,
+        )
+        language, probability = (
+            (units[-1]["language"], units[-1]["language_probability"]) if units
+            else (info.language, info.language_probability)
+        )
+
+        # Segments are decoded lazily, so consume them while the model is checked out.
+        window = None
+        for segment in segments:
+            # Every segment of a 30 s window carries the window's seek; a new seek
+            # means the previous window is complete and can be committed.
+            if checkpoint is not None:
+                if window is not None and segment.seek != window["seek"]:
+                    window_end = window["seek"] / model.frames_per_second + WHISPER_WINDOW_SECONDS
+                    if growing and window_end + WINDOW_LOOKAHEAD_SECONDS > decoded_seconds:
+                        break
+                    checkpoint.commit({**window, "next_offset": segment.seek / model.frames_per_second})
+                    window = None
+                if window is None:
+                    window = {
+                        "seek": segment.seek,
+                        "temperature": segment.temperature,
+                        "language": language,
+                        "language_probability": probability,
+                        "segments": [],
+                    }
+
+            start, end = segment.start, segment.end
+            if speech is not None:
+                start, end = speech.to_original(start, end)
+            if window is not None:
+                window["segments"].append({"start": start, "end": end, "text": segment.text, "tokens": list(segment.tokens)})
+
+            texts.append(segment.text)
+            if on_segment is not None:
+                on_segment({
+                    "start": start,
+                    "end": end,
+                    "text": segment.text,
+                    "progress": min(end / duration, 1.0) if duration else 0.0,
+                })
+        transcribed_text = "".join(texts).strip()
+    return transcribed_text, SimpleNamespace(
+        language=language,
+        language_probability=probability,
+        duration=duration,
+        speech_seconds=speech.speech_seconds if speech is not None else None,
+    )
+
+
+def _run_transcription_sync(
+    video_path: str,
+    profile: TranscriptionProfile,
+    on_segment: Optional[SegmentCallback] = None,
+    checkpoint_key: Optional[str] = None,
+) -> tuple:
+    # The container is decoded once per upload; retries and every mode reuse the PCM artifact.
+    audio_path = extract_audio(video_path)
+    audio = load_audio(audio_path)
+    if settings.TRANSCRIPTION_MODE == "batched":
+        return transcription_scheduler.transcribe(audio_path, profile, on_segment=on_segment)
+    if settings.TRANSCRIPTION_MODE == "parallel":
+        # Short media gains nothing from the worker pool; decode it in one stream.
+        if len(audio) / SAMPLE_RATE >= settings.PARALLEL_MIN_DURATION_SECONDS:
+            return transcribe_parallel(
+                audio_path,
+                workers=settings.TRANSCRIPTION_WORKERS,
+                window_seconds=settings.PARALLEL_WINDOW_SECONDS,
+                overlap_seconds=settings.PARALLEL_OVERLAP_SECONDS,
+                model_size=profile.model_size,
+                device=profile.device,
+                compute_type=profile.compute_type,
+                beam_size=profile.beam_size,
+                best_of=profile.best_of,
+                vad_filter=profile.vad_filter,
+                on_segment=on_segment,
+                checkpoint=(
+                    TranscriptionCheckpoint.for_key(checkpoint_key, _checkpoint_plan(profile, "parallel"))
+                    if checkpoint_key else None
+                ),
+            )
+
+    # The VAD pre-pass runs here rather than inside Whisper so the decoded (speech only)
+    # timeline is known and deterministic, which keeps VAD decodes resumable too.
+    speech = detect_speech(audio) if profile.vad_filter else None
+    checkpoint = None
+    if checkpoint_key:
+        checkpoint = TranscriptionCheckpoint.for_key(checkpoint_key, _checkpoint_plan(profile, "sequential"))
+    return _decode_sequential(audio, profile, on_segment, checkpoint, speech)
+
+
+def journal_received_audio(
+    audio,
+    profile: TranscriptionProfile,
+    journal_path: str,
+    on_window: Callable[[dict], None],
+) -> None:
+    """
+    Decodes the audio of an upload received so far the way the sequential run of
+    the saved file will (same speech regions, Whisper options and windows) and
+    journals every window it fully covers at `journal_path`. Once that journal
+    is moved to the transcript's checkpoint key, the run resumes after those
+    windows. `on_window` gets each committed unit and may raise to stop.
+
+    Whisper floors the log-mel features relative to the loudest frame it is
+    given, so a much louder passage arriving later could shift near-silent
+    frames of the windows decoded before it; the text is not affected in practice.
+    """
+    speech = None
+    if profile.vad_filter:
+        # A region's padding depends on the next one and the last region may still
+        # grow, so only the regions before the last two found so far are final.
+        found = detect_speech(audio)
+        speech = SpeechPlan(chunks=found.chunks[:-2], duration=found.duration)
+    checkpoint = TranscriptionCheckpoint(journal_path, _checkpoint_plan(profile, "sequential"), on_commit=on_window)
+    _decode_sequential(audio, profile, None, checkpoint, speech, growing=True)
+
+
+async def _transcribe(
+    video_path: str,
+    on_segment: Optional[SegmentCallback] = None,
+    profile_name: Optional[str] = None,
+) -> str:
+    global _active_transcriptions
+
+    print(f"--- TOOL: Requesting transcription for {video_path} ---")
+
+    if not is_allowed_media_path(video_path):
         error_msg = f"Security Error: Path '{video_path}' is outside the allowed directory."
         print(f"--- TOOL ERROR: {error_msg} ---")
         return f"Error: {error_msg}"
@@ -36,31 +262,124 @@ async def transcribe_video(video_path: str) -> str:
         print(f"--- TOOL ERROR: {error_msg} ---")
         return f"Error: {error_msg}"
 
-    video_filename_stem = os.path.splitext(os.path.basename(video_path))[0]
-    cache_filename = f"{video_filename_stem}_transcricao.txt"
-    cache_file_path = os.path.join(TRANSCRIPTION_CACHE_DIR, cache_filename)
+    # An upload decoded while it arrived hands its windows over first, so this
+    # run resumes after them instead of decoding them again.
+    await ingest_jobs.wait_handoff(video_path)
 
-    if os.path.exists(cache_file_path):
-        print(f"--- TOOL: Cache hit! Reading transcription from {cache_file_path} ---")
-        try:
-            with open(cache_file_path, "r", encoding="utf-8") as file:
-                return file.read()
-        except Exception as exc:
-            print(f"--- TOOL WARNING: Could not read cache file. Retranscribing. Error: {exc} ---")
+    # The cache is keyed by the media content and decoding settings, not the file name,
+    # so re-uploads under another name hit and different videos never collide.
+    media_hash = await asyncio.to_thread(file_sha256, video_path)
+
+    try:
+        duration = None
+        if (profile_name or settings.WHISPER_PROFILE).lower() == "auto":
+            media_info = await asyncio.to_thread(get_media_info, video_path, media_hash)
+            duration = media_info["duration"] if media_info else None
+        profile = resolve_profile(profile_name, duration=duration, queue_load=_active_transcriptions + ingest_jobs.active_decodes())
+    except UnknownProfileError as exc:
+        print(f"--- TOOL ERROR: {exc} ---")
+        return f"Error: {exc}"
+    print(f"--- TOOL: Using transcription profile '{profile.name}' ({profile.model_size}, beam {profile.beam_size}) ---")
+
+    cache_key = profile_cache_key(media_hash, profile)
+
+    cached_text = await asyncio.to_thread(transcript_cache.get_text, cache_key)
+    if cached_text is not None:
+        print(f"--- TOOL: Cache hit! Reusing transcription {cache_key[:12]} ---")
+        await asyncio.to_thread(link_media_transcript, media_hash, cache_key)
+        return cached_text
 
     print(f"--- TOOL: No cache found. Initializing transcription with retry logic. ---")
     max_retries = 3
     base_delay = 1
 
+    # Decoded windows are journaled under the cache key, so a retried attempt (or a
+    # run after a server restart) resumes where the last one stopped. It replays
+    # the journaled segments first; only forward those the listener has not seen.
+    emitted_until = -1.0
+
+    def forward_segment(segment: dict) -> None:
+        nonlocal emitted_until
+        if segment["end"] > emitted_until:
+            emitted_until = segment["end"]
+            on_segment(segment)
+
     for attempt in range(max_retries):
+        # Each attempt starts with the checkpointed segments, so it rebuilds the full list.
+        builder = SegmentStoreBuilder()
+
+        def collect_segment(segment: dict, builder=builder) -> None:
+            builder.append(segment)
+            if on_segment is not None:
+                forward_segment(segment)
+
         try:
-            segments, info = await asyncio.to_thread(_run_transcription_sync, video_path)
+            _active_transcriptions += 1
+            started = time.monotonic()
+            try:
+                if settings.TRANSCRIPTION_DAEMON:
+                    # The daemon owns the models; this worker only relays the segments.
+                    transcribed_text, info = await asyncio.to_thread(
+                        transcribe_remote,
+                        video_path,
+                        profile.name,
+                        collect_segment,
+                        cache_key,
+                    )
+                else:
+                    transcribed_text, info = await asyncio.to_thread(
+                        _run_transcription_sync,
+                        video_path,
+                        profile,
+                        collect_segment,
+                        cache_key,
+                    )
+            finally:
+                _active_transcriptions -= 1
+            # Feeds /pipeline/estimate with how fast this profile really runs here.
+            await asyncio.to_thread(
+                throughput_history.record_transcription,
+                profile.name,
+                info.duration,
+                time.monotonic() - started,
+                len(transcribed_text),
+            )
             print(f"--- TOOL: Detected language '{info.language}' with probability {info.language_probability:.2f} ---")
-            transcribed_text = "".join(segment.text for segment in segments).strip()
+            if info.speech_seconds is not None:
+                vad_stats.record(info.duration, info.speech_seconds)
+                print(
+                    f"--- TOOL: VAD kept {info.speech_seconds:.0f}s of speech out of {info.duration:.0f}s "
+                    f"({info.speech_seconds / info.duration if info.duration else 0:.0%}); "
+                    f"skipped {info.duration - info.speech_seconds:.0f}s of silence ---"
+                )
 
-            print(f"--- TOOL: Transcription successful. Saving to cache at {cache_file_path} ---")
-            with open(cache_file_path, "w", encoding="utf-8") as file:
-                file.write(transcribed_text)
+            print(f"--- TOOL: Transcription successful. Saving to cache as {cache_key[:12]} ---")
+            await asyncio.to_thread(
+                transcript_cache.put_text,
+                cache_key,
+                transcribed_text,
+                {
+                    "media_hash": media_hash,
+                    "profile": profile.name,
+                    "model_size": profile.model_size,
+                    "beam_size": profile.beam_size,
+                    "language": info.language,
+                    "duration": info.duration,
+                    "speech_seconds": info.speech_seconds,
+                    "source": os.path.basename(video_path),
+                },
+            )
+            # Timed segments are kept beside the text for subtitles and time lookups.
+            await asyncio.to_thread(
+                transcript_cache.put,
+                transcript_segments_key(cache_key),
+                builder.build().to_bytes(),
+                {"media_hash": media_hash, "profile": profile.name, "segments": len(builder)},
+            )
+            # Exports look transcripts up by media, whatever profile produced them.
+            await asyncio.to_thread(link_media_transcript, media_hash, cache_key)
+            # The transcript is cached now; the partial progress is no longer needed.
+            await asyncio.to_thread(TranscriptionCheckpoint.for_key(cache_key, {}).discard)
 
             return transcribed_text
 
@@ -74,3 +393,67 @@ async def transcribe_video(video_path: str) -> str:
             delay = base_delay * (2**attempt)
             print(f"--- TOOL: Retrying in {delay} seconds... ---")
             await asyncio.sleep(delay)
+
+
+async def transcribe_video(video_path: str) -> str:
+    async for event in transcribe_video_stream(video_path):
+        if event["type"] == "result":
+            return event["text"]
+
+
+def _flight_key(video_path: str, profile_name: Optional[str]) -> Optional[str]:
+    """Identifies a transcription by media content and profile; None for paths `_transcribe` rejects."""
+    video_abs_path = os.path.abspath(video_path)
+    if not is_allowed_media_path(video_abs_path):
+        return None
+    if not os.path.exists(video_abs_path):
+        return None
+    return flight_key(file_sha256(video_abs_path), (profile_name or settings.WHISPER_PROFILE).lower())
+
+
+async def transcribe_video_stream(video_path: str, profile: Optional[str] = None) -> AsyncIterator[dict]:
+    """
+    Transcribes a video while it is being decoded.
+
+    Yields `{"type": "segment", ...}` events with start/end timestamps and the
+    fraction of audio decoded so far, then a single `{"type": "result", "text": ...}`
+    event carrying the same value `transcribe_video` would return.
+
+    Requests for the same media and profile that arrive while it is being
+    transcribed share that transcription and receive the same events.
+    """
+    key = await asyncio.to_thread(_flight_key, video_path, profile)
+    if key is None:
+        async for event in _transcribe_events(video_path, profile):
+            yield event
+        return
+    async for event in transcription_flights.stream(key, lambda: _transcribe_events(video_path, profile)):
+        yield event
+
+
+async def _transcribe_events(video_path: str, profile: Optional[str]) -> AsyncIterator[dict]:
+    loop = asyncio.get_running_loop()
+    queue: asyncio.Queue = asyncio.Queue()
+    abandoned = threading.Event()
+
+    def on_segment(segment: dict) -> None:
+        # Called from the decoding thread. Raising here stops the decode and
+        # returns the pooled model when the listener has gone away.
+        if abandoned.is_set():
+            raise asyncio.CancelledError()
+        loop.call_soon_threadsafe(queue.put_nowait, {"type": "segment", **segment})
+
+    task = asyncio.create_task(_transcribe(video_path, on_segment, profile))
+    task.add_done_callback(lambda _: loop.call_soon_threadsafe(queue.put_nowait, None))
+
+    try:
+        while True:
+            event = await queue.get()
+            if event is None:
+                break
+            yield event
+        yield {"type": "result", "text": task.result()}
+    finally:
+        if not task.done():
+            abandoned.set()
+            task.cancel()
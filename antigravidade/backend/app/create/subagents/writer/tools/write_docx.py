@@ -5,6 +5,8 @@ from typing import Any, Dict
 
 from docxtpl import DocxTemplate
 
+from app.core.config import settings
+
 
 def _write_docx_sync(structured_data: str, template_path: str, output_dir: str) -> Dict[str, Any]:
     try:
@@ -13,7 +15,7 @@ def _write_docx_sync(structured_data: str, template_path: str, output_dir: str)
         current_dir = os.path.dirname(os.path.abspath(__file__))
         project_root = os.path.abspath(os.path.join(current_dir, "../../../../../../"))
         
-        allowed_output_dir = os.path.join(project_root, "data", "saida", "docx")
+        allowed_output_dir = os.path.join(settings.DATA_DIR, "saida", "docx")
         allowed_template_dir = os.path.join(project_root, "templates")
         
         output_dir_abs = os.path.abspath(output_dir)
@@ -1,12 +1,14 @@
 import os
 import uvicorn
 import asyncio
-import shutil
 import json
-from typing import Optional
+import hashlib
+import time
+from email.utils import formatdate
+from typing import AsyncIterator, List, Literal, Optional, get_args
 from fastapi import FastAPI, HTTPException, Request, UploadFile, File, Form
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import StreamingResponse, JSONResponse, FileResponse
+from fastapi.responses import StreamingResponse, JSONResponse, FileResponse, Response
 from pydantic import BaseModel
 from dotenv import load_dotenv
 
@@ -25,11 +27,46 @@ from app.create.subagents.structuring.agent import structuring_agent
 from app.create.subagents.mastering.agent import mastering_agent
 from app.create.subagents.json_converter.agent import json_converter_agent
 from app.create.subagents.writer.agent import writer_agent
+from app.create.subagents.transcription.tools.transcribe_video import is_allowed_media_path, transcribe_video_stream
 
-from google.adk.runners import InMemoryRunner
-from google.adk.agents import Agent
+from google.adk.agents.run_config import RunConfig, StreamingMode
 
-from fastapi.staticfiles import StaticFiles
+from app.core.config import settings
+from app.services.agent_pool import SESSION_USER_ID, agent_pool
+from app.services.artifact_serving import (
+    RangeNotSatisfiableError,
+    artifact_server,
+    choose_encoding,
+    etag_matches,
+    iter_file,
+    parse_range,
+)
+from app.services.chunked_upload import UploadError, UploadOffsetError, chunked_uploads, parse_checksum
+from app.services.cost_estimator import estimate_llm_stages, estimate_tokens, estimate_transcription, throughput_history
+from app.services.delta_coalescing import coalesce_deltas
+from app.services.llm_scheduler import llm_scheduler
+from app.services.media_hash import file_sha256
+from app.services.map_reduce import map_bounded, split_transcript
+from app.services.media_probe import get_media_info
+from app.services.subtitle_export import EXPORT_FORMATS, iter_export
+from app.services.transcript_cache import (
+    find_media_hash,
+    find_transcript_key,
+    link_document_media,
+    load_transcript_segments,
+    transcript_cache,
+    transcript_cache_key,
+    transcript_links,
+)
+from app.services.single_flight import flight_key, llm_flights, transcription_flights
+from app.services.stage_cache import model_name, stage_cache_key, stage_output_cache
+from app.services.speech_detection import vad_signature, vad_stats
+from app.services.streaming_ingest import ingest_jobs
+from app.services.transcription_daemon import DaemonSupervisor
+from app.services.upload_store import is_file_token, upload_store
+from app.services.transcription_profiles import PROFILES, UnknownProfileError, resolve_profile
+from app.services.transcription_scheduler import transcription_scheduler
+from app.services.whisper_pool import whisper_pool
 
 app = FastAPI(title="Aido Agent API")
 
@@ -43,11 +80,8 @@ app.add_middleware(
 )
 
 # Directories
-DATA_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), "../../data"))
-# ... (rest of directory setup)
+DATA_DIR = os.path.abspath(settings.DATA_DIR)
 
-# Mount static files
-app.mount("/data", StaticFiles(directory=DATA_DIR), name="data")
 UPLOAD_DIR = os.path.join(DATA_DIR, "entrada")
 OUTPUT_DIR = os.path.join(DATA_DIR, "saida")
 MANUALS_DIR = os.path.join(OUTPUT_DIR, "docx")
@@ -63,12 +97,41 @@ os.makedirs(PDFS_DIR, exist_ok=True)
 manuals_db = {}
 
 # --- Pydantic Models ---
+# standard: structuring, mastering and JSON/Markdown writing; fast: one combined call.
+PipelineMode = Literal["standard", "fast"]
+PIPELINE_MODES = get_args(PipelineMode)
+# Priority classes of the Gemini call scheduler (see llm_scheduler.PRIORITIES).
+LlmPriority = Literal["interactive", "batch"]
+
 class PipelineRunRequest(BaseModel):
     doc_id: str
     text_content: Optional[str] = None
     file_token: Optional[str] = None
     template_token: Optional[str] = None # New
     instructions: Optional[str] = None
+    transcription_profile: Optional[str] = None # fast, balanced, accurate or auto
+    bypass_cache: bool = False # regenerate every LLM stage instead of reusing cached outputs
+    pipeline_mode: PipelineMode = "standard" # fast: one combined LLM call instead of the stage chain
+    user_id: Optional[str] = None # LLM calls are queued fairly per user (the doc_id when not given)
+    priority: LlmPriority = "interactive" # batch runs yield Gemini quota to interactive ones
+
+class PipelineEstimateRequest(BaseModel):
+    text_content: Optional[str] = None
+    file_token: Optional[str] = None
+    template_token: Optional[str] = None
+    instructions: Optional[str] = None
+    transcription_profile: Optional[str] = None
+    pipeline_mode: PipelineMode = "standard"
+
+# Structured output of the fast pipeline; the same shape JSON_PROMPT asks for.
+class ManualChapter(BaseModel):
+    titulo: str
+    conteudo: str
+
+class ManualDocument(BaseModel):
+    titulo: str
+    introducao: str
+    capitulos: List[ManualChapter]
 
 class ManualUpdate(BaseModel):
     content: str
@@ -116,31 +179,282 @@ class SimpleMessage:
     def model_copy(self, **kwargs):
         return self
 
+# --- Pipeline prompts ---
+# Each LLM stage is called with an instruction and a prompt prefix followed by the
+# previous stage's output; /pipeline/estimate sizes the calls from these.
+INSTRUCTIONS_SEPARATOR = "\n\nINSTRUÇÕES ADICIONAIS:\n"
+# Part of the stage-output cache key. Instructions and prompts are keyed by
+# content already; bump this when what a stage is asked for changes in another
+# way (output parsing, model settings), so old outputs are not reused.
+PROMPT_TEMPLATE_VERSION = 1
+
+STRUCTURING_INSTRUCTION = "Você é um especialista em estruturação de manuais técnicos."
+STRUCTURING_PROMPT = "Organize o seguinte texto em capítulos e fluxos:\n\n"
+# Long texts: each chunk is structured on its own, then the partial outlines are merged.
+STRUCTURING_CHUNK_PROMPT = (
+    "Organize o seguinte trecho (parte {part} de {parts}) de uma transcrição em capítulos e fluxos. "
+    "Estruture apenas o conteúdo deste trecho:\n\n"
+)
+STRUCTURING_MERGE_PROMPT = (
+    "Una as estruturas parciais abaixo, na ordem em que aparecem, em um único texto organizado em capítulos e fluxos. "
+    "Junte capítulos que continuam de uma parte para a seguinte e não repita conteúdo:\n\n"
+)
+STRUCTURING_PART_HEADER = "--- PARTE {part} ---\n"
+
+MASTERING_INSTRUCTION = "Você é um especialista em diretrizes da Bosch. Use tom técnico e formal."
+MASTERING_PROMPT = "Ajuste o tom técnico e terminologia Bosch do seguinte texto:\n\n"
+
+JSON_INSTRUCTION = "Você é um conversor JSON rigoroso."
+JSON_PROMPT = (
+    "Você é um assistente especializado em estruturar dados para geração de documentos automáticos.\n"
+    "Sua tarefa é converter o manual técnico fornecido em um objeto JSON estritamente formatado.\n"
+    "Este JSON será usado para preencher um template Word (.docx).\n\n"
+    "ESTRUTURA OBRIGATÓRIA:\n"
+    "{\n"
+    "  \"titulo\": \"Título do Manual\",\n"
+    "  \"introducao\": \"Texto introdutório completo...\",\n"
+    "  \"capitulos\": [\n"
+    "    {\n"
+    "      \"titulo\": \"Título do Capítulo 1\",\n"
+    "      \"conteudo\": \"Conteúdo detalhado do capítulo...\"\n"
+    "    },\n"
+    "    ...\n"
+    "  ]\n"
+    "}\n\n"
+    "REGRAS:\n"
+    "1. Responda APENAS com o JSON válido. Sem markdown, sem explicações.\n"
+    "2. O conteúdo deve ser rico e detalhado.\n"
+    "3. Mantenha a terminologia técnica da Bosch.\n\n"
+    "CONTEÚDO DE ENTRADA:\n"
+)
+
+WRITER_INSTRUCTION = "Você é um redator técnico experiente."
+WRITER_PROMPT = (
+    "Você é um redator técnico sênior da Bosch.\n"
+    "Escreva o manual final completo em formato Markdown estruturado.\n"
+    "Use '# Título', '## Capítulos', listas e negrito.\n"
+    "Não use blocos de código ou JSON. Apenas o texto do documento.\n\n"
+    "CONTEÚDO DE ENTRADA:\n"
+)
+
+# Fast mode: structuring, Bosch mastering and writing in one call that answers
+# with a ManualDocument, rendered to Markdown and DOCX without another call.
+FAST_INSTRUCTION = "Você é um redator técnico sênior da Bosch, especialista em estruturação de manuais técnicos."
+FAST_PROMPT = (
+    "Transforme o conteúdo abaixo no manual técnico final, em uma única etapa:\n"
+    "1. Organize o conteúdo em capítulos e fluxos.\n"
+    "2. Ajuste o tom técnico e formal e a terminologia Bosch.\n"
+    "3. Escreva a introdução e o conteúdo de cada capítulo de forma rica e detalhada, em Markdown "
+    "(listas e negrito), sem blocos de código.\n"
+    "Responda com o manual no formato JSON pedido: título, introdução e capítulos.\n\n"
+    "CONTEÚDO DE ENTRADA:\n"
+)
+# Stages whose agent answers with JSON of a schema (structured output).
+STAGE_OUTPUT_SCHEMAS = {"FastManualAgent": ManualDocument}
+
+def _manual_markdown(data: dict) -> str:
+    markdown = f"# {data.get('titulo', 'Manual')}\n\n"
+    markdown += f"{data.get('introducao', '')}\n\n"
+    for cap in data.get('capitulos', []):
+        markdown += f"## {cap.get('titulo', 'Capítulo')}\n\n"
+        markdown += f"{cap.get('conteudo', '')}\n\n"
+    return markdown
+
+def _structuring_chunk_prompt(index: int, parts: int, chunk: str, instructions_suffix: str) -> str:
+    return f"{STRUCTURING_CHUNK_PROMPT.format(part=index + 1, parts=parts)}{chunk}{instructions_suffix}"
+
+def _structuring_merge_prompt(partials: list, instructions_suffix: str) -> str:
+    parts = "\n\n".join(f"{STRUCTURING_PART_HEADER.format(part=index + 1)}{partial}" for index, partial in enumerate(partials))
+    return f"{STRUCTURING_MERGE_PROMPT}{parts}{instructions_suffix}"
+
+def _pipeline_llm_stages(template: bool, context_chars: int = 0, mode: str = "standard") -> list:
+    """(agent name, instruction + prompt prefix length) of the LLM calls a run makes, in order."""
+    if mode == "fast":
+        return [("FastManualAgent", len(FAST_INSTRUCTION) + len(FAST_PROMPT))]
+    final_stage = ("JsonAgent", JSON_INSTRUCTION, JSON_PROMPT) if template else ("WriterAgent", WRITER_INSTRUCTION, WRITER_PROMPT)
+    structuring = [("StructuringAgent", len(STRUCTURING_INSTRUCTION) + len(STRUCTURING_PROMPT))]
+    if context_chars >= settings.STRUCTURING_MAP_REDUCE_MIN_CHARS:
+        # Chunked: one call per chunk (sized together), then the merge call.
+        parts = -(-context_chars // settings.STRUCTURING_CHUNK_CHARS)
+        structuring = [
+            ("StructuringChunkAgent", parts * (len(STRUCTURING_INSTRUCTION) + len(STRUCTURING_CHUNK_PROMPT))),
+            ("StructuringMergeAgent", len(STRUCTURING_INSTRUCTION) + len(STRUCTURING_MERGE_PROMPT) + parts * len(STRUCTURING_PART_HEADER)),
+        ]
+    return [
+        *structuring,
+        *(
+            (name, len(instruction) + len(prompt))
+            for name, instruction, prompt in [
+                ("MasteringAgent", MASTERING_INSTRUCTION, MASTERING_PROMPT),
+                final_stage,
+            ]
+        ),
+    ]
+
 # --- Helper to run an ad-hoc agent ---
-async def run_adhoc_agent(name: str, instruction: str, content: str, model: str = "gemini-2.5-flash") -> str:
-    agent = Agent(name=name, model=model, instruction=instruction)
-    runner = InMemoryRunner(agent=agent, app_name=name)
-    
-    # Create session
-    session_id = f"sess_{name}_{os.urandom(4).hex()}"
-    await runner.session_service.create_session(session_id=session_id, user_id="system", app_name=name)
-    
+# Stages stream their output, so /pipeline/run can show text as it is written.
+STAGE_RUN_CONFIG = RunConfig(streaming_mode=StreamingMode.SSE)
+
+async def run_adhoc_agent_stream(
+    name: str,
+    instruction: str,
+    content: str,
+    model: str = "gemini-2.5-flash",
+    use_cache: bool = True,
+    user_id: str = SESSION_USER_ID,
+    priority: str = "interactive",
+) -> AsyncIterator[dict]:
+    """
+    Runs an LLM stage, yielding `{"type": "delta", "text"}` events as the model
+    writes and then one `{"type": "result", "text"}` with the whole output.
+    Model calls wait their turn in the process-wide Gemini scheduler, fairly
+    per `user_id` within the `priority` class.
+    """
+    # A stage that already saw this exact input returns its stored output.
+    cache_key = stage_cache_key(name, model, instruction, PROMPT_TEMPLATE_VERSION, content)
+    if use_cache:
+        cached = await asyncio.to_thread(stage_output_cache.get, name, cache_key)
+        if cached is not None:
+            print(f"--- LLM CACHE: Reusing {name} output {cache_key[:12]} ---")
+            yield {"type": "delta", "text": cached}
+            yield {"type": "result", "text": cached, "cached": True}
+            return
+    else:
+        stage_output_cache.bypass(name)
+
+    # Quota is reserved for the prompt and the output this stage usually writes,
+    # then corrected to the output it did write.
+    input_tokens = estimate_tokens(len(instruction) + len(content))
+    reserved_tokens = input_tokens + estimate_tokens(len(content) * throughput_history.llm(name)["output_ratio"])
+
+    async def produce():
+        scheduled = llm_scheduler.stream(
+            name, user_id, priority, reserved_tokens,
+            lambda: _run_adhoc_agent_stream(name, instruction, content, model),
+            lambda text: input_tokens + estimate_tokens(len(text)),
+        )
+        async for event in scheduled:
+            if event["type"] == "result":
+                if event["queue_wait"] >= 1:
+                    print(f"--- LLM SCHEDULER: {name} waited {event['queue_wait']:.1f}s for Gemini quota ---")
+                if event["text"]:
+                    await asyncio.to_thread(
+                        stage_output_cache.put, name, cache_key, event["text"],
+                        {"model": model_name(model), "template_version": PROMPT_TEMPLATE_VERSION},
+                    )
+            yield event
+
+    # Identical stage calls that overlap (same video from two users, a retried
+    # pipeline run) share one model call; late joiners get the deltas they missed.
+    key = flight_key(name, model, instruction, hashlib.sha256(content.encode("utf-8")).hexdigest())
+    async for event in llm_flights.stream(key, produce):
+        yield event
+
+async def run_adhoc_agent(
+    name: str,
+    instruction: str,
+    content: str,
+    model: str = "gemini-2.5-flash",
+    use_cache: bool = True,
+    user_id: str = SESSION_USER_ID,
+    priority: str = "interactive",
+) -> str:
+    async for event in run_adhoc_agent_stream(name, instruction, content, model, use_cache, user_id, priority):
+        if event["type"] == "result":
+            return event["text"]
+    return ""
+
+def _event_text(event) -> str:
+    try:
+        if event.content and event.content.parts:
+            return "".join(part.text for part in event.content.parts if part.text and not part.thought)
+    except Exception:
+        pass
+    return ""
+
+async def _run_adhoc_agent_stream(name: str, instruction: str, content: str, model: str) -> AsyncIterator[dict]:
+    started = time.monotonic()
     msg = SimpleMessage(content)
     response_text = ""
+    streamed_text = ""
     
-    async for event in runner.run_async(user_id="system", session_id=session_id, new_message=msg):
-        # Assuming event has content.parts[0].text or similar
-        # Inspecting event structure from previous tests might be needed if this fails.
-        # But usually event.content.parts[0].text is standard.
-        # Let's try to extract text safely.
-        try:
-            if hasattr(event, 'content') and event.content:
-                 if hasattr(event.content, 'parts') and event.content.parts:
-                     response_text += event.content.parts[0].text
-        except Exception:
-            pass
+    # The stage's agent and runner are reused; the session lives only for this call.
+    async with agent_pool.session(name, model, instruction, STAGE_OUTPUT_SCHEMAS.get(name)) as (runner, session_id):
+        async for event in runner.run_async(user_id=SESSION_USER_ID, session_id=session_id, new_message=msg, run_config=STAGE_RUN_CONFIG):
+            text = _event_text(event)
+            if not text:
+                continue
+            if event.partial:
+                streamed_text += text
+                yield {"type": "delta", "text": text}
+                continue
+            # The final event of a streamed turn repeats its deltas as one text.
+            if not streamed_text:
+                yield {"type": "delta", "text": text}
+            response_text += text
+            streamed_text = ""
+    response_text += streamed_text
             
-    return response_text
+    if response_text:
+        await asyncio.to_thread(throughput_history.record_llm, name, len(content), len(response_text), time.monotonic() - started)
+    yield {"type": "result", "text": response_text}
+
+async def _run_adhoc_agent(name: str, instruction: str, content: str, model: str) -> str:
+    async for event in _run_adhoc_agent_stream(name, instruction, content, model):
+        if event["type"] == "result":
+            return event["text"]
+    return ""
+
+def _stage_stream(
+    name: str,
+    instruction: str,
+    content: str,
+    use_cache: bool,
+    user_id: str = SESSION_USER_ID,
+    priority: str = "interactive",
+) -> AsyncIterator[dict]:
+    """A stage's events with deltas merged to at most one per AIDO_STAGE_DELTA_INTERVAL_MS."""
+    events = run_adhoc_agent_stream(name, instruction, content, use_cache=use_cache, user_id=user_id, priority=priority)
+    return coalesce_deltas(events, settings.STAGE_DELTA_INTERVAL_MS / 1000)
+
+def _stage_delta_event(stage: str, text: str) -> str:
+    return f'event: stage_delta\ndata: {json.dumps({"stage": stage, "text": text})}\n\n'
+
+# --- Lifecycle ---
+
+@app.on_event("startup")
+async def warm_up_whisper():
+    if settings.TRANSCRIPTION_DAEMON:
+        # The daemon loads (and warms) the models; web workers never hold one.
+        app.state.transcription_daemon = DaemonSupervisor(settings.TRANSCRIPTION_DAEMON_ADDRESS)
+        app.state.transcription_daemon_task = asyncio.create_task(app.state.transcription_daemon.run())
+        return
+    if not settings.WHISPER_WARMUP:
+        return
+    # Load the default profile's model before the first upload instead of inside the first job.
+    # Runs in the background so a slow model download never blocks the API from starting.
+    profile = resolve_profile(None)
+
+    async def _warm_up():
+        try:
+            await asyncio.to_thread(
+                whisper_pool.warm_up,
+                *profile.model_key,
+                instances=settings.WHISPER_POOL_SIZE,
+            )
+        except Exception as e:
+            print(f"[WARN] Whisper warm-up failed: {e}")
+
+    app.state.whisper_warmup = asyncio.create_task(_warm_up())
+
+@app.on_event("startup")
+async def discard_expired_uploads():
+    expired = await asyncio.to_thread(chunked_uploads.discard_expired)
+    if expired:
+        print(f"--- UPLOAD: Discarded {expired} abandoned upload sessions ---")
+    orphans = await asyncio.to_thread(upload_store.discard_orphans, settings.UPLOAD_SESSION_TTL_HOURS * 3600)
+    if orphans:
+        print(f"--- UPLOAD: Deleted {orphans} stored files no document links to ---")
 
 # --- Endpoints ---
 
@@ -160,25 +474,329 @@ def health_check():
 def system_config():
     return {
         "models": [{"id": "gemini-2.5-flash", "name": "Gemini 2.5 Flash"}],
-        "default_model": "gemini-2.5-flash"
+        "default_model": "gemini-2.5-flash",
+        "transcription_profiles": [*PROFILES, "auto"],
+        "default_transcription_profile": settings.WHISPER_PROFILE,
+        "pipeline_modes": list(PIPELINE_MODES),
+        "default_pipeline_mode": "standard",
+    }
+
+@app.get("/system/metrics")
+def system_metrics():
+    return {
+        "whisper_pool": whisper_pool.stats(),
+        "transcript_cache": transcript_cache.stats(),
+        "transcript_links": transcript_links.stats(),
+        "transcription_scheduler": transcription_scheduler.stats(),
+        "vad": vad_stats.stats(),
+        "transcription_daemon": app.state.transcription_daemon.stats() if settings.TRANSCRIPTION_DAEMON else None,
+        "single_flight": {
+            "transcription": transcription_flights.stats(),
+            "llm": llm_flights.stats(),
+        },
+        "uploads": chunked_uploads.stats(),
+        "ingest": ingest_jobs.stats(),
+        "upload_store": upload_store.stats(),
+        "throughput": throughput_history.stats(),
+        "artifacts": artifact_server.stats(),
+        "agents": agent_pool.stats(),
+        "llm_cache": stage_output_cache.stats(),
+        "llm_scheduler": llm_scheduler.stats(),
+    }
+
+@app.api_route("/data/{artifact_path:path}", methods=["GET", "HEAD"])
+async def serve_artifact(artifact_path: str, request: Request):
+    """
+    Uploads, transcripts and manuals under the data directory. Responses carry
+    the content hash as ETag (304 on revalidation), honour single byte ranges so
+    video previews can seek, and send text artifacts as cached gzip/brotli copies.
+    """
+    artifact = await asyncio.to_thread(artifact_server.resolve, artifact_path)
+    if artifact is None:
+        raise HTTPException(status_code=404, detail="Not Found")
+
+    headers = {
+        "ETag": artifact.etag,
+        "Cache-Control": artifact.cache_control,
+        "Last-Modified": formatdate(artifact.mtime, usegmt=True),
+        "Accept-Ranges": "bytes",
     }
+    body = None
+    if artifact_server.compressible(artifact):
+        headers["Vary"] = "Accept-Encoding"
+        encoding = choose_encoding(request.headers.get("accept-encoding"))
+        if encoding and "range" not in request.headers:
+            body = await asyncio.to_thread(artifact_server.variant, artifact, encoding)
+            if body is not None:
+                headers.update({"Content-Encoding": encoding, "ETag": f'"{artifact.sha256}-{encoding}"'})
+
+    if etag_matches(request.headers.get("if-none-match"), headers["ETag"]):
+        artifact_server.record(304)
+        return Response(status_code=304, headers=headers)
+
+    if body is not None:
+        artifact_server.record(200)
+        headers["Content-Length"] = str(len(body))
+        return Response(b"" if request.method == "HEAD" else body, headers=headers, media_type=artifact.media_type)
+
+    try:
+        byte_range = parse_range(request.headers.get("range"), artifact.size)
+    except RangeNotSatisfiableError:
+        raise HTTPException(status_code=416, detail="Range Not Satisfiable", headers={"Content-Range": f"bytes */{artifact.size}"})
+    start, end = byte_range or (0, artifact.size - 1)
+    status_code = 206 if byte_range else 200
+    if byte_range:
+        headers["Content-Range"] = f"bytes {start}-{end}/{artifact.size}"
+    headers["Content-Length"] = str(end - start + 1)
+    artifact_server.record(status_code)
+    if request.method == "HEAD":
+        return Response(status_code=status_code, headers=headers, media_type=artifact.media_type)
+    return StreamingResponse(iter_file(artifact.path, start, end), status_code=status_code, headers=headers, media_type=artifact.media_type)
+
+UPLOAD_READ_BYTES = 1024 * 1024
+
+def _store_upload(source, filename: str, doc_id: Optional[str]) -> tuple:
+    """Stores an upload by content, hashing it while it is copied; returns its file_token and path."""
+    writer = upload_store.writer()
+    try:
+        for data in iter(lambda: source.read(UPLOAD_READ_BYTES), b""):
+            writer.write(data)
+        sha256 = writer.close()
+    except BaseException:
+        writer.discard()
+        raise
+    path = upload_store.add(writer.path, sha256, filename)
+    if doc_id:
+        upload_store.link(sha256, doc_id, filename)
+    return sha256, path
 
 @app.post("/upload")
 async def upload_file(file: UploadFile = File(...), doc_id: str = Form(...)):
     try:
-        file_path = os.path.join(UPLOAD_DIR, file.filename)
-        with open(file_path, "wb") as buffer:
-            shutil.copyfileobj(file.file, buffer)
+        # Copy in a worker thread; a multi-GB video must not stall the event loop.
+        file_token, file_path = await asyncio.to_thread(_store_upload, file.file, file.filename, doc_id)
+        # Probed once here and cached by content, for /pipeline/estimate and `auto` profiles.
+        media = await asyncio.to_thread(get_media_info, file_path, file_token)
         
         return {
             "filename": file.filename,
             "transcription": "",
             "text_content": "",
-            "file_token": file_path
+            "file_token": file_token,
+            "media": media,
         }
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+@app.delete("/upload/{file_token}")
+async def release_upload(file_token: str, doc_id: str):
+    """Drops a document's reference to an upload; the file is deleted with its last reference."""
+    if not is_file_token(file_token):
+        raise HTTPException(status_code=404, detail="Upload not found")
+    remaining = await asyncio.to_thread(upload_store.unlink, file_token, doc_id)
+    return {"file_token": file_token, "references": remaining}
+
+# --- Chunked, resumable uploads (tus-style) ---
+# POST creates a session, PATCH appends a chunk at Upload-Offset (optionally with
+# Upload-Checksum: sha256 <base64>), HEAD reports the offset to resume from, and
+# POST .../finalize verifies the whole file and returns its file_token.
+
+class UploadSessionRequest(BaseModel):
+    filename: str
+    size: int
+    sha256: Optional[str] = None
+    doc_id: Optional[str] = None
+    # Transcribe while the chunks arrive; follow it on GET .../transcript
+    transcribe: bool = False
+    transcription_profile: Optional[str] = None
+
+def _upload_error(error: UploadError) -> HTTPException:
+    headers = {"Upload-Offset": str(error.offset)} if isinstance(error, UploadOffsetError) else None
+    return HTTPException(status_code=error.status_code, detail=str(error), headers=headers)
+
+@app.post("/upload/sessions", status_code=201)
+async def create_upload_session(request: UploadSessionRequest):
+    if request.sha256 and is_file_token(request.sha256.lower()):
+        # Content the store already holds is not uploaded again.
+        file_token = request.sha256.lower()
+        if await asyncio.to_thread(upload_store.reuse, file_token) is not None:
+            if request.doc_id:
+                await asyncio.to_thread(upload_store.link, file_token, request.doc_id, request.filename)
+            return JSONResponse({
+                "upload_id": None,
+                "filename": request.filename,
+                "size": request.size,
+                "offset": request.size,
+                "complete": True,
+                "file_token": file_token,
+                "transcribing": False,
+            })
+    try:
+        profile = resolve_profile(request.transcription_profile) if request.transcribe else None
+    except UnknownProfileError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    try:
+        session = await asyncio.to_thread(chunked_uploads.create, request.filename, request.size, request.sha256, request.doc_id)
+    except UploadError as e:
+        raise _upload_error(e)
+    if profile is not None:
+        await asyncio.to_thread(ingest_jobs.start, session.upload_id, chunked_uploads.part_path(session.upload_id), session.size, profile)
+    return {**session.status(), "chunk_size": chunked_uploads.chunk_size, "complete": False, "transcribing": profile is not None}
+
+@app.head("/upload/sessions/{upload_id}")
+@app.get("/upload/sessions/{upload_id}")
+async def get_upload_session(upload_id: str):
+    try:
+        session = await asyncio.to_thread(chunked_uploads.get, upload_id)
+    except UploadError as e:
+        raise _upload_error(e)
+    return JSONResponse(
+        session.status(),
+        headers={"Upload-Offset": str(session.offset), "Upload-Length": str(session.size), "Cache-Control": "no-store"},
+    )
+
+@app.patch("/upload/sessions/{upload_id}")
+async def append_upload_chunk(upload_id: str, request: Request):
+    try:
+        offset = int(request.headers.get("Upload-Offset", ""))
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Upload-Offset header is required")
+    try:
+        checksum = parse_checksum(request.headers.get("Upload-Checksum"))
+        session = await chunked_uploads.append(upload_id, offset, request.stream(), checksum)
+    except UploadError as e:
+        raise _upload_error(e)
+    job = ingest_jobs.get(upload_id)
+    if job is not None:
+        job.advance(session.offset)
+    return JSONResponse(session.status(), headers={"Upload-Offset": str(session.offset)})
+
+@app.post("/upload/sessions/{upload_id}/finalize")
+async def finalize_upload(upload_id: str):
+    job = ingest_jobs.get(upload_id)
+    if job is not None:
+        # ffmpeg must have read the part file before it moves.
+        await asyncio.to_thread(job.wait_fed, 60)
+    try:
+        file_path, sha256, session = await chunked_uploads.finalize(upload_id, upload_store)
+    except UploadError as e:
+        raise _upload_error(e)
+    if session.doc_id:
+        await asyncio.to_thread(upload_store.link, sha256, session.doc_id, session.filename)
+    if job is not None:
+        job.finalize(file_path, sha256)
+    media = await asyncio.to_thread(get_media_info, file_path, sha256)
+    return {
+        "filename": session.filename,
+        "transcription": "",
+        "text_content": "",
+        "file_token": sha256,
+        "size": session.size,
+        "sha256": sha256,
+        "throughput_mbps": session.throughput_mbps,
+        "media": media,
+    }
+
+@app.delete("/upload/sessions/{upload_id}", status_code=204)
+async def cancel_upload(upload_id: str):
+    ingest_jobs.remove(upload_id, cancel=True)
+    await asyncio.to_thread(chunked_uploads.discard, upload_id)
+
+def _segment_event(event: dict) -> str:
+    return f'event: transcript_segment\ndata: {json.dumps({"stage": "TRANSCRIPTION", "start": round(event["start"], 2), "end": round(event["end"], 2), "text": event["text"]})}\n\n'
+
+@app.get("/upload/sessions/{upload_id}/transcript")
+async def stream_upload_transcript(upload_id: str):
+    """
+    Segments of an upload created with `transcribe: true`: first those of the
+    windows decoded from the chunks received so far, then, once the upload is
+    finalized, the rest of the transcript of the saved file, which ends with
+    `transcript_complete`. That transcription resumes after the windows already
+    decoded, is shared with a /pipeline/run on the same file_token and is
+    cached for it.
+    """
+    job = ingest_jobs.get(upload_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="No transcription for this upload")
+
+    async def event_generator():
+        sent_until = -1.0
+        async for event in job.stream():
+            sent_until = event["end"]
+            yield _segment_event(event)
+
+        media_path = await job.wait_media_path()
+        async for event in transcribe_video_stream(media_path, job.profile.name):
+            if event["type"] == "segment":
+                # The run replays the journaled windows this listener already has.
+                if event["end"] > sent_until:
+                    yield _segment_event(event)
+            elif event["text"].startswith("Error"):
+                yield f'event: error\ndata: {json.dumps({"message": event["text"]})}\n\n'
+            else:
+                yield f'event: transcript_complete\ndata: {json.dumps({"text": event["text"], "file_token": job.file_token})}\n\n'
+        ingest_jobs.remove(upload_id)
+
+    return StreamingResponse(event_generator(), media_type="text/event-stream")
+
+@app.post("/pipeline/estimate")
+async def estimate_pipeline(request: PipelineEstimateRequest):
+    """
+    Predicts what /pipeline/run would cost for the same input: transcription time
+    from the media duration and how fast the Whisper profile has run here, and
+    tokens and time of each LLM stage from the prompt sizes. Nothing is run.
+    """
+    media = None
+    transcription = None
+    if request.file_token:
+        if is_file_token(request.file_token):
+            media_path = await asyncio.to_thread(upload_store.path_for, request.file_token)
+            media_hash = request.file_token
+        else:
+            media_path = os.path.abspath(request.file_token)
+            if not is_allowed_media_path(media_path):
+                raise HTTPException(status_code=403, detail="file_token is outside the upload directory")
+            media_hash = await asyncio.to_thread(file_sha256, media_path) if os.path.exists(media_path) else None
+        if media_path is None or media_hash is None:
+            raise HTTPException(status_code=404, detail="Upload not found")
+        media = await asyncio.to_thread(get_media_info, media_path, media_hash)
+        if not media or not media["duration"]:
+            raise HTTPException(status_code=422, detail="The upload is not audio or video with a known duration")
+        try:
+            profile = resolve_profile(request.transcription_profile, duration=media["duration"])
+        except UnknownProfileError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+
+        transcription = estimate_transcription(media["duration"], profile, throughput_history)
+        cache_key = transcript_cache_key(
+            media_hash, profile.model_size, profile.beam_size,
+            vad=vad_signature() if profile.vad_filter else None,
+        )
+        cached_text = await asyncio.to_thread(transcript_cache.get_text, cache_key)
+        transcription["cached"] = cached_text is not None
+        if cached_text is not None:
+            transcription.update(seconds=0.0, transcript_chars=len(cached_text))
+        context_chars = transcription["transcript_chars"]
+    elif request.text_content:
+        context_chars = len(request.text_content)
+    elif request.instructions:
+        context_chars = len(request.instructions)
+    else:
+        raise HTTPException(status_code=400, detail="Nenhum conteúdo fornecido (Vídeo, Texto ou Instruções).")
+
+    if request.instructions and (request.file_token or request.text_content) and request.instructions != request.text_content:
+        context_chars += len(INSTRUCTIONS_SEPARATOR) + len(request.instructions)
+
+    stages = _pipeline_llm_stages(bool(request.template_token), context_chars, request.pipeline_mode)
+    llm = estimate_llm_stages(stages, context_chars, throughput_history)
+    transcription_seconds = transcription["seconds"] if transcription else 0.0
+    return {
+        "media": media,
+        "transcription": transcription,
+        "llm": llm,
+        "total_seconds": round(transcription_seconds + llm["seconds"], 1),
+    }
+
 @app.post("/pipeline/run")
 async def run_pipeline(request: PipelineRunRequest):
     """
@@ -194,22 +812,41 @@ async def run_pipeline(request: PipelineRunRequest):
             
             # --- STEP 1: TRANSCRIPTION ---
             if request.file_token:
+                media_path = await asyncio.to_thread(upload_store.resolve, request.file_token)
+                if media_path is None:
+                    raise Exception("Arquivo enviado não encontrado. Envie o vídeo novamente.")
                 yield f'event: progress\ndata: {{"stage": "TRANSCRIPTION", "progress": 10, "log": "Iniciando transcrição do vídeo..."}}\n\n'
                 
-                from app.create.subagents.transcription.tools.transcribe_video import transcribe_video
-                
-                transcription_result = await transcribe_video(request.file_token)
+                # Forward segments as Whisper decodes them; the final text is the same
+                # value transcribe_video() would have returned.
+                transcription_result = ""
+                last_progress = 10
+                async for event in transcribe_video_stream(media_path, request.transcription_profile):
+                    if event["type"] == "result":
+                        transcription_result = event["text"]
+                        continue
+                    progress = 10 + int(15 * event["progress"])
+                    yield f'event: transcript_segment\ndata: {json.dumps({"stage": "TRANSCRIPTION", "progress": progress, "start": round(event["start"], 2), "end": round(event["end"], 2), "text": event["text"]})}\n\n'
+                    if progress > last_progress:
+                        last_progress = progress
+                        yield f'event: progress\ndata: {{"stage": "TRANSCRIPTION", "progress": {progress}}}\n\n'
                 
                 if transcription_result.startswith("Error"):
                      raise Exception(transcription_result)
                 
                 current_context = transcription_result
+                # Lets /transcript/export find this document's segments later.
+                media_hash = request.file_token if is_file_token(request.file_token) else await asyncio.to_thread(file_sha256, media_path)
+                await asyncio.to_thread(link_document_media, request.doc_id, media_hash)
+                if is_file_token(request.file_token):
+                    await asyncio.to_thread(upload_store.link, media_hash, request.doc_id)
                 
                 # Save transcript
                 transcript_filename = f"{request.doc_id}_transcript.txt"
                 transcript_path_abs = os.path.join(TRANSCRIPTS_DIR, transcript_filename)
                 with open(transcript_path_abs, "w", encoding="utf-8") as f:
                     f.write(current_context)
+                await asyncio.to_thread(artifact_server.precompress, transcript_path_abs)
                 transcript_path = f"/data/saida/txt/{transcript_filename}"
                 
                 yield f'event: progress\ndata: {{"stage": "TRANSCRIPTION", "progress": 25, "log": "Transcrição concluída."}}\n\n'
@@ -224,29 +861,86 @@ async def run_pipeline(request: PipelineRunRequest):
                  else:
                      raise Exception("Nenhum conteúdo fornecido (Vídeo, Texto ou Instruções).")
 
+            instructions_suffix = ""
             if request.instructions and request.instructions != current_context:
-                current_context += f"\n\nINSTRUÇÕES ADICIONAIS:\n{request.instructions}"
+                instructions_suffix = f"{INSTRUCTIONS_SEPARATOR}{request.instructions}"
+            source_context = current_context
+            current_context += instructions_suffix
+            # Gemini calls of this run share one fair-queuing slot in the LLM scheduler.
+            llm_user = request.user_id or request.doc_id
 
-            # --- STEP 2: STRUCTURING ---
-            yield f'event: progress\ndata: {{"stage": "STRUCTURING", "progress": 40, "log": "Estruturando conteúdo..."}}\n\n'
+            manual_json = None
+            if request.pipeline_mode == "fast":
+                # --- FAST MODE: STRUCTURING, MASTERING AND WRITING IN ONE CALL ---
+                # The single call is reported as STRUCTURING until step 4 renders its output.
+                yield f'event: progress\ndata: {{"stage": "STRUCTURING", "progress": 40, "log": "Modo rápido: estruturando, masterizando e redigindo em uma etapa..."}}\n\n'
+
+                manual_json = ""
+                async for event in _stage_stream("FastManualAgent", FAST_INSTRUCTION, f"{FAST_PROMPT}{current_context}", not request.bypass_cache, llm_user, request.priority):
+                    if event["type"] == "delta":
+                        yield _stage_delta_event("STRUCTURING", event["text"])
+                    else:
+                        manual_json = event["text"].replace("```json", "").replace("```", "").strip()
+
+                yield f'event: progress\ndata: {{"stage": "STRUCTURING", "progress": 75, "log": "Manual gerado em uma etapa."}}\n\n'
+            else:
+                # --- STEP 2: STRUCTURING ---
+                yield f'event: progress\ndata: {{"stage": "STRUCTURING", "progress": 40, "log": "Estruturando conteúdo..."}}\n\n'
             
-            print(f"[DEBUG] Before Structuring - Length: {len(current_context)}, Preview: {current_context[:200]}")
-            structuring_prompt = f"Organize o seguinte texto em capítulos e fluxos:\n\n{current_context}"
-            structured_text = await run_adhoc_agent("StructuringAgent", "Você é um especialista em estruturação de manuais técnicos.", structuring_prompt)
-            current_context = structured_text
-            print(f"[DEBUG] After Structuring - Length: {len(current_context)}, Preview: {current_context[:200]}")
+                print(f"[DEBUG] Before Structuring - Length: {len(current_context)}, Preview: {current_context[:200]}")
+                structured_text = ""
+                if len(current_context) >= settings.STRUCTURING_MAP_REDUCE_MIN_CHARS:
+                    # Long texts: structure chunks concurrently, then merge the partial outlines.
+                    chunks = split_transcript(source_context, settings.STRUCTURING_CHUNK_CHARS)
+                    yield f'event: progress\ndata: {{"stage": "STRUCTURING", "progress": 40, "log": "Texto longo: estruturando {len(chunks)} partes em paralelo..."}}\n\n'
+                    partials = [""] * len(chunks)
+
+                    def structure_chunk(index, chunk):
+                        prompt = _structuring_chunk_prompt(index, len(chunks), chunk, instructions_suffix)
+                        # Named apart from StructuringAgent, whose history sizes whole-transcript calls.
+                        return run_adhoc_agent(
+                            "StructuringChunkAgent", STRUCTURING_INSTRUCTION, prompt,
+                            use_cache=not request.bypass_cache, user_id=llm_user, priority=request.priority,
+                        )
+
+                    done = 0
+                    async for index, partial in map_bounded(chunks, structure_chunk, settings.STRUCTURING_CONCURRENCY):
+                        partials[index] = partial
+                        done += 1
+                        yield f'event: progress\ndata: {{"stage": "STRUCTURING", "progress": {40 + int(10 * done / len(chunks))}, "log": "Parte {done} de {len(chunks)} estruturada."}}\n\n'
+
+                    merge_prompt = _structuring_merge_prompt(partials, instructions_suffix)
+                    async for event in _stage_stream("StructuringMergeAgent", STRUCTURING_INSTRUCTION, merge_prompt, not request.bypass_cache, llm_user, request.priority):
+                        if event["type"] == "delta":
+                            yield _stage_delta_event("STRUCTURING", event["text"])
+                        else:
+                            structured_text = event["text"]
+                else:
+                    structuring_prompt = f"{STRUCTURING_PROMPT}{current_context}"
+                    async for event in _stage_stream("StructuringAgent", STRUCTURING_INSTRUCTION, structuring_prompt, not request.bypass_cache, llm_user, request.priority):
+                        if event["type"] == "delta":
+                            yield _stage_delta_event("STRUCTURING", event["text"])
+                        else:
+                            structured_text = event["text"]
+                current_context = structured_text
+                print(f"[DEBUG] After Structuring - Length: {len(current_context)}, Preview: {current_context[:200]}")
             
-            yield f'event: progress\ndata: {{"stage": "STRUCTURING", "progress": 55, "log": "Estruturação concluída."}}\n\n'
+                yield f'event: progress\ndata: {{"stage": "STRUCTURING", "progress": 55, "log": "Estruturação concluída."}}\n\n'
 
-            # --- STEP 3: MASTERING ---
-            yield f'event: progress\ndata: {{"stage": "MASTERING", "progress": 65, "log": "Aplicando diretrizes Bosch..."}}\n\n'
+                # --- STEP 3: MASTERING ---
+                yield f'event: progress\ndata: {{"stage": "MASTERING", "progress": 65, "log": "Aplicando diretrizes Bosch..."}}\n\n'
             
-            mastering_prompt = f"Ajuste o tom técnico e terminologia Bosch do seguinte texto:\n\n{current_context}"
-            mastered_text = await run_adhoc_agent("MasteringAgent", "Você é um especialista em diretrizes da Bosch. Use tom técnico e formal.", mastering_prompt)
-            current_context = mastered_text
-            print(f"[DEBUG] After Mastering - Length: {len(current_context)}, Preview: {current_context[:200]}")
+                mastering_prompt = f"{MASTERING_PROMPT}{current_context}"
+                mastered_text = ""
+                async for event in _stage_stream("MasteringAgent", MASTERING_INSTRUCTION, mastering_prompt, not request.bypass_cache, llm_user, request.priority):
+                    if event["type"] == "delta":
+                        yield _stage_delta_event("MASTERING", event["text"])
+                    else:
+                        mastered_text = event["text"]
+                current_context = mastered_text
+                print(f"[DEBUG] After Mastering - Length: {len(current_context)}, Preview: {current_context[:200]}")
             
-            yield f'event: progress\ndata: {{"stage": "MASTERING", "progress": 75, "log": "Masterização concluída."}}\n\n'
+                yield f'event: progress\ndata: {{"stage": "MASTERING", "progress": 75, "log": "Masterização concluída."}}\n\n'
 
             # --- STEP 4: CONTENT GENERATION ---
             yield f'event: progress\ndata: {{"stage": "JSON_CONVERTER", "progress": 80, "log": "Gerando conteúdo final..."}}\n\n'
@@ -258,49 +952,32 @@ async def run_pipeline(request: PipelineRunRequest):
                 # --- TEMPLATE MODE (JSON) ---
                 yield f'event: progress\ndata: {{"stage": "JSON_CONVERTER", "progress": 82, "log": "Preenchendo template personalizado..."}}\n\n'
                 
-                json_prompt = (
-                    "Você é um assistente especializado em estruturar dados para geração de documentos automáticos.\n"
-                    "Sua tarefa é converter o manual técnico fornecido em um objeto JSON estritamente formatado.\n"
-                    "Este JSON será usado para preencher um template Word (.docx).\n\n"
-                    "ESTRUTURA OBRIGATÓRIA:\n"
-                    "{\n"
-                    "  \"titulo\": \"Título do Manual\",\n"
-                    "  \"introducao\": \"Texto introdutório completo...\",\n"
-                    "  \"capitulos\": [\n"
-                    "    {\n"
-                    "      \"titulo\": \"Título do Capítulo 1\",\n"
-                    "      \"conteudo\": \"Conteúdo detalhado do capítulo...\"\n"
-                    "    },\n"
-                    "    ...\n"
-                    "  ]\n"
-                    "}\n\n"
-                    "REGRAS:\n"
-                    "1. Responda APENAS com o JSON válido. Sem markdown, sem explicações.\n"
-                    "2. O conteúdo deve ser rico e detalhado.\n"
-                    "3. Mantenha a terminologia técnica da Bosch.\n\n"
-                    f"CONTEÚDO DE ENTRADA:\n{current_context}"
-                )
-                
-                json_text = await run_adhoc_agent("JsonAgent", "Você é um conversor JSON rigoroso.", json_prompt)
-                json_text = json_text.replace("```json", "").replace("```", "").strip()
+                if manual_json is None:
+                    json_prompt = f"{JSON_PROMPT}{current_context}"
+                    
+                    json_text = ""
+                    async for event in _stage_stream("JsonAgent", JSON_INSTRUCTION, json_prompt, not request.bypass_cache, llm_user, request.priority):
+                        if event["type"] == "delta":
+                            yield _stage_delta_event("JSON_CONVERTER", event["text"])
+                        else:
+                            json_text = event["text"]
+                    json_text = json_text.replace("```json", "").replace("```", "").strip()
+                else:
+                    json_text = manual_json
                 
                 try:
-                    data = json.loads(json_text)
-                    markdown_content_for_ui = f"# {data.get('titulo', 'Manual')}\n\n"
-                    markdown_content_for_ui += f"{data.get('introducao', '')}\n\n"
-                    for cap in data.get('capitulos', []):
-                        markdown_content_for_ui += f"## {cap.get('titulo', 'Capítulo')}\n\n"
-                        markdown_content_for_ui += f"{cap.get('conteudo', '')}\n\n"
+                    markdown_content_for_ui = _manual_markdown(json.loads(json_text))
                 except json.JSONDecodeError:
                     print("[ERROR] Failed to parse JSON for Markdown conversion. Sending raw text.")
-                    markdown_content_for_ui = current_context
+                    markdown_content_for_ui = current_context if manual_json is None else json_text
 
                 # Generate DOCX using Template
                 yield f'event: progress\ndata: {{"stage": "WRITER", "progress": 90, "log": "Gerando arquivo DOCX (Template)..."}}\n\n'
                 from app.create.subagents.writer.tools.write_docx import write_docx
                 
                 print(f"[DEBUG] Using custom template: {request.template_token}")
-                writer_result = await write_docx(json_text, request.template_token, MANUALS_DIR)
+                template_path = await asyncio.to_thread(upload_store.resolve, request.template_token)
+                writer_result = await write_docx(json_text, template_path or request.template_token, MANUALS_DIR)
                 
                 if writer_result["status"] == "success":
                     manual_docx_path = f"/data/saida/docx/{os.path.basename(writer_result['output_path'])}"
@@ -311,15 +988,21 @@ async def run_pipeline(request: PipelineRunRequest):
                 # --- STANDARD MODE (Markdown) ---
                 yield f'event: progress\ndata: {{"stage": "JSON_CONVERTER", "progress": 82, "log": "Gerando manual padrão (Markdown)..."}}\n\n'
                 
-                markdown_prompt = (
-                    "Você é um redator técnico sênior da Bosch.\n"
-                    "Escreva o manual final completo em formato Markdown estruturado.\n"
-                    "Use '# Título', '## Capítulos', listas e negrito.\n"
-                    "Não use blocos de código ou JSON. Apenas o texto do documento.\n\n"
-                    f"CONTEÚDO DE ENTRADA:\n{current_context}"
-                )
-                
-                markdown_text = await run_adhoc_agent("WriterAgent", "Você é um redator técnico experiente.", markdown_prompt)
+                if manual_json is None:
+                    markdown_prompt = f"{WRITER_PROMPT}{current_context}"
+                    
+                    markdown_text = ""
+                    async for event in _stage_stream("WriterAgent", WRITER_INSTRUCTION, markdown_prompt, not request.bypass_cache, llm_user, request.priority):
+                        if event["type"] == "delta":
+                            yield _stage_delta_event("JSON_CONVERTER", event["text"])
+                        else:
+                            markdown_text = event["text"]
+                else:
+                    try:
+                        markdown_text = _manual_markdown(json.loads(manual_json))
+                    except json.JSONDecodeError:
+                        print("[ERROR] Failed to parse fast-mode JSON. Using raw text.")
+                        markdown_text = manual_json
                 markdown_content_for_ui = markdown_text
                 
                 # Generate DOCX from Markdown
@@ -343,6 +1026,45 @@ async def run_pipeline(request: PipelineRunRequest):
 
     return StreamingResponse(event_generator(), media_type="text/event-stream")
 
+def _cached_segments(doc_id: Optional[str], file_token: Optional[str]):
+    """Looks up the cached transcript of a document or upload; never transcribes."""
+    if is_file_token(file_token):
+        media_hash = file_token
+    elif file_token:
+        # Tokens issued before uploads were stored by content are paths.
+        upload_path = os.path.abspath(file_token)
+        if not is_allowed_media_path(upload_path):
+            raise HTTPException(status_code=403, detail="file_token is outside the upload directory")
+        if not os.path.exists(upload_path):
+            raise HTTPException(status_code=404, detail="Upload not found")
+        media_hash = file_sha256(upload_path)
+    else:
+        media_hash = find_media_hash(doc_id)
+
+    transcript_key = find_transcript_key(media_hash) if media_hash else None
+    store = load_transcript_segments(transcript_key) if transcript_key else None
+    if store is None:
+        raise HTTPException(status_code=404, detail="No cached transcript. Run the pipeline on this video first.")
+    return store, transcript_cache.get_meta(transcript_key) or {}
+
+@app.get("/transcript/export")
+async def export_transcript(format: str = "srt", doc_id: Optional[str] = None, file_token: Optional[str] = None):
+    """Subtitles (SRT, WebVTT) or timed segments (JSON) from the transcript cache."""
+    if format not in EXPORT_FORMATS:
+        raise HTTPException(status_code=400, detail=f"Unknown format '{format}'. Use one of: {', '.join(EXPORT_FORMATS)}.")
+    if not doc_id and not file_token:
+        raise HTTPException(status_code=400, detail="Provide doc_id or file_token")
+
+    store, meta = await asyncio.to_thread(_cached_segments, doc_id, file_token)
+    media_type, extension = EXPORT_FORMATS[format]
+    name = doc_id or (file_token[:12] if is_file_token(file_token) else os.path.splitext(os.path.basename(file_token))[0])
+    name = "".join(c if c.isascii() and (c.isalnum() or c in "-_") else "_" for c in name)
+    return StreamingResponse(
+        iter_export(store, format, meta),
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="{name}.{extension}"'},
+    )
+
 @app.get("/manual/{doc_id}")
 def get_manual(doc_id: str):
     if doc_id in manuals_db:
@@ -0,0 +1,126 @@
+import threading
+from collections import OrderedDict
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Optional, Tuple, Type
+
+from google.adk.agents import Agent
+from google.adk.runners import InMemoryRunner
+from pydantic import BaseModel
+
+SESSION_USER_ID = "system"
+# Distinct (name, model, instruction, output schema) stages kept; the pipeline uses up to six.
+MAX_POOLED_RUNNERS = 32
+
+
+class AgentPool:
+    """
+    Agents and runners for the LLM stages, built once per (name, model,
+    instruction, output schema) and shared by every pipeline run.
+
+    Runners hold no per-call state; each call gets its own session from the
+    runner's in-memory session service and the session is deleted when the call
+    ends, whether it returned, raised or was cancelled, so a long-lived runner
+    never accumulates them and the live count is exact.
+    """
+
+    def __init__(self, max_runners: int = MAX_POOLED_RUNNERS):
+        self.max_runners = max_runners
+        self.built = 0
+        self.reused = 0
+        self.sessions_created = 0
+        self.sessions_deleted = 0
+        self.live_sessions = 0
+        self.peak_live_sessions = 0
+        self.session_bytes_total = 0
+        self.session_bytes_max = 0
+        self._runners: "OrderedDict[tuple, InMemoryRunner]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def runner(self, name: str, model, instruction: str, output_schema: Optional[Type[BaseModel]] = None) -> InMemoryRunner:
+        # `model` is a model name, or an LLM object in tests and benchmarks.
+        key = (name, model if isinstance(model, str) else id(model), instruction, output_schema)
+        with self._lock:
+            runner = self._runners.get(key)
+            if runner is not None:
+                self._runners.move_to_end(key)
+                self.reused += 1
+                return runner
+        if output_schema is None:
+            agent = Agent(name=name, model=model, instruction=instruction)
+        else:
+            # The model answers with JSON of this schema; such an agent cannot hand off to others.
+            agent = Agent(
+                name=name, model=model, instruction=instruction, output_schema=output_schema,
+                disallow_transfer_to_parent=True, disallow_transfer_to_peers=True,
+            )
+        runner = InMemoryRunner(agent=agent, app_name=name)
+        with self._lock:
+            runner = self._runners.setdefault(key, runner)
+            self._runners.move_to_end(key)
+            self.built += 1
+            while len(self._runners) > self.max_runners:
+                # A call still running on an evicted runner keeps its own reference.
+                self._runners.popitem(last=False)
+        return runner
+
+    @asynccontextmanager
+    async def session(self, name: str, model, instruction: str, output_schema: Optional[Type[BaseModel]] = None) -> AsyncIterator[Tuple[InMemoryRunner, str]]:
+        """A pooled runner and a fresh session on it, deleted on exit."""
+        runner = self.runner(name, model, instruction, output_schema)
+        session = await runner.session_service.create_session(app_name=runner.app_name, user_id=SESSION_USER_ID)
+        with self._lock:
+            self.sessions_created += 1
+            self.live_sessions += 1
+            self.peak_live_sessions = max(self.peak_live_sessions, self.live_sessions)
+        try:
+            yield runner, session.id
+        finally:
+            size = self._session_size(runner, session.id)
+            await runner.session_service.delete_session(app_name=runner.app_name, user_id=SESSION_USER_ID, session_id=session.id)
+            with self._lock:
+                self.sessions_deleted += 1
+                self.live_sessions -= 1
+                self.session_bytes_total += size
+                self.session_bytes_max = max(self.session_bytes_max, size)
+
+    @staticmethod
+    def _session_size(runner: InMemoryRunner, session_id: str) -> int:
+        # Read in place: get_session returns a deep copy, which costs more than the call it measures.
+        stored = runner.session_service.sessions.get(runner.app_name, {}).get(SESSION_USER_ID, {}).get(session_id)
+        if stored is None:
+            return 0
+        return sum(
+            len(part.text or "")
+            for event in stored.events
+            if event.content and event.content.parts
+            for part in event.content.parts
+        )
+
+    def stored_sessions(self) -> int:
+        """Sessions still held by the pooled runners' session services; 0 when nothing is running."""
+        with self._lock:
+            runners = list(self._runners.values())
+        return sum(
+            len(sessions)
+            for runner in runners
+            for sessions in runner.session_service.sessions.get(runner.app_name, {}).values()
+        )
+
+    def stats(self) -> dict:
+        stored = self.stored_sessions()
+        with self._lock:
+            return {
+                "runners": len(self._runners),
+                "built": self.built,
+                "reused": self.reused,
+                "live_sessions": self.live_sessions,
+                "stored_sessions": stored,
+                "peak_live_sessions": self.peak_live_sessions,
+                "sessions_created": self.sessions_created,
+                "sessions_deleted": self.sessions_deleted,
+                "session_text_bytes_avg": round(self.session_bytes_total / self.sessions_deleted) if self.sessions_deleted else 0,
+                "session_text_bytes_max": self.session_bytes_max,
+            }
+
+
+agent_pool = AgentPool()
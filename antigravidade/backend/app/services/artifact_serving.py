@@ -0,0 +1,229 @@
+import gzip
+import mimetypes
+import os
+import threading
+from dataclasses import dataclass
+from typing import Iterator, List, Optional, Tuple
+
+from app.core.config import settings
+from app.services.disk_cache import DiskCache
+from app.services.media_hash import file_sha256
+from app.services.upload_store import OBJECTS_DIRNAME
+
+try:
+    import brotli
+except ImportError:  # gzip only
+    brotli = None
+
+# Text artifacts worth keeping compressed copies of; media and DOCX are already compressed.
+COMPRESSIBLE_EXTENSIONS = {".txt", ".md", ".json", ".srt", ".vtt", ".csv", ".html"}
+MAX_COMPRESSIBLE_BYTES = 32 * 1024 * 1024
+READ_CHUNK_SIZE = 256 * 1024
+# Content-addressed files never change under their URL.
+IMMUTABLE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+# Outputs are rewritten in place (a manual regenerated for the same document), so clients revalidate.
+REVALIDATE_CACHE_CONTROL = "no-cache"
+PRIVATE_SUFFIXES = (".sqlite3", ".sqlite3-journal", ".tmp", ".part")
+
+
+class RangeNotSatisfiableError(Exception):
+    status_code = 416
+
+
+def parse_range(header: Optional[str], size: int) -> Optional[Tuple[int, int]]:
+    """
+    The inclusive byte range requested by a `Range: bytes=...` header, or None to
+    send the whole file (no header, another unit, or several ranges).
+    """
+    if not header or not header.startswith("bytes="):
+        return None
+    spec = header[len("bytes="):].strip()
+    if "," in spec:
+        return None
+    start_text, _, end_text = spec.partition("-")
+    try:
+        if not start_text:
+            suffix = int(end_text)
+            if suffix <= 0:
+                raise RangeNotSatisfiableError(header)
+            return max(size - suffix, 0), size - 1
+        start = int(start_text)
+        end = int(end_text) if end_text else size - 1
+    except ValueError:
+        return None
+    if start >= size or end < start:
+        raise RangeNotSatisfiableError(header)
+    return start, min(end, size - 1)
+
+
+def choose_encoding(accept_encoding: Optional[str]) -> Optional[str]:
+    """The best precompressed encoding the client accepts: br, then gzip."""
+    accepted = {}
+    for part in (accept_encoding or "").split(","):
+        name, _, params = part.strip().partition(";")
+        quality = 1.0
+        if params.strip().startswith("q="):
+            try:
+                quality = float(params.strip()[2:])
+            except ValueError:
+                quality = 0.0
+        if name:
+            accepted[name.lower()] = quality
+    for encoding in ("br", "gzip") if brotli is not None else ("gzip",):
+        if accepted.get(encoding, accepted.get("*", 0.0)) > 0:
+            return encoding
+    return None
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    candidates = [tag.strip().removeprefix("W/") for tag in if_none_match.split(",")]
+    return etag in candidates
+
+
+def iter_file(path: str, start: int, end: int) -> Iterator[bytes]:
+    """Bytes `start`..`end` (inclusive) of a file, in chunks."""
+    with open(path, "rb") as file:
+        file.seek(start)
+        remaining = end - start + 1
+        while remaining > 0:
+            data = file.read(min(READ_CHUNK_SIZE, remaining))
+            if not data:
+                break
+            remaining -= len(data)
+            yield data
+
+
+def _compress(data: bytes, encoding: str) -> bytes:
+    if encoding == "br":
+        return brotli.compress(data, quality=11)
+    return gzip.compress(data, compresslevel=9, mtime=0)
+
+
+@dataclass
+class Artifact:
+    path: str
+    size: int
+    mtime: float
+    sha256: str
+    media_type: str
+    immutable: bool
+
+    @property
+    def etag(self) -> str:
+        return f'"{self.sha256}"'
+
+    @property
+    def cache_control(self) -> str:
+        return IMMUTABLE_CACHE_CONTROL if self.immutable else REVALIDATE_CACHE_CONTROL
+
+
+class ArtifactServer:
+    """
+    Resolves `/data/...` URLs to files under the data directory and keeps
+    compressed copies of text artifacts.
+
+    ETags are the files' SHA-256, so an unchanged artifact revalidates with a
+    304 however often it is rewritten. Files in content-addressed directories
+    (the upload store) are served as immutable. Compressed copies are cached by
+    content hash and encoding, so a changed transcript never gets a stale one.
+    """
+
+    def __init__(self, root: str, variants: DiskCache, immutable_dirs: List[str] = (), private_dirs: List[str] = ()):
+        self.root = os.path.abspath(str(root))
+        self.variants = variants
+        self.immutable_dirs = [os.path.abspath(str(path)) for path in immutable_dirs]
+        self.private_dirs = [os.path.abspath(str(path)) for path in private_dirs]
+        self.served = 0
+        self.not_modified = 0
+        self.partial = 0
+        self.compressed = 0
+        self.bytes_saved = 0
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _within(path: str, directory: str) -> bool:
+        return os.path.normcase(path).startswith(os.path.normcase(directory) + os.sep)
+
+    def resolve(self, url_path: str) -> Optional[Artifact]:
+        """The artifact at a path relative to the data directory, or None if it is missing or not public."""
+        path = os.path.abspath(os.path.join(self.root, url_path))
+        if not self._within(path, self.root) or any(self._within(path, private) for private in self.private_dirs):
+            return None
+        # Dot directories hold working files, such as the extracted audio in `.audio/`.
+        if any(part.startswith(".") for part in os.path.relpath(path, self.root).split(os.sep)):
+            return None
+        if path.endswith(PRIVATE_SUFFIXES) or not os.path.isfile(path):
+            return None
+        stat = os.stat(path)
+        return Artifact(
+            path=path,
+            size=stat.st_size,
+            mtime=stat.st_mtime,
+            sha256=file_sha256(path),
+            media_type=mimetypes.guess_type(path)[0] or "application/octet-stream",
+            immutable=any(self._within(path, directory) for directory in self.immutable_dirs),
+        )
+
+    def compressible(self, artifact: Artifact) -> bool:
+        extension = os.path.splitext(artifact.path)[1].lower()
+        return extension in COMPRESSIBLE_EXTENSIONS and 0 < artifact.size <= MAX_COMPRESSIBLE_BYTES
+
+    def _build_variant(self, artifact: Artifact, encoding: str) -> bytes:
+        with open(artifact.path, "rb") as file:
+            data = _compress(file.read(), encoding)
+        self.variants.put(f"{artifact.sha256}.{encoding}", data, {"source": os.path.relpath(artifact.path, self.root), "size": artifact.size})
+        return data
+
+    def variant(self, artifact: Artifact, encoding: str) -> Optional[bytes]:
+        """The artifact compressed with `encoding`, built on first use; None when compressing does not pay."""
+        data = self.variants.get(f"{artifact.sha256}.{encoding}")
+        if data is None:
+            data = self._build_variant(artifact, encoding)
+        if len(data) >= artifact.size:
+            return None
+        with self._lock:
+            self.compressed += 1
+            self.bytes_saved += artifact.size - len(data)
+        return data
+
+    def precompress(self, path: str) -> None:
+        """Builds the compressed copies of an artifact that was just written, ahead of its first download."""
+        artifact = self.resolve(os.path.relpath(os.path.abspath(path), self.root))
+        if artifact is None or not self.compressible(artifact):
+            return
+        for encoding in ("br", "gzip") if brotli is not None else ("gzip",):
+            if self.variants.get_meta(f"{artifact.sha256}.{encoding}") is None:
+                self._build_variant(artifact, encoding)
+
+    def record(self, status_code: int) -> None:
+        with self._lock:
+            if status_code == 304:
+                self.not_modified += 1
+            elif status_code == 206:
+                self.partial += 1
+            else:
+                self.served += 1
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "served": self.served,
+                "not_modified": self.not_modified,
+                "partial": self.partial,
+                "compressed": self.compressed,
+                "bytes_saved": self.bytes_saved,
+                "brotli": brotli is not None,
+                "variants": self.variants.stats(),
+            }
+
+
+artifact_server = ArtifactServer(
+    settings.DATA_DIR,
+    DiskCache(settings.ARTIFACT_VARIANT_CACHE_DIR, max_bytes=settings.ARTIFACT_VARIANT_CACHE_MAX_MB * 1024 * 1024, name="artifact_variants"),
+    immutable_dirs=[settings.DATA_DIR / "entrada" / OBJECTS_DIRNAME],
+    private_dirs=[settings.DATA_DIR / "saida" / "cache", settings.UPLOAD_PARTIAL_DIR, settings.DATA_DIR / "run"],
+)
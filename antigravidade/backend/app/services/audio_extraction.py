@@ -0,0 +1,98 @@
+import os
+import shutil
+import subprocess
+import threading
+from typing import Dict
+
+import av
+import numpy as np
+from faster_whisper import decode_audio
+
+from app.services.media_hash import file_sha256
+
+SAMPLE_RATE = 16000
+AUDIO_DIRNAME = ".audio"
+
+_locks: Dict[str, threading.Lock] = {}
+_locks_guard = threading.Lock()
+
+
+def _lock_for(path: str) -> threading.Lock:
+    with _locks_guard:
+        return _locks.setdefault(path, threading.Lock())
+
+
+def audio_artifact_path(media_path: str) -> str:
+    """Where the extracted audio of `media_path` lives: `.audio/<sha256>.f32` beside the upload."""
+    media_abs_path = os.path.abspath(media_path)
+    return os.path.join(os.path.dirname(media_abs_path), AUDIO_DIRNAME, f"{file_sha256(media_abs_path)}.f32")
+
+
+def extract_audio(media_path: str) -> str:
+    """
+    Extracts the audio track of a media file as raw 16 kHz mono float32 PCM.
+
+    The artifact is named after the media content hash, so every retry,
+    re-transcription and chunked run of the same upload decodes the container
+    only once. Uses the ffmpeg binary when available and falls back to the
+    PyAV decoder bundled with faster-whisper.
+    """
+    artifact_path = audio_artifact_path(media_path)
+    with _lock_for(artifact_path):
+        if os.path.exists(artifact_path):
+            return artifact_path
+
+        os.makedirs(os.path.dirname(artifact_path), exist_ok=True)
+        tmp_path = f"{artifact_path}.{os.getpid()}.tmp"
+        ffmpeg = shutil.which("ffmpeg")
+        try:
+            if ffmpeg:
+                print(f"--- AUDIO: Extracting 16 kHz mono PCM from {media_path} with ffmpeg ---")
+                subprocess.run(
+                    [
+                        ffmpeg, "-nostdin", "-v", "error", "-y",
+                        "-i", media_path,
+                        "-vn", "-ac", "1", "-ar", str(SAMPLE_RATE),
+                        "-f", "f32le", "-acodec", "pcm_f32le",
+                        tmp_path,
+                    ],
+                    check=True,
+                    capture_output=True,
+                )
+            else:
+                print(f"--- AUDIO: ffmpeg not found. Decoding {media_path} with PyAV ---")
+                decode_audio(media_path, sampling_rate=SAMPLE_RATE).astype(np.float32).tofile(tmp_path)
+            os.replace(tmp_path, artifact_path)
+        except subprocess.CalledProcessError as exc:
+            raise RuntimeError(f"ffmpeg failed to extract audio: {exc.stderr.decode(errors='replace').strip()}") from exc
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+
+    return artifact_path
+
+
+def load_audio(artifact_path: str) -> np.ndarray:
+    """Maps an extracted audio artifact into memory without reading it."""
+    if os.path.getsize(artifact_path) == 0:
+        return np.zeros(0, dtype=np.float32)
+    return np.memmap(artifact_path, dtype=np.float32, mode="r")
+
+
+def probe_duration(media_path: str) -> float:
+    """
+    Returns the media duration in seconds without decoding it.
+
+    Uses the extracted artifact when it already exists, otherwise reads the
+    container header.
+    """
+    artifact_path = audio_artifact_path(media_path)
+    if os.path.exists(artifact_path):
+        return os.path.getsize(artifact_path) / 4 / SAMPLE_RATE
+    with av.open(media_path) as container:
+        if container.duration is not None:
+            return container.duration / av.time_base
+        stream = next(iter(container.streams.audio), None)
+        if stream is not None and stream.duration is not None:
+            return float(stream.duration * stream.time_base)
+    return 0.0
@@ -0,0 +1,350 @@
+import asyncio
+import base64
+import hashlib
+import json
+import os
+import threading
+import time
+import uuid
+from contextlib import asynccontextmanager
+from dataclasses import asdict, dataclass
+from typing import AsyncIterator, Dict, Optional, Tuple
+
+try:
+    import fcntl
+except ImportError:  # Windows: uploads are serialized per process only
+    fcntl = None
+
+from app.core.config import settings
+from app.services.media_hash import HASH_CHUNK_SIZE
+from app.services.upload_store import UploadStore
+
+
+class UploadError(Exception):
+    """Base class for chunked upload failures; `status_code` is the HTTP status to answer with."""
+    status_code = 400
+
+
+class UploadNotFoundError(UploadError):
+    status_code = 404
+
+
+class UploadOffsetError(UploadError):
+    """The chunk does not start where the upload currently ends (a retried or reordered chunk)."""
+    status_code = 409
+
+    def __init__(self, message: str, offset: int):
+        super().__init__(message)
+        self.offset = offset
+
+
+class ChecksumMismatchError(UploadError):
+    # tus "Checksum Mismatch"
+    status_code = 460
+
+
+def parse_checksum(header: Optional[str]) -> Optional[bytes]:
+    """Parses a tus `Upload-Checksum: sha256 <base64 digest>` header."""
+    if not header:
+        return None
+    algorithm, _, value = header.strip().partition(" ")
+    if algorithm.lower() != "sha256":
+        raise UploadError(f"Unsupported checksum algorithm '{algorithm}'. Use sha256.")
+    try:
+        return base64.b64decode(value.strip(), validate=True)
+    except ValueError:
+        raise UploadError("Upload-Checksum is not valid base64")
+
+
+@dataclass
+class UploadSession:
+    upload_id: str
+    filename: str
+    size: int
+    sha256: Optional[str] = None
+    doc_id: Optional[str] = None
+    offset: int = 0
+    created_at: float = 0.0
+    updated_at: float = 0.0
+    # Time spent receiving and writing chunks; idle time between chunks is not counted.
+    active_seconds: float = 0.0
+
+    @property
+    def throughput_mbps(self) -> float:
+        return round(self.offset / self.active_seconds / 1e6, 2) if self.active_seconds else 0.0
+
+    def status(self) -> dict:
+        return {
+            "upload_id": self.upload_id,
+            "filename": self.filename,
+            "size": self.size,
+            "offset": self.offset,
+            "throughput_mbps": self.throughput_mbps,
+        }
+
+
+class ChunkedUploads:
+    """
+    Resumable uploads in the style of tus: a session is created with the final
+    size, chunks are appended at the offset the server reports, and the file is
+    added to the upload store once it is complete and its checksum matches.
+
+    Chunks are written as they arrive, in a worker thread, so large uploads never
+    block the event loop. Each chunk's SHA-256 is checked before the session's
+    offset moves past it; a chunk that fails the check (or a connection that
+    drops mid-chunk) is cut off again and the client resends from the last
+    committed offset. The whole-file SHA-256 is computed as the chunks arrive,
+    so finalizing does not read the file again, unless this process did not see
+    every chunk (a restart, or chunks handled by another worker). Sessions are
+    kept on disk, so uploads survive a restart.
+    """
+
+    def __init__(self, directory: str, chunk_size: int, ttl_seconds: float):
+        self.directory = str(directory)
+        self.chunk_size = chunk_size
+        self.ttl_seconds = ttl_seconds
+        self._locks: Dict[str, asyncio.Lock] = {}
+        # Running whole-file digests, by upload id, with the offset each covers. Another
+        # worker may have appended since, so a digest is only used at that exact offset.
+        self._digests: Dict[str, Tuple[int, "hashlib._Hash"]] = {}
+        self._stats_lock = threading.Lock()
+        self.completed = 0
+        self.bytes_received = 0
+        self.receive_seconds = 0.0
+        self.checksum_failures = 0
+        os.makedirs(self.directory, exist_ok=True)
+
+    def _meta_path(self, upload_id: str) -> str:
+        return os.path.join(self.directory, f"{upload_id}.json")
+
+    def part_path(self, upload_id: str) -> str:
+        return os.path.join(self.directory, f"{upload_id}.part")
+
+    def _save(self, session: UploadSession) -> None:
+        tmp_path = f"{self._meta_path(session.upload_id)}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as file:
+            json.dump(asdict(session), file)
+        os.replace(tmp_path, self._meta_path(session.upload_id))
+
+    def _lock(self, upload_id: str) -> asyncio.Lock:
+        return self._locks.setdefault(upload_id, asyncio.Lock())
+
+    def _flock(self, upload_id: str):
+        """
+        Takes an exclusive flock on the upload's part file and returns the handle
+        holding it. A request another worker is still serving fails with the
+        offset the upload is at, like a chunk sent at the wrong offset.
+        """
+        self.get(upload_id)
+        if fcntl is None:
+            return None
+        try:
+            handle = open(self.part_path(upload_id), "rb")
+        except FileNotFoundError:
+            raise UploadNotFoundError("Upload not found")
+        try:
+            fcntl.flock(handle, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            handle.close()
+            offset = self.get(upload_id).offset
+            raise UploadOffsetError(f"Another request is writing to this upload, which is at offset {offset}", offset)
+        return handle
+
+    @asynccontextmanager
+    async def _locked(self, upload_id: str):
+        """Serializes the work on one upload across tasks and across worker processes."""
+        async with self._lock(upload_id):
+            handle = await asyncio.to_thread(self._flock, upload_id)
+            try:
+                yield
+            finally:
+                if handle is not None:
+                    handle.close()
+
+    def create(self, filename: str, size: int, sha256: Optional[str] = None, doc_id: Optional[str] = None) -> UploadSession:
+        filename = os.path.basename(filename or "")
+        if not filename:
+            raise UploadError("filename is required")
+        if size < 0:
+            raise UploadError("size must not be negative")
+        now = time.time()
+        session = UploadSession(
+            upload_id=uuid.uuid4().hex,
+            filename=filename,
+            size=size,
+            sha256=sha256.lower() if sha256 else None,
+            doc_id=doc_id,
+            created_at=now,
+            updated_at=now,
+        )
+        open(self.part_path(session.upload_id), "wb").close()
+        self._save(session)
+        print(f"--- UPLOAD: Session {session.upload_id[:8]} created for '{filename}' ({size} bytes) ---")
+        return session
+
+    def get(self, upload_id: str) -> UploadSession:
+        if not upload_id.isalnum():
+            raise UploadNotFoundError("Upload not found")
+        try:
+            with open(self._meta_path(upload_id), encoding="utf-8") as file:
+                return UploadSession(**json.load(file))
+        except FileNotFoundError:
+            raise UploadNotFoundError("Upload not found")
+
+    def _write(self, upload_id: str, offset: int, data: bytes) -> None:
+        with open(self.part_path(upload_id), "r+b") as file:
+            file.seek(offset)
+            file.write(data)
+
+    def _commit(self, upload_id: str, offset: int) -> None:
+        # Anything past the committed offset is an unverified or torn chunk.
+        with open(self.part_path(upload_id), "r+b") as file:
+            file.truncate(offset)
+            file.flush()
+            os.fsync(file.fileno())
+
+    async def append(
+        self,
+        upload_id: str,
+        offset: int,
+        chunks: AsyncIterator[bytes],
+        checksum: Optional[bytes] = None,
+    ) -> UploadSession:
+        """Appends one chunk, streamed from `chunks`, at `offset`."""
+        async with self._locked(upload_id):
+            session = await asyncio.to_thread(self.get, upload_id)
+            if offset != session.offset:
+                raise UploadOffsetError(f"Upload is at offset {session.offset}, not {offset}", session.offset)
+
+            started = time.perf_counter()
+            digest = hashlib.sha256()
+            whole = self._digest_at(upload_id, offset)
+            position = offset
+            try:
+                async for data in chunks:
+                    if not data:
+                        continue
+                    if position + len(data) > session.size:
+                        raise UploadError(f"Chunk goes past the declared size of {session.size} bytes")
+                    digest.update(data)
+                    if whole is not None:
+                        whole.update(data)
+                    await asyncio.to_thread(self._write, upload_id, position, data)
+                    position += len(data)
+            except BaseException:
+                await asyncio.to_thread(self._commit, upload_id, session.offset)
+                raise
+
+            if checksum is not None and digest.digest() != checksum:
+                with self._stats_lock:
+                    self.checksum_failures += 1
+                await asyncio.to_thread(self._commit, upload_id, session.offset)
+                raise ChecksumMismatchError("Chunk checksum does not match; resend it from the current offset")
+
+            await asyncio.to_thread(self._commit, upload_id, position)
+            if whole is not None:
+                self._digests[upload_id] = (position, whole)
+            else:
+                self._digests.pop(upload_id, None)
+            elapsed = time.perf_counter() - started
+            received = position - session.offset
+            session.offset = position
+            session.active_seconds += elapsed
+            session.updated_at = time.time()
+            await asyncio.to_thread(self._save, session)
+
+            with self._stats_lock:
+                self.bytes_received += received
+                self.receive_seconds += elapsed
+            return session
+
+    def _digest_at(self, upload_id: str, offset: int):
+        """A copy of the running digest if it covers exactly `offset` bytes, else None."""
+        if offset == 0:
+            return hashlib.sha256()
+        stored = self._digests.get(upload_id)
+        if stored is None or stored[0] != offset:
+            return None
+        return stored[1].copy()
+
+    def _file_sha256(self, path: str) -> str:
+        digest = hashlib.sha256()
+        with open(path, "rb") as file:
+            for chunk in iter(lambda: file.read(HASH_CHUNK_SIZE), b""):
+                digest.update(chunk)
+        return digest.hexdigest()
+
+    def _finalize(self, upload_id: str, store: UploadStore) -> tuple:
+        session = self.get(upload_id)
+        if session.offset != session.size:
+            raise UploadOffsetError(f"Upload is incomplete: {session.offset} of {session.size} bytes", session.offset)
+
+        part_path = self.part_path(upload_id)
+        digest = self._digest_at(upload_id, session.size)
+        self._digests.pop(upload_id, None)
+        sha256 = digest.hexdigest() if digest is not None else self._file_sha256(part_path)
+        if session.sha256 and sha256 != session.sha256:
+            with self._stats_lock:
+                self.checksum_failures += 1
+            self.discard(upload_id)
+            raise ChecksumMismatchError("File checksum does not match; the upload was discarded")
+
+        path = store.add(part_path, sha256, session.filename)
+        os.remove(self._meta_path(upload_id))
+        return path, sha256, session
+
+    async def finalize(self, upload_id: str, store: UploadStore) -> tuple:
+        """Verifies a complete upload and adds it to `store`. Returns (path, sha256, session)."""
+        async with self._locked(upload_id):
+            path, sha256, session = await asyncio.to_thread(self._finalize, upload_id, store)
+        self._locks.pop(upload_id, None)
+        with self._stats_lock:
+            self.completed += 1
+        print(f"--- UPLOAD: '{session.filename}' complete ({session.size} bytes, {session.throughput_mbps} MB/s) ---")
+        return path, sha256, session
+
+    def discard(self, upload_id: str) -> None:
+        if not upload_id.isalnum():
+            return
+        for path in (self.part_path(upload_id), self._meta_path(upload_id)):
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+        self._locks.pop(upload_id, None)
+        self._digests.pop(upload_id, None)
+
+    def discard_expired(self) -> int:
+        """Removes sessions that have not received a chunk within the TTL."""
+        cutoff = time.time() - self.ttl_seconds
+        expired = 0
+        for name in os.listdir(self.directory):
+            if not name.endswith(".json"):
+                continue
+            upload_id = name[:-len(".json")]
+            try:
+                session = self.get(upload_id)
+            except (UploadError, ValueError, TypeError):
+                continue
+            if session.updated_at < cutoff:
+                self.discard(upload_id)
+                expired += 1
+        return expired
+
+    def stats(self) -> dict:
+        active = sum(1 for name in os.listdir(self.directory) if name.endswith(".json"))
+        with self._stats_lock:
+            return {
+                "active_sessions": active,
+                "completed": self.completed,
+                "bytes_received": self.bytes_received,
+                "throughput_mbps": round(self.bytes_received / self.receive_seconds / 1e6, 2) if self.receive_seconds else 0.0,
+                "checksum_failures": self.checksum_failures,
+            }
+
+
+chunked_uploads = ChunkedUploads(
+    settings.UPLOAD_PARTIAL_DIR,
+    chunk_size=settings.UPLOAD_CHUNK_MB * 1024 * 1024,
+    ttl_seconds=settings.UPLOAD_SESSION_TTL_HOURS * 3600,
+)
@@ -0,0 +1,134 @@
+import json
+import os
+import threading
+from typing import List, Optional, Tuple
+
+from app.core.config import settings
+from app.services.transcription_profiles import TranscriptionProfile
+
+# Weight of the newest observation in the moving averages.
+EMA_WEIGHT = 0.2
+# Gemini tokenizes Portuguese prose at roughly four characters per token.
+CHARS_PER_TOKEN = 4.0
+# Priors used until a profile or stage has been observed.
+DEFAULT_TRANSCRIPT_CHARS_PER_SECOND = 14.0
+DEFAULT_OUTPUT_RATIO = 1.0
+DEFAULT_OUTPUT_TOKENS_PER_SECOND = 100.0
+
+
+def estimate_tokens(chars: float) -> int:
+    return int(round(chars / CHARS_PER_TOKEN))
+
+
+def _average(previous: Optional[float], value: float) -> float:
+    return value if previous is None else previous + EMA_WEIGHT * (value - previous)
+
+
+class ThroughputHistory:
+    """
+    Moving averages of how fast transcription and each LLM stage have run here,
+    kept in a small JSON file so estimates improve across restarts.
+    """
+
+    def __init__(self, path: str):
+        self.path = str(path)
+        self._lock = threading.Lock()
+        try:
+            with open(self.path, encoding="utf-8") as file:
+                self._data = json.load(file)
+        except (FileNotFoundError, json.JSONDecodeError):
+            self._data = {}
+        self._data.setdefault("transcription", {})
+        self._data.setdefault("llm", {})
+
+    def _save(self) -> None:
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        tmp_path = f"{self.path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as file:
+            json.dump(self._data, file, indent=2)
+        os.replace(tmp_path, self.path)
+
+    def record_transcription(self, profile: str, audio_seconds: float, wall_seconds: float, transcript_chars: int) -> None:
+        if not audio_seconds:
+            return
+        with self._lock:
+            entry = self._data["transcription"].setdefault(profile, {"samples": 0})
+            entry["realtime_factor"] = _average(entry.get("realtime_factor"), wall_seconds / audio_seconds)
+            entry["chars_per_second"] = _average(entry.get("chars_per_second"), transcript_chars / audio_seconds)
+            entry["samples"] += 1
+            self._save()
+
+    def record_llm(self, stage: str, input_chars: int, output_chars: int, seconds: float) -> None:
+        if not input_chars or seconds <= 0:
+            return
+        with self._lock:
+            entry = self._data["llm"].setdefault(stage, {"samples": 0})
+            entry["output_ratio"] = _average(entry.get("output_ratio"), output_chars / input_chars)
+            entry["output_tokens_per_second"] = _average(entry.get("output_tokens_per_second"), estimate_tokens(output_chars) / seconds)
+            entry["samples"] += 1
+            self._save()
+
+    def transcription(self, profile: TranscriptionProfile) -> dict:
+        with self._lock:
+            entry = dict(self._data["transcription"].get(profile.name, {}))
+        return {
+            "realtime_factor": entry.get("realtime_factor", profile.realtime_factor),
+            "chars_per_second": entry.get("chars_per_second", DEFAULT_TRANSCRIPT_CHARS_PER_SECOND),
+            "samples": entry.get("samples", 0),
+        }
+
+    def llm(self, stage: str) -> dict:
+        with self._lock:
+            entry = dict(self._data["llm"].get(stage, {}))
+        return {
+            "output_ratio": entry.get("output_ratio", DEFAULT_OUTPUT_RATIO),
+            "output_tokens_per_second": entry.get("output_tokens_per_second", DEFAULT_OUTPUT_TOKENS_PER_SECOND),
+            "samples": entry.get("samples", 0),
+        }
+
+    def stats(self) -> dict:
+        with self._lock:
+            return json.loads(json.dumps(self._data))
+
+
+def estimate_transcription(duration: float, profile: TranscriptionProfile, history: ThroughputHistory) -> dict:
+    observed = history.transcription(profile)
+    return {
+        "profile": profile.name,
+        "audio_seconds": round(duration, 1),
+        "seconds": round(duration * observed["realtime_factor"], 1),
+        "realtime_factor": round(observed["realtime_factor"], 4),
+        "transcript_chars": int(duration * observed["chars_per_second"]),
+        "based_on_runs": observed["samples"],
+    }
+
+
+def estimate_llm_stages(stages: List[Tuple[str, int]], context_chars: int, history: ThroughputHistory) -> dict:
+    """
+    Chains the stages of a pipeline run: each stage reads its prompt (instruction
+    and template, `prompt_chars`) plus the previous stage's output, and writes
+    `output_ratio` times what it read.
+    """
+    estimates = []
+    for stage, prompt_chars in stages:
+        observed = history.llm(stage)
+        input_chars = prompt_chars + context_chars
+        output_chars = input_chars * observed["output_ratio"]
+        output_tokens = estimate_tokens(output_chars)
+        estimates.append({
+            "stage": stage,
+            "input_tokens": estimate_tokens(input_chars),
+            "output_tokens": output_tokens,
+            "seconds": round(output_tokens / observed["output_tokens_per_second"], 1),
+            "based_on_runs": observed["samples"],
+        })
+        context_chars = int(output_chars)
+    return {
+        "stages": estimates,
+        "input_tokens": sum(stage["input_tokens"] for stage in estimates),
+        "output_tokens": sum(stage["output_tokens"] for stage in estimates),
+        "seconds": round(sum(stage["seconds"] for stage in estimates), 1),
+    }
+
+
+throughput_history = ThroughputHistory(settings.THROUGHPUT_HISTORY_PATH)
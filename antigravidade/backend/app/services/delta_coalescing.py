@@ -0,0 +1,72 @@
+import asyncio
+from typing import AsyncIterator
+
+# A burst of deltas is flushed early once it holds this much text.
+MAX_COALESCED_CHARS = 4096
+
+
+async def coalesce_deltas(events: AsyncIterator[dict], interval: float, max_chars: int = MAX_COALESCED_CHARS) -> AsyncIterator[dict]:
+    """
+    Merges `{"type": "delta", "text": ...}` events so that at most one is emitted
+    per `interval` seconds; other events pass through, after any buffered text.
+
+    The first delta is emitted at once, so the client sees content as soon as
+    the model produces it. Buffered text is flushed when the interval elapses
+    even if the model has paused, not only when the next delta arrives.
+    """
+    loop = asyncio.get_running_loop()
+    iterator = events.__aiter__()
+    pending = None
+    buffer = []
+    buffered_chars = 0
+    deadline = None
+    sent = False
+    try:
+        while True:
+            if pending is None:
+                pending = asyncio.ensure_future(iterator.__anext__())
+            timeout = max(deadline - loop.time(), 0) if buffer else None
+            done, _ = await asyncio.wait({pending}, timeout=timeout)
+            if not done:
+                yield {"type": "delta", "text": "".join(buffer)}
+                buffer, buffered_chars = [], 0
+                continue
+
+            try:
+                event = pending.result()
+            except StopAsyncIteration:
+                break
+            finally:
+                pending = None
+
+            if event["type"] != "delta":
+                if buffer:
+                    yield {"type": "delta", "text": "".join(buffer)}
+                    buffer, buffered_chars = [], 0
+                yield event
+                continue
+            if not sent:
+                sent = True
+                yield event
+                continue
+            if not buffer:
+                deadline = loop.time() + interval
+            buffer.append(event["text"])
+            buffered_chars += len(event["text"])
+            if buffered_chars >= max_chars:
+                yield {"type": "delta", "text": "".join(buffer)}
+                buffer, buffered_chars = [], 0
+
+        if buffer:
+            yield {"type": "delta", "text": "".join(buffer)}
+    finally:
+        if pending is not None:
+            # The source must be idle before it can be closed.
+            pending.cancel()
+            try:
+                await pending
+            except (asyncio.CancelledError, Exception):
+                pass
+        close = getattr(iterator, "aclose", None)
+        if close is not None:
+            await close()
@@ -0,0 +1,150 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from typing import Optional
+
+
+class DiskCache:
+    """
+    Content-addressed blob cache with an SQLite index.
+
+    Each entry is stored as a file named after its key, and the index records
+    its size, SHA-256 digest and last access time. Reads verify the digest, so a
+    truncated or edited file is treated as a miss and dropped. When the total
+    size grows past `max_bytes`, the least recently used entries are evicted.
+    With `ttl_seconds`, entries older than that are treated as misses and dropped.
+    """
+
+    def __init__(self, directory: str, max_bytes: int, name: str = "cache", ttl_seconds: Optional[float] = None):
+        self.directory = str(directory)
+        self.max_bytes = max_bytes
+        self.name = name
+        self.ttl_seconds = ttl_seconds
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.integrity_failures = 0
+
+        os.makedirs(self.directory, exist_ok=True)
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(os.path.join(self.directory, "index.sqlite3"), check_same_thread=False)
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS entries ("
+            " key TEXT PRIMARY KEY,"
+            " size INTEGER NOT NULL,"
+            " digest TEXT NOT NULL,"
+            " created_at REAL NOT NULL,"
+            " last_access REAL NOT NULL,"
+            " hits INTEGER NOT NULL DEFAULT 0,"
+            " meta TEXT)"
+        )
+        self._db.execute("CREATE INDEX IF NOT EXISTS entries_last_access ON entries (last_access)")
+        self._db.commit()
+
+    def path_for(self, key: str) -> str:
+        return os.path.join(self.directory, key[:2], key)
+
+    def _drop(self, key: str) -> None:
+        self._db.execute("DELETE FROM entries WHERE key = ?", (key,))
+        self._db.commit()
+        try:
+            os.remove(self.path_for(key))
+        except FileNotFoundError:
+            pass
+
+    def get(self, key: str) -> Optional[bytes]:
+        with self._lock:
+            row = self._db.execute("SELECT digest, created_at FROM entries WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+
+            if self.ttl_seconds is not None and time.time() - row[1] > self.ttl_seconds:
+                self.expirations += 1
+                self.misses += 1
+                self._drop(key)
+                return None
+
+            try:
+                with open(self.path_for(key), "rb") as file:
+                    data = file.read()
+            except OSError:
+                data = None
+
+            if data is None or hashlib.sha256(data).hexdigest() != row[0]:
+                print(f"--- CACHE WARNING: Entry {key} in '{self.name}' failed its integrity check. Dropping it. ---")
+                self.integrity_failures += 1
+                self.misses += 1
+                self._drop(key)
+                return None
+
+            self._db.execute(
+                "UPDATE entries SET last_access = ?, hits = hits + 1 WHERE key = ?",
+                (time.time(), key),
+            )
+            self._db.commit()
+            self.hits += 1
+            return data
+
+    def get_text(self, key: str) -> Optional[str]:
+        data = self.get(key)
+        return data.decode("utf-8") if data is not None else None
+
+    def get_meta(self, key: str) -> Optional[dict]:
+        with self._lock:
+            row = self._db.execute("SELECT meta FROM entries WHERE key = ?", (key,)).fetchone()
+        if row is None:
+            return None
+        return json.loads(row[0]) if row[0] else {}
+
+    def put(self, key: str, data: bytes, meta: Optional[dict] = None) -> None:
+        path = self.path_for(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "wb") as file:
+            file.write(data)
+        os.replace(tmp_path, path)
+
+        now = time.time()
+        with self._lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO entries (key, size, digest, created_at, last_access, hits, meta)"
+                " VALUES (?, ?, ?, ?, ?, 0, ?)",
+                (key, len(data), hashlib.sha256(data).hexdigest(), now, now, json.dumps(meta or {})),
+            )
+            self._db.commit()
+            self._evict()
+
+    def put_text(self, key: str, text: str, meta: Optional[dict] = None) -> None:
+        self.put(key, text.encode("utf-8"), meta)
+
+    def _evict(self) -> None:
+        total = self._db.execute("SELECT COALESCE(SUM(size), 0) FROM entries").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        for key, size in self._db.execute("SELECT key, size FROM entries ORDER BY last_access ASC").fetchall():
+            if total <= self.max_bytes:
+                break
+            self._drop(key)
+            total -= size
+            self.evictions += 1
+
+    def stats(self) -> dict:
+        with self._lock:
+            entries, total = self._db.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM entries").fetchone()
+        lookups = self.hits + self.misses
+        return {
+            "entries": entries,
+            "bytes": total,
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 3) if lookups else 0.0,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+            "integrity_failures": self.integrity_failures,
+        }
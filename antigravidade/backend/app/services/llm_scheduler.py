@@ -0,0 +1,309 @@
+import asyncio
+import random
+import re
+import threading
+import time
+from collections import OrderedDict, deque
+from typing import AsyncIterator, Callable, Deque, Dict, Optional
+
+from app.core.config import settings
+
+# Served strictly in this order; within a class, users take turns.
+PRIORITIES = ("interactive", "batch")
+# Calls kept for the per-call queue-wait report in stats().
+RECENT_CALLS = 50
+# After a 429 the refill rate is halved, and regains this share of the limit per successful call.
+RATE_RECOVERY_STEP = 0.05
+MIN_RATE_FACTOR = 0.1
+
+_RETRY_DELAY = re.compile(r"retryDelay['\"]?\s*:\s*['\"]?(\d+(?:\.\d+)?)s")
+
+
+class UnknownPriorityError(ValueError):
+    pass
+
+
+def is_rate_limit_error(error: BaseException) -> bool:
+    """A provider quota error (HTTP 429 / RESOURCE_EXHAUSTED), however the SDK wrapped it."""
+    if getattr(error, "code", None) == 429 or getattr(error, "status_code", None) == 429:
+        return True
+    return "RESOURCE_EXHAUSTED" in str(error)
+
+
+def retry_delay(error: BaseException) -> Optional[float]:
+    """The wait Gemini asks for in a 429's RetryInfo, if it sent one."""
+    match = _RETRY_DELAY.search(str(error))
+    return float(match.group(1)) if match else None
+
+
+class TokenBucket:
+    """Allows `per_minute` units a minute, refilled continuously, with up to a minute's worth in a burst."""
+
+    def __init__(self, per_minute: float):
+        self.capacity = float(per_minute)
+        self.level = self.capacity
+        self.updated = time.monotonic()
+
+    def refill(self, now: float, rate_factor: float) -> None:
+        self.level = min(self.capacity, self.level + (now - self.updated) * self.capacity / 60 * rate_factor)
+        self.updated = now
+
+    def wait_time(self, amount: float, rate_factor: float) -> float:
+        # A call larger than the whole bucket waits for a full bucket, not forever.
+        missing = min(amount, self.capacity) - self.level
+        return max(missing, 0.0) / (self.capacity / 60 * rate_factor)
+
+    def take(self, amount: float) -> None:
+        self.level -= min(amount, self.capacity)
+
+
+class _Waiter:
+    def __init__(self, stage: str, user: str, priority: str, tokens: int, future: asyncio.Future):
+        self.stage = stage
+        self.user = user
+        self.priority = priority
+        self.tokens = tokens
+        self.future = future
+        self.enqueued_at = time.monotonic()
+
+
+class LlmScheduler:
+    """
+    One queue for every Gemini call of the process, admitting calls within the
+    account's requests-per-minute and tokens-per-minute quota.
+
+    A call reserves one request and its estimated tokens from two token buckets;
+    the reservation is corrected to the tokens it actually used when it ends.
+    Waiting calls are served by priority class (interactive before batch) and,
+    within a class, one call per user in turn, so a user with many chunks
+    queued does not hold back the others. The next call in that order waits
+    until both buckets cover it; nothing behind it is admitted first, so large
+    calls are not starved by small ones.
+
+    A 429 pauses admission for every caller (the delay Gemini asks for, or an
+    exponential backoff with jitter) and halves the refill rate, which then
+    recovers call by call. The failed call goes back to the front of its user's
+    queue, so one quota error does not turn into a retry from every pipeline.
+    """
+
+    def __init__(self, requests_per_minute: int, tokens_per_minute: int, max_retries: int, backoff_max_seconds: float):
+        self.requests = TokenBucket(requests_per_minute)
+        self.tokens = TokenBucket(tokens_per_minute)
+        self.max_retries = max_retries
+        self.backoff_max = backoff_max_seconds
+        self.rate_factor = 1.0
+        self.paused_until = 0.0
+        self._consecutive_429 = 0
+        self._queues: Dict[str, "OrderedDict[str, Deque[_Waiter]]"] = {priority: OrderedDict() for priority in PRIORITIES}
+        self._timer: Optional[asyncio.TimerHandle] = None
+        self._lock = threading.Lock()
+
+        self.admitted = 0
+        self.completed = 0
+        self.rate_limited = 0
+        self.retries = 0
+        self.wait_seconds_total = {priority: 0.0 for priority in PRIORITIES}
+        self.wait_seconds_max = {priority: 0.0 for priority in PRIORITIES}
+        self.admitted_by_priority = {priority: 0 for priority in PRIORITIES}
+        self._recent: Deque[dict] = deque(maxlen=RECENT_CALLS)
+
+    # --- Queue ---
+
+    def _next(self) -> Optional[_Waiter]:
+        for priority in PRIORITIES:
+            users = self._queues[priority]
+            while users:
+                user, waiters = next(iter(users.items()))
+                while waiters and (waiters[0].future.done() or waiters[0].future.get_loop().is_closed()):
+                    # Cancelled while queued, or left behind by a closed event loop.
+                    waiters.popleft()
+                if waiters:
+                    return waiters[0]
+                del users[user]
+        return None
+
+    def _pop(self, waiter: _Waiter) -> None:
+        users = self._queues[waiter.priority]
+        waiters = users[waiter.user]
+        waiters.popleft()
+        if waiters:
+            # The user goes to the back of the turn order.
+            users.move_to_end(waiter.user)
+        else:
+            del users[waiter.user]
+
+    def _dispatch(self) -> None:
+        with self._lock:
+            self._timer = None
+            while True:
+                waiter = self._next()
+                if waiter is None:
+                    return
+                now = time.monotonic()
+                self.requests.refill(now, self.rate_factor)
+                self.tokens.refill(now, self.rate_factor)
+                wait = max(
+                    self.paused_until - now,
+                    self.requests.wait_time(1, self.rate_factor),
+                    self.tokens.wait_time(waiter.tokens, self.rate_factor),
+                )
+                if wait > 0:
+                    self._timer = waiter.future.get_loop().call_later(wait, self._dispatch)
+                    return
+                self._pop(waiter)
+                self.requests.take(1)
+                self.tokens.take(waiter.tokens)
+                waiter.future.set_result(now - waiter.enqueued_at)
+
+    def _wake(self) -> None:
+        if self._timer is not None:
+            self._timer.cancel()
+        self._dispatch()
+
+    async def acquire(self, stage: str, user: str, priority: str, tokens: int, retry: bool = False) -> float:
+        """Waits for the call's turn and quota; returns the seconds it waited."""
+        if priority not in PRIORITIES:
+            raise UnknownPriorityError(f"Unknown LLM priority '{priority}'. Use one of: {', '.join(PRIORITIES)}")
+        waiter = _Waiter(stage, user, priority, tokens, asyncio.get_running_loop().create_future())
+        with self._lock:
+            users = self._queues[priority]
+            waiters = users.setdefault(user, deque())
+            if retry:
+                # A call sent back by a 429 keeps its place ahead of its user's later calls.
+                waiters.appendleft(waiter)
+                users.move_to_end(user, last=False)
+            else:
+                waiters.append(waiter)
+        self._wake()
+        try:
+            wait = await waiter.future
+        except asyncio.CancelledError:
+            with self._lock:
+                if waiter.future.done() and not waiter.future.cancelled():
+                    # Admitted as it was cancelled: give the reservation back.
+                    self.tokens.level += min(tokens, self.tokens.capacity)
+                    self.requests.level += 1
+            raise
+        with self._lock:
+            self.admitted += 1
+            self.admitted_by_priority[priority] += 1
+            self.wait_seconds_total[priority] += wait
+            self.wait_seconds_max[priority] = max(self.wait_seconds_max[priority], wait)
+        return wait
+
+    # --- Outcomes ---
+
+    def settle(self, reserved_tokens: int, used_tokens: int) -> None:
+        """Corrects a call's token reservation to what it used; later calls wait for any overrun."""
+        with self._lock:
+            self.tokens.level += min(reserved_tokens, self.tokens.capacity) - used_tokens
+            self.completed += 1
+            self._consecutive_429 = 0
+            self.rate_factor = min(1.0, self.rate_factor + RATE_RECOVERY_STEP)
+        self._wake()
+
+    def backoff(self, error: BaseException) -> float:
+        """Pauses admission after a 429 and lowers the refill rate; returns the pause in seconds."""
+        with self._lock:
+            self.rate_limited += 1
+            self._consecutive_429 += 1
+            self.rate_factor = max(MIN_RATE_FACTOR, self.rate_factor / 2)
+            exponential = min(self.backoff_max, 2 ** (self._consecutive_429 - 1))
+            pause = min(self.backoff_max, max(retry_delay(error) or 0.0, exponential * random.uniform(0.5, 1.0)))
+            self.paused_until = max(self.paused_until, time.monotonic() + pause)
+            return pause
+
+    def _record(self, stage: str, user: str, priority: str, wait: float, tokens: int, attempts: int) -> None:
+        with self._lock:
+            self._recent.append({
+                "stage": stage,
+                "user": user,
+                "priority": priority,
+                "queue_wait_seconds": round(wait, 3),
+                "tokens": tokens,
+                "attempts": attempts,
+            })
+
+    async def stream(
+        self,
+        stage: str,
+        user: str,
+        priority: str,
+        tokens: int,
+        call: Callable[[], AsyncIterator[dict]],
+        used_tokens: Callable[[str], int],
+    ) -> AsyncIterator[dict]:
+        """
+        Runs a streamed LLM call (`call()` yields delta events and then a result
+        event) once the scheduler admits it, retrying quota errors that happen
+        before any text was produced. The result event gains `queue_wait`, the
+        seconds the call spent queued, over all its attempts.
+        """
+        waited = 0.0
+        attempts = 0
+        while True:
+            waited += await self.acquire(stage, user, priority, tokens, retry=attempts > 0)
+            attempts += 1
+            used = tokens
+            produced = False
+            try:
+                async for event in call():
+                    if event["type"] == "result":
+                        used = used_tokens(event["text"])
+                        self._record(stage, user, priority, waited, used, attempts)
+                        event = {**event, "queue_wait": round(waited, 3)}
+                    produced = True
+                    yield event
+            except Exception as error:
+                # The failed attempt's reservation is spent; the provider counted it.
+                if produced or not is_rate_limit_error(error):
+                    raise
+                pause = self.backoff(error)
+                if attempts > self.max_retries:
+                    raise
+                with self._lock:
+                    self.retries += 1
+                print(f"--- LLM SCHEDULER: {stage} rate limited, pausing Gemini calls for {pause:.1f}s (attempt {attempts}) ---")
+                continue
+            self.settle(tokens, used)
+            return
+
+    def stats(self) -> dict:
+        with self._lock:
+            now = time.monotonic()
+            return {
+                "limits": {
+                    "requests_per_minute": self.requests.capacity,
+                    "tokens_per_minute": self.tokens.capacity,
+                    "rate_factor": round(self.rate_factor, 3),
+                },
+                "available": {
+                    "requests": round(self.requests.level, 1),
+                    "tokens": round(self.tokens.level),
+                },
+                "queued": {
+                    priority: sum(len(waiters) for waiters in self._queues[priority].values())
+                    for priority in PRIORITIES
+                },
+                "paused_seconds": round(max(self.paused_until - now, 0.0), 1),
+                "admitted": self.admitted,
+                "completed": self.completed,
+                "rate_limited": self.rate_limited,
+                "retries": self.retries,
+                "queue_wait_seconds": {
+                    priority: {
+                        "avg": round(self.wait_seconds_total[priority] / self.admitted_by_priority[priority], 3) if self.admitted_by_priority[priority] else 0.0,
+                        "max": round(self.wait_seconds_max[priority], 3),
+                    }
+                    for priority in PRIORITIES
+                },
+                "recent_calls": list(self._recent),
+            }
+
+
+llm_scheduler = LlmScheduler(
+    requests_per_minute=settings.GEMINI_REQUESTS_PER_MINUTE,
+    tokens_per_minute=settings.GEMINI_TOKENS_PER_MINUTE,
+    max_retries=settings.GEMINI_RATE_LIMIT_RETRIES,
+    backoff_max_seconds=settings.GEMINI_BACKOFF_MAX_SECONDS,
+)
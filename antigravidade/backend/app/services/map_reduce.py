@@ -0,0 +1,82 @@
+import asyncio
+import math
+import re
+from typing import AsyncIterator, Awaitable, Callable, List, Sequence, Tuple
+
+_PARAGRAPH_BREAK = re.compile(r"\n\s*\n")
+_SENTENCE_END = re.compile(r"(?<=[.!?…])\s+")
+# A chunk this full is closed at a paragraph break rather than filled further.
+_PARAGRAPH_CUT_FILL = 0.75
+
+
+def _sentences(paragraph: str, max_chars: int) -> List[str]:
+    sentences = []
+    for sentence in _SENTENCE_END.split(paragraph):
+        # A run-on "sentence" (no punctuation in the transcript) is cut between words.
+        while len(sentence) > max_chars:
+            cut = sentence.rfind(" ", 0, max_chars)
+            cut = cut if cut > 0 else max_chars
+            sentences.append(sentence[:cut])
+            sentence = sentence[cut:].lstrip()
+        if sentence:
+            sentences.append(sentence)
+    return sentences
+
+
+def split_transcript(text: str, max_chars: int) -> List[str]:
+    """
+    Splits a long text into chunks of at most `max_chars` and of similar size,
+    cutting only between sentences and preferring paragraph breaks, so every
+    chunk holds complete passages. Paragraph breaks inside a chunk are kept.
+    """
+    text = text.strip()
+    if len(text) <= max_chars:
+        return [text] if text else []
+    # Aim for even chunks, so the last one is not a short remainder.
+    target = min(max_chars, math.ceil(len(text) / math.ceil(len(text) / max_chars)))
+
+    chunks = []
+    current = ""
+    for paragraph in _PARAGRAPH_BREAK.split(text):
+        paragraph = paragraph.strip()
+        if not paragraph:
+            continue
+        if current and len(current) >= target * _PARAGRAPH_CUT_FILL:
+            chunks.append(current)
+            current = ""
+        separator = "\n\n"
+        for sentence in _sentences(paragraph, max_chars):
+            if current and len(current) + len(separator) + len(sentence) > target:
+                chunks.append(current)
+                current = ""
+            current = f"{current}{separator}{sentence}" if current else sentence
+            separator = " "
+    if current:
+        chunks.append(current)
+    return chunks
+
+
+async def map_bounded(
+    items: Sequence,
+    worker: Callable[[int, object], Awaitable],
+    concurrency: int,
+) -> AsyncIterator[Tuple[int, object]]:
+    """
+    Runs `worker(index, item)` for every item, at most `concurrency` at a time,
+    and yields `(index, result)` as each one finishes. If a worker fails or the
+    consumer stops early, the calls still queued or running are cancelled.
+    """
+    semaphore = asyncio.Semaphore(max(1, concurrency))
+
+    async def run(index: int, item) -> Tuple[int, object]:
+        async with semaphore:
+            return index, await worker(index, item)
+
+    tasks = [asyncio.ensure_future(run(index, item)) for index, item in enumerate(items)]
+    try:
+        for finished in asyncio.as_completed(tasks):
+            yield await finished
+    finally:
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
@@ -0,0 +1,43 @@
+import hashlib
+import os
+import threading
+from typing import Dict, Tuple
+
+HASH_CHUNK_SIZE = 1024 * 1024
+
+_memo: Dict[str, Tuple[int, int, str]] = {}
+_memo_lock = threading.Lock()
+
+
+def file_sha256(path: str) -> str:
+    """
+    Returns the SHA-256 hex digest of a file's content.
+
+    Digests are memoized per path and invalidated when the file's size or
+    modification time changes, so re-hashing a large upload on every request
+    only costs a `stat`.
+    """
+    abs_path = os.path.abspath(path)
+    stat = os.stat(abs_path)
+    with _memo_lock:
+        cached = _memo.get(abs_path)
+    if cached and cached[0] == stat.st_size and cached[1] == stat.st_mtime_ns:
+        return cached[2]
+
+    digest = hashlib.sha256()
+    with open(abs_path, "rb") as file:
+        for chunk in iter(lambda: file.read(HASH_CHUNK_SIZE), b""):
+            digest.update(chunk)
+    hex_digest = digest.hexdigest()
+
+    with _memo_lock:
+        _memo[abs_path] = (stat.st_size, stat.st_mtime_ns, hex_digest)
+    return hex_digest
+
+
+def remember_file_sha256(path: str, hex_digest: str) -> None:
+    """Records a digest computed elsewhere (while the file was written) so `file_sha256` need not read it."""
+    abs_path = os.path.abspath(path)
+    stat = os.stat(abs_path)
+    with _memo_lock:
+        _memo[abs_path] = (stat.st_size, stat.st_mtime_ns, hex_digest)
@@ -0,0 +1,114 @@
+import json
+import shutil
+import subprocess
+from fractions import Fraction
+from typing import Optional
+
+import av
+
+from app.core.config import settings
+from app.services.disk_cache import DiskCache
+from app.services.media_hash import file_sha256
+
+
+def _ratio(value) -> Optional[float]:
+    try:
+        ratio = float(Fraction(value))
+    except (TypeError, ValueError, ZeroDivisionError):
+        return None
+    return round(ratio, 3) if ratio else None
+
+
+def _number(value, kind=float):
+    try:
+        return kind(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def _probe_ffprobe(ffprobe: str, media_path: str) -> dict:
+    completed = subprocess.run(
+        [ffprobe, "-v", "error", "-print_format", "json", "-show_format", "-show_streams", media_path],
+        check=True,
+        capture_output=True,
+    )
+    data = json.loads(completed.stdout)
+    streams = data.get("streams", [])
+    audio = next((s for s in streams if s.get("codec_type") == "audio"), None)
+    video = next((s for s in streams if s.get("codec_type") == "video" and not s.get("disposition", {}).get("attached_pic")), None)
+    container = data.get("format", {})
+    return {
+        "format": container.get("format_name"),
+        "duration": _number(container.get("duration")) or _number((audio or {}).get("duration")),
+        "bit_rate": _number(container.get("bit_rate"), int),
+        "audio": {
+            "codec": audio.get("codec_name"),
+            "sample_rate": _number(audio.get("sample_rate"), int),
+            "channels": _number(audio.get("channels"), int),
+            "bit_rate": _number(audio.get("bit_rate"), int),
+        } if audio else None,
+        "video": {
+            "codec": video.get("codec_name"),
+            "width": video.get("width"),
+            "height": video.get("height"),
+            "fps": _ratio(video.get("avg_frame_rate")),
+        } if video else None,
+    }
+
+
+def _probe_pyav(media_path: str) -> dict:
+    with av.open(media_path) as container:
+        audio = next(iter(container.streams.audio), None)
+        video = next(iter(container.streams.video), None)
+        duration = container.duration / av.time_base if container.duration is not None else None
+        if duration is None and audio is not None and audio.duration is not None:
+            duration = float(audio.duration * audio.time_base)
+        return {
+            "format": container.format.name,
+            "duration": duration,
+            "bit_rate": container.bit_rate or None,
+            "audio": {
+                "codec": audio.codec_context.name,
+                "sample_rate": audio.codec_context.sample_rate,
+                "channels": audio.codec_context.channels,
+                "bit_rate": audio.codec_context.bit_rate or None,
+            } if audio else None,
+            "video": {
+                "codec": video.codec_context.name,
+                "width": video.codec_context.width,
+                "height": video.codec_context.height,
+                "fps": _ratio(video.average_rate),
+            } if video else None,
+        }
+
+
+def probe_media(media_path: str) -> Optional[dict]:
+    """
+    Reads the container and stream headers of a media file: duration, audio
+    codec, sample rate and channel count, and the video stream if any. Uses
+    ffprobe when available and falls back to PyAV. Returns None for files that
+    are not media (a template, a text file).
+    """
+    ffprobe = shutil.which("ffprobe")
+    try:
+        if ffprobe:
+            return _probe_ffprobe(ffprobe, media_path)
+        return _probe_pyav(media_path)
+    except (subprocess.CalledProcessError, av.error.FFmpegError, json.JSONDecodeError, OSError) as exc:
+        print(f"--- PROBE: {media_path} is not readable media: {exc} ---")
+        return None
+
+
+def get_media_info(media_path: str, sha256: Optional[str] = None) -> Optional[dict]:
+    """Probe results of a file, cached by its content hash."""
+    sha256 = sha256 or file_sha256(media_path)
+    cached = media_probe_cache.get(sha256)
+    if cached is not None:
+        return json.loads(cached)
+    info = probe_media(media_path)
+    if info is not None:
+        media_probe_cache.put(sha256, json.dumps(info).encode("utf-8"), {"duration": info["duration"]})
+    return info
+
+
+media_probe_cache = DiskCache(settings.MEDIA_PROBE_CACHE_DIR, max_bytes=16 * 1024 * 1024, name="media_probe")
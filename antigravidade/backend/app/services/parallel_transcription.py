@@ -0,0 +1,233 @@
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from types import SimpleNamespace
+from typing import Callable, Dict, List, Optional, Tuple
+
+from faster_whisper import WhisperModel
+
+from app.services.audio_extraction import SAMPLE_RATE, load_audio
+from app.services.speech_detection import vad_parameters
+from app.services.transcription_checkpoint import TranscriptionCheckpoint
+
+Window = Tuple[float, float]
+
+# Model owned by a worker process, created once by `_init_worker`.
+_worker_model: Optional[WhisperModel] = None
+
+
+def plan_windows(duration: float, window_seconds: float, overlap_seconds: float) -> List[Window]:
+    """Splits [0, duration] into windows of `window_seconds` that overlap by `overlap_seconds`."""
+    if duration <= window_seconds:
+        return [(0.0, duration)]
+
+    step = max(window_seconds - overlap_seconds, 1.0)
+    windows = []
+    start = 0.0
+    while True:
+        end = min(start + window_seconds, duration)
+        windows.append((start, end))
+        if end >= duration:
+            return windows
+        start += step
+
+
+def _owned_segments(windows: List[Window], index: int, segments: List[dict]) -> List[dict]:
+    start, end = windows[index]
+    own_start = (start + windows[index - 1][1]) / 2 if index > 0 else float("-inf")
+    own_end = (windows[index + 1][0] + end) / 2 if index + 1 < len(windows) else float("inf")
+    return [
+        segment for segment in segments
+        if own_start <= (segment["start"] + segment["end"]) / 2 < own_end
+    ]
+
+
+def stitch_segments(windows: List[Window], results: List[List[dict]]) -> List[dict]:
+    """
+    Merges per-window segments (already on the original timeline) into one list.
+
+    Each overlap is split at its midpoint: a window keeps only the segments whose
+    midpoint falls inside its own half, so text decoded twice is kept once.
+    """
+    stitched = []
+    for index, segments in enumerate(results):
+        stitched.extend(_owned_segments(windows, index, segments))
+    return stitched
+
+
+def _init_worker(model_size: str, device: str, compute_type: str, cpu_threads: int) -> None:
+    global _worker_model
+    _worker_model = WhisperModel(model_size, device=device, compute_type=compute_type, cpu_threads=cpu_threads)
+
+
+def _transcribe_window(
+    audio_path: str,
+    start: float,
+    end: float,
+    beam_size: int,
+    best_of: int,
+    vad_filter: bool,
+    language: Optional[str],
+    vad_options: Optional[dict] = None,
+) -> Tuple[List[dict], str, float, float]:
+    # Workers map the shared PCM artifact themselves, so no audio crosses the process boundary.
+    audio = load_audio(audio_path)[int(start * SAMPLE_RATE):int(end * SAMPLE_RATE)]
+    segments, info = _worker_model.transcribe(
+        audio,
+        beam_size=beam_size,
+        best_of=best_of,
+        vad_filter=vad_filter,
+        vad_parameters=vad_options,
+        language=language,
+    )
+    # Segments are decoded lazily; consume them before reading how much was speech.
+    segments = list(segments)
+    return (
+        [
+            {"start": start + segment.start, "end": start + segment.end, "text": segment.text}
+            for segment in segments
+        ],
+        info.language,
+        info.language_probability,
+        info.duration_after_vad if vad_filter else end - start,
+    )
+
+
+class _Pool:
+    def __init__(self, executor: ProcessPoolExecutor):
+        self.executor = executor
+        self.users = 0
+
+
+# Worker pools by (workers, model_size, device, compute_type). Only the last
+# configuration asked for is kept idle; older pools finish the windows already
+# queued on them and are shut down when their last job releases them.
+_pools: Dict[tuple, _Pool] = {}
+_current_config: Optional[tuple] = None
+_executor_lock = threading.Lock()
+
+
+def _get_executor(workers: int, model_size: str, device: str, compute_type: str) -> ProcessPoolExecutor:
+    """Returns the worker pool for this configuration; give it back with `_release_executor`."""
+    global _current_config
+    config = (workers, model_size, device, compute_type)
+    with _executor_lock:
+        pool = _pools.get(config)
+        if pool is None:
+            cpu_threads = max(1, (os.cpu_count() or 1) // workers)
+            # Spawn keeps CTranslate2 out of a forked copy of the server's threads.
+            pool = _pools[config] = _Pool(ProcessPoolExecutor(
+                max_workers=workers,
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=_init_worker,
+                initargs=(model_size, device, compute_type, cpu_threads),
+            ))
+        pool.users += 1
+        _current_config = config
+        idle = [key for key, other in _pools.items() if key != config and other.users == 0]
+        for key in idle:
+            _pools.pop(key).executor.shutdown(wait=False)
+        return pool.executor
+
+
+def _release_executor(executor: ProcessPoolExecutor) -> None:
+    with _executor_lock:
+        config = next((key for key, pool in _pools.items() if pool.executor is executor), None)
+        if config is None:
+            return
+        pool = _pools[config]
+        pool.users -= 1
+        if pool.users == 0 and config != _current_config:
+            # Its windows are all done, so nothing is cancelled.
+            _pools.pop(config).executor.shutdown(wait=False)
+
+
+def transcribe_parallel(
+    audio_path: str,
+    workers: int,
+    window_seconds: float,
+    overlap_seconds: float,
+    model_size: str,
+    device: str,
+    compute_type: str,
+    beam_size: int = 5,
+    best_of: int = 5,
+    vad_filter: bool = False,
+    language: Optional[str] = None,
+    on_segment: Optional[Callable[[dict], None]] = None,
+    checkpoint: Optional[TranscriptionCheckpoint] = None,
+) -> Tuple[str, SimpleNamespace]:
+    """
+    Transcribes an extracted audio artifact as overlapping windows across a process pool.
+
+    Segments are reported through `on_segment` in timeline order as soon as every
+    earlier window has finished. Returns the joined text and an info object with
+    the same `language`, `language_probability` and `duration` fields as
+    faster-whisper's TranscriptionInfo.
+
+    With a `checkpoint`, every finished window is journaled and windows found in
+    the journal are replayed instead of being decoded again.
+    """
+    duration = len(load_audio(audio_path)) / SAMPLE_RATE
+    windows = plan_windows(duration, window_seconds, overlap_seconds)
+    committed = {unit["index"]: unit for unit in checkpoint.load()} if checkpoint is not None else {}
+    executor = _get_executor(workers, model_size, device, compute_type) if len(committed) < len(windows) else None
+
+    futures = [
+        None if index in committed
+        else executor.submit(
+            _transcribe_window, audio_path, start, end, beam_size, best_of, vad_filter, language,
+            vad_parameters() if vad_filter else None,
+        )
+        for index, (start, end) in enumerate(windows)
+    ]
+
+    stitched = []
+    languages = []
+    window_speech = []
+    try:
+        for index, future in enumerate(futures):
+            if future is None:
+                unit = committed[index]
+                owned, detected_language, probability = unit["segments"], unit["language"], unit["language_probability"]
+                speech_seconds = unit["speech_seconds"]
+            else:
+                segments, detected_language, probability, speech_seconds = future.result()
+                # Ownership depends only on window boundaries, so a window's segments are
+                # final as soon as it and every earlier window have finished.
+                owned = _owned_segments(windows, index, segments)
+                if checkpoint is not None:
+                    checkpoint.commit({
+                        "index": index,
+                        "language": detected_language,
+                        "language_probability": probability,
+                        "speech_seconds": speech_seconds,
+                        "segments": owned,
+                    })
+            languages.append((probability, detected_language))
+            window_speech.append(speech_seconds)
+            for segment in owned:
+                stitched.append(segment)
+                if on_segment is not None:
+                    on_segment({**segment, "progress": min(segment["end"] / duration, 1.0) if duration else 0.0})
+    finally:
+        for future in futures:
+            if future is not None:
+                future.cancel()
+        if executor is not None:
+            _release_executor(executor)
+
+    probability, detected_language = max(languages)
+    speech_seconds = None
+    if vad_filter:
+        # Overlaps are decoded twice, so scale the windows' speech share to the recording.
+        window_seconds_total = sum(end - start for start, end in windows)
+        speech_seconds = duration * sum(window_speech) / window_seconds_total if window_seconds_total else 0.0
+    info = SimpleNamespace(
+        language=detected_language,
+        language_probability=probability,
+        duration=duration,
+        speech_seconds=speech_seconds,
+    )
+    return "".join(segment["text"] for segment in stitched).strip(), info
@@ -0,0 +1,259 @@
+import mmap
+import os
+import struct
+from typing import Iterable, Iterator, List, Optional, Union
+
+import numpy as np
+
+MAGIC = b"AIDOSEG1"
+# magic, flags, segment count, word count, text bytes, word text bytes, reserved
+_HEADER = struct.Struct("<8sIIQQQQ")
+_HAS_WORDS = 1
+
+
+def _aligned(offset: int) -> int:
+    return (offset + 7) & ~7
+
+
+class SegmentStore:
+    """
+    Transcript segments held in flat arrays instead of Python objects.
+
+    Segment i spans `starts[i]`..`ends[i]` seconds and its text is
+    `text[text_offsets[i]:text_offsets[i + 1]]` in one UTF-8 buffer; the buffer
+    is the exact concatenation of the segment texts, so `char_offsets` index the
+    decoded transcript directly. Word timings, when present, live in parallel
+    arrays, and `word_index[i]`..`word_index[i + 1]` are the words of segment i.
+
+    Segments are kept in timeline order. A store serializes to a single binary
+    file that `open()` memory-maps, so a multi-hour transcript costs a few bytes
+    per segment and is not read until a range is asked for.
+    """
+
+    def __init__(
+        self,
+        starts: np.ndarray,
+        ends: np.ndarray,
+        text: Union[bytes, memoryview],
+        text_offsets: np.ndarray,
+        char_offsets: np.ndarray,
+        word_starts: Optional[np.ndarray] = None,
+        word_ends: Optional[np.ndarray] = None,
+        word_probabilities: Optional[np.ndarray] = None,
+        word_text: Union[bytes, memoryview, None] = None,
+        word_text_offsets: Optional[np.ndarray] = None,
+        word_index: Optional[np.ndarray] = None,
+    ):
+        self.starts = starts
+        self.ends = ends
+        self.text = text
+        self.text_offsets = text_offsets
+        self.char_offsets = char_offsets
+        self.word_starts = word_starts
+        self.word_ends = word_ends
+        self.word_probabilities = word_probabilities
+        self.word_text = word_text
+        self.word_text_offsets = word_text_offsets
+        self.word_index = word_index
+        self._mmap: Optional[mmap.mmap] = None
+
+    # --- Building ---
+
+    @classmethod
+    def from_segments(cls, segments: Iterable) -> "SegmentStore":
+        """Builds a store from segment dicts or faster-whisper `Segment` objects."""
+        builder = SegmentStoreBuilder()
+        for segment in segments:
+            builder.append(segment)
+        return builder.build()
+
+    # --- Access ---
+
+    def __len__(self) -> int:
+        return len(self.starts)
+
+    @property
+    def has_words(self) -> bool:
+        return self.word_starts is not None
+
+    def text_of(self, index: int) -> str:
+        return bytes(self.text[self.text_offsets[index]:self.text_offsets[index + 1]]).decode("utf-8")
+
+    def full_text(self) -> str:
+        return bytes(self.text).decode("utf-8")
+
+    def segment(self, index: int) -> dict:
+        segment = {"start": float(self.starts[index]), "end": float(self.ends[index]), "text": self.text_of(index)}
+        if self.has_words:
+            segment["words"] = [self.word(i) for i in range(self.word_index[index], self.word_index[index + 1])]
+        return segment
+
+    def word(self, index: int) -> dict:
+        return {
+            "start": float(self.word_starts[index]),
+            "end": float(self.word_ends[index]),
+            "word": bytes(self.word_text[self.word_text_offsets[index]:self.word_text_offsets[index + 1]]).decode("utf-8"),
+            "probability": float(self.word_probabilities[index]),
+        }
+
+    def __iter__(self) -> Iterator[dict]:
+        for index in range(len(self)):
+            yield self.segment(index)
+
+    # --- Lookups ---
+
+    def indices_between(self, start: float, end: float) -> range:
+        """Indices of the segments that overlap [start, end)."""
+        first = int(np.searchsorted(self.ends, start, side="right"))
+        last = int(np.searchsorted(self.starts, end, side="left"))
+        return range(first, max(first, last))
+
+    def between(self, start: float, end: float) -> List[dict]:
+        return [self.segment(index) for index in self.indices_between(start, end)]
+
+    def index_at_time(self, seconds: float) -> Optional[int]:
+        """The segment being spoken at `seconds`, or None in a gap."""
+        index = int(np.searchsorted(self.starts, seconds, side="right")) - 1
+        if index >= 0 and seconds < self.ends[index]:
+            return index
+        return None
+
+    def index_at_char(self, offset: int) -> Optional[int]:
+        """The segment holding character `offset` of `full_text()`."""
+        if offset < 0 or offset >= self.char_offsets[-1]:
+            return None
+        return int(np.searchsorted(self.char_offsets, offset, side="right")) - 1
+
+    # --- Serialization ---
+
+    def _arrays(self) -> List[np.ndarray]:
+        arrays = [self.starts, self.ends, self.text_offsets, self.char_offsets]
+        if self.has_words:
+            arrays += [self.word_starts, self.word_ends, self.word_probabilities, self.word_text_offsets, self.word_index]
+        return arrays
+
+    def to_bytes(self) -> bytes:
+        word_count = len(self.word_starts) if self.has_words else 0
+        word_text = bytes(self.word_text) if self.has_words else b""
+        parts = [_HEADER.pack(
+            MAGIC, _HAS_WORDS if self.has_words else 0,
+            len(self), word_count, len(self.text), len(word_text), 0,
+        )]
+        size = _HEADER.size
+        for array in self._arrays():
+            data = np.ascontiguousarray(array).astype(array.dtype.newbyteorder("<"), copy=False).tobytes()
+            padding = _aligned(size) - size
+            parts += [b"\0" * padding, data]
+            size += padding + len(data)
+        parts += [bytes(self.text), word_text]
+        return b"".join(parts)
+
+    def save(self, path: str) -> None:
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, "wb") as file:
+            file.write(self.to_bytes())
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def from_buffer(cls, buffer) -> "SegmentStore":
+        """Views a serialized store without copying its arrays."""
+        magic, flags, count, word_count, text_size, word_text_size, _ = _HEADER.unpack_from(buffer, 0)
+        if magic != MAGIC:
+            raise ValueError("Not a segment store")
+
+        offset = _HEADER.size
+
+        def take(dtype, length):
+            nonlocal offset
+            offset = _aligned(offset)
+            array = np.frombuffer(buffer, dtype=np.dtype(dtype).newbyteorder("<"), count=length, offset=offset)
+            offset += array.nbytes
+            return array
+
+        arrays = [take("f4", count), take("f4", count), take("u4", count + 1), take("u4", count + 1)]
+        if flags & _HAS_WORDS:
+            arrays += [
+                take("f4", word_count), take("f4", word_count), take("f4", word_count),
+                take("u4", word_count + 1), take("u4", count + 1),
+            ]
+        view = memoryview(buffer)
+        text = view[offset:offset + text_size]
+        offset += text_size
+
+        if not flags & _HAS_WORDS:
+            starts, ends, text_offsets, char_offsets = arrays
+            return cls(starts, ends, text, text_offsets, char_offsets)
+        word_text = view[offset:offset + word_text_size]
+        starts, ends, text_offsets, char_offsets, word_starts, word_ends, word_probabilities, word_text_offsets, word_index = arrays
+        return cls(
+            starts, ends, text, text_offsets, char_offsets,
+            word_starts, word_ends, word_probabilities, word_text, word_text_offsets, word_index,
+        )
+
+    @classmethod
+    def open(cls, path: str) -> "SegmentStore":
+        """Memory-maps a saved store; pages are read on first access."""
+        with open(path, "rb") as file:
+            mapped = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        store = cls.from_buffer(mapped)
+        store._mmap = mapped
+        return store
+
+
+class SegmentStoreBuilder:
+    """Accumulates segments as they are decoded and packs them into a `SegmentStore`."""
+
+    def __init__(self):
+        self._starts = []
+        self._ends = []
+        self._texts = []
+        self._words = []
+
+    def __len__(self) -> int:
+        return len(self._starts)
+
+    def append(self, segment) -> None:
+        get = segment.get if isinstance(segment, dict) else lambda name, default=None: getattr(segment, name, default)
+        self._starts.append(get("start"))
+        self._ends.append(get("end"))
+        self._texts.append(get("text"))
+        words = get("words")
+        self._words.append([
+            word if isinstance(word, dict)
+            else {"start": word.start, "end": word.end, "word": word.word, "probability": word.probability}
+            for word in words
+        ] if words else None)
+
+    def build(self) -> SegmentStore:
+        order = np.argsort(np.asarray(self._starts, dtype=np.float64), kind="stable")
+        texts = [self._texts[i] for i in order]
+        encoded = [text.encode("utf-8") for text in texts]
+
+        text_offsets = np.zeros(len(texts) + 1, dtype=np.uint32)
+        char_offsets = np.zeros(len(texts) + 1, dtype=np.uint32)
+        text_offsets[1:] = np.cumsum([len(data) for data in encoded])
+        char_offsets[1:] = np.cumsum([len(text) for text in texts])
+
+        store = SegmentStore(
+            starts=np.asarray([self._starts[i] for i in order], dtype=np.float32),
+            ends=np.asarray([self._ends[i] for i in order], dtype=np.float32),
+            text=b"".join(encoded),
+            text_offsets=text_offsets,
+            char_offsets=char_offsets,
+        )
+
+        if any(words for words in self._words):
+            words = [word for i in order for word in (self._words[i] or [])]
+            word_encoded = [word["word"].encode("utf-8") for word in words]
+            word_text_offsets = np.zeros(len(words) + 1, dtype=np.uint32)
+            word_text_offsets[1:] = np.cumsum([len(data) for data in word_encoded])
+            word_index = np.zeros(len(texts) + 1, dtype=np.uint32)
+            word_index[1:] = np.cumsum([len(self._words[i] or []) for i in order])
+
+            store.word_starts = np.asarray([word["start"] for word in words], dtype=np.float32)
+            store.word_ends = np.asarray([word["end"] for word in words], dtype=np.float32)
+            store.word_probabilities = np.asarray([word.get("probability", 0.0) for word in words], dtype=np.float32)
+            store.word_text = b"".join(word_encoded)
+            store.word_text_offsets = word_text_offsets
+            store.word_index = word_index
+        return store
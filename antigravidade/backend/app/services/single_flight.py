@@ -0,0 +1,156 @@
+import asyncio
+import hashlib
+import threading
+import time
+from typing import AsyncIterator, Awaitable, Callable, Dict, List, Optional
+
+_END = object()
+
+
+def flight_key(*parts) -> str:
+    """Hashes the inputs and parameters that determine a computation's result."""
+    material = "\x1f".join(str(part) for part in parts)
+    return hashlib.sha256(material.encode("utf-8")).hexdigest()
+
+
+class _Flight:
+    def __init__(self):
+        self.started_at = time.monotonic()
+        self.callers = 1
+        self.events: List = []
+        self.listeners: List[asyncio.Queue] = []
+        self.task: Optional[asyncio.Task] = None
+        self.error: Optional[BaseException] = None
+        self.finished = False
+
+    def publish(self, event) -> None:
+        self.events.append(event)
+        for queue in self.listeners:
+            queue.put_nowait(event)
+
+    def close(self) -> None:
+        self.finished = True
+        for queue in self.listeners:
+            queue.put_nowait(_END)
+
+
+class SingleFlight:
+    """
+    Coalesces identical work that is already running.
+
+    The first caller for a key starts the computation; callers that arrive while
+    it is still running attach to it instead of starting their own, and get the
+    same result (`run`) or the same events from the beginning (`stream`). Keys
+    are forgotten as soon as the computation ends, so this only removes
+    concurrent duplicates; caching finished results is left to the caches.
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+        self._flights: Dict[str, _Flight] = {}
+        self._lock = threading.Lock()
+        self.started = 0
+        self.coalesced = 0
+        self.avoided_seconds = 0.0
+
+    def _join(self, key: str) -> Optional[_Flight]:
+        flight = self._flights.get(key)
+        if flight is not None:
+            flight.callers += 1
+            with self._lock:
+                self.coalesced += 1
+            print(f"--- SINGLE FLIGHT: Joining running {self.name} {key[:12]} ({flight.callers} callers) ---")
+        return flight
+
+    def _start(self, key: str) -> _Flight:
+        flight = _Flight()
+        self._flights[key] = flight
+        with self._lock:
+            self.started += 1
+        return flight
+
+    def _finish(self, key: str, flight: _Flight) -> None:
+        if self._flights.get(key) is flight:
+            del self._flights[key]
+        with self._lock:
+            # Every caller after the first would have paid for the whole computation.
+            self.avoided_seconds += (time.monotonic() - flight.started_at) * (flight.callers - 1)
+
+    async def run(self, key: str, compute: Callable[[], Awaitable]):
+        """
+        Returns the result of `compute()`, sharing it with concurrent callers of
+        the same key. The computation keeps running if one of its callers is
+        cancelled, since the others are still waiting for it.
+        """
+        flight = self._join(key)
+        if flight is None:
+            flight = self._start(key)
+
+            async def drive():
+                try:
+                    return await compute()
+                finally:
+                    self._finish(key, flight)
+
+            flight.task = asyncio.ensure_future(drive())
+        return await asyncio.shield(flight.task)
+
+    async def stream(self, key: str, produce: Callable[[], AsyncIterator]) -> AsyncIterator:
+        """
+        Yields the events of `produce()`, sharing them with concurrent callers of
+        the same key. A caller that attaches late first receives the events it
+        missed. The producer is cancelled only when every caller has gone.
+        """
+        flight = self._join(key)
+        if flight is None:
+            flight = self._start(key)
+
+            async def drive():
+                try:
+                    async for event in produce():
+                        flight.publish(event)
+                except asyncio.CancelledError:
+                    flight.error = asyncio.CancelledError()
+                    raise
+                except Exception as exc:
+                    flight.error = exc
+                finally:
+                    self._finish(key, flight)
+                    flight.close()
+
+            flight.task = asyncio.ensure_future(drive())
+
+        queue: asyncio.Queue = asyncio.Queue()
+        for event in flight.events:
+            queue.put_nowait(event)
+        if flight.finished:
+            queue.put_nowait(_END)
+        flight.listeners.append(queue)
+        try:
+            while True:
+                event = await queue.get()
+                if event is _END:
+                    break
+                yield event
+            if flight.error is not None:
+                raise flight.error
+        finally:
+            flight.listeners.remove(queue)
+            if not flight.listeners and not flight.finished:
+                # Nobody is listening any more; new callers must not join a cancelled flight.
+                if self._flights.get(key) is flight:
+                    del self._flights[key]
+                flight.task.cancel()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "in_flight": len(self._flights),
+                "started": self.started,
+                "coalesced": self.coalesced,
+                "avoided_seconds": round(self.avoided_seconds, 1),
+            }
+
+
+transcription_flights = SingleFlight("transcription")
+llm_flights = SingleFlight("LLM stage")
@@ -0,0 +1,98 @@
+import threading
+from dataclasses import asdict, dataclass
+from typing import List, Tuple
+
+import numpy as np
+from faster_whisper.vad import SpeechTimestampsMap, VadOptions, get_speech_timestamps
+
+from app.core.config import settings
+from app.services.audio_extraction import SAMPLE_RATE
+
+
+def vad_options(**overrides) -> VadOptions:
+    """Silero VAD options from the AIDO_VAD_* settings."""
+    options = {
+        "threshold": settings.VAD_THRESHOLD,
+        "min_speech_duration_ms": settings.VAD_MIN_SPEECH_MS,
+        "min_silence_duration_ms": settings.VAD_MIN_SILENCE_MS,
+        "speech_pad_ms": settings.VAD_SPEECH_PAD_MS,
+    }
+    options.update(overrides)
+    return VadOptions(**options)
+
+
+def vad_signature() -> str:
+    """Short description of the VAD settings, for cache keys and checkpoint plans."""
+    options = vad_options()
+    return (
+        f"t={options.threshold}/speech={options.min_speech_duration_ms}"
+        f"/silence={options.min_silence_duration_ms}/pad={options.speech_pad_ms}"
+    )
+
+
+def vad_parameters() -> dict:
+    """The configured options as keyword arguments for `WhisperModel.transcribe`."""
+    return asdict(vad_options())
+
+
+@dataclass
+class SpeechPlan:
+    """Speech regions of a recording, as sample ranges on the original timeline."""
+    chunks: List[dict]
+    duration: float
+
+    def __post_init__(self):
+        self._timestamps = SpeechTimestampsMap(self.chunks, SAMPLE_RATE)
+
+    @property
+    def speech_seconds(self) -> float:
+        return sum(chunk["end"] - chunk["start"] for chunk in self.chunks) / SAMPLE_RATE
+
+    @property
+    def speech_ratio(self) -> float:
+        return self.speech_seconds / self.duration if self.duration else 0.0
+
+    def collapse(self, audio: np.ndarray) -> np.ndarray:
+        """Returns only the speech, laid end to end; this is what the decoder sees."""
+        if not self.chunks:
+            return np.zeros(0, dtype=np.float32)
+        return np.concatenate([audio[chunk["start"]:chunk["end"]] for chunk in self.chunks])
+
+    def to_original(self, start: float, end: float) -> Tuple[float, float]:
+        """Maps a segment of the collapsed audio back to the recording's timeline."""
+        return self._timestamps.get_original_time(start), self._timestamps.get_original_time(end, is_end=True)
+
+
+def detect_speech(audio: np.ndarray) -> SpeechPlan:
+    """Runs the voice-activity pre-pass over a whole recording."""
+    return SpeechPlan(chunks=get_speech_timestamps(audio, vad_options()), duration=len(audio) / SAMPLE_RATE)
+
+
+class VadStats:
+    """Totals over every transcription that went through the VAD pre-pass."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.jobs = 0
+        self.audio_seconds = 0.0
+        self.speech_seconds = 0.0
+
+    def record(self, audio_seconds: float, speech_seconds: float) -> None:
+        with self._lock:
+            self.jobs += 1
+            self.audio_seconds += audio_seconds
+            self.speech_seconds += speech_seconds
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "jobs": self.jobs,
+                "audio_seconds": round(self.audio_seconds, 1),
+                "speech_seconds": round(self.speech_seconds, 1),
+                "skipped_seconds": round(self.audio_seconds - self.speech_seconds, 1),
+                "speech_ratio": round(self.speech_seconds / self.audio_seconds, 3) if self.audio_seconds else 0.0,
+                "settings": vad_signature(),
+            }
+
+
+vad_stats = VadStats()
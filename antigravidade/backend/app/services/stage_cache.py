@@ -0,0 +1,75 @@
+import hashlib
+import threading
+import time
+from typing import Optional
+
+from app.core.config import settings
+from app.services.disk_cache import DiskCache
+
+
+def model_name(model) -> str:
+    """The name of a model given by name or as an LLM object (tests, benchmarks)."""
+    return model if isinstance(model, str) else getattr(model, "model", repr(model))
+
+
+def stage_cache_key(stage: str, model, instruction: str, template_version: int, content: str) -> str:
+    """
+    Cache key of an LLM stage call: the stage, model, system instruction and
+    prompt-template version, and the full prompt it was given.
+    """
+    digest = hashlib.sha256()
+    for part in (stage, model_name(model), instruction, str(template_version)):
+        digest.update(part.encode("utf-8"))
+        digest.update(b"\0")
+    digest.update(content.encode("utf-8"))
+    return digest.hexdigest()
+
+
+class StageOutputCache:
+    """
+    Stage outputs on disk, with LRU eviction by size and a TTL (see DiskCache),
+    and hit rates counted per stage. A bypassed lookup is not read from the
+    cache, but its fresh output still replaces the stored one.
+    """
+
+    def __init__(self, cache: DiskCache):
+        self.cache = cache
+        self._stages = {}
+        self._lock = threading.Lock()
+
+    def _count(self, stage: str, outcome: str) -> None:
+        with self._lock:
+            counters = self._stages.setdefault(stage, {"hits": 0, "misses": 0, "bypassed": 0})
+            counters[outcome] += 1
+
+    def get(self, stage: str, key: str) -> Optional[str]:
+        text = self.cache.get_text(key)
+        self._count(stage, "hits" if text is not None else "misses")
+        return text
+
+    def bypass(self, stage: str) -> None:
+        self._count(stage, "bypassed")
+
+    def put(self, stage: str, key: str, text: str, meta: Optional[dict] = None) -> None:
+        self.cache.put_text(key, text, {"stage": stage, "created_at": time.time(), **(meta or {})})
+
+    def stats(self) -> dict:
+        with self._lock:
+            stages = {
+                stage: {
+                    **counters,
+                    "hit_rate": round(counters["hits"] / (counters["hits"] + counters["misses"]), 3) if counters["hits"] + counters["misses"] else 0.0,
+                }
+                for stage, counters in self._stages.items()
+            }
+        return {"stages": stages, "disk": self.cache.stats()}
+
+
+stage_output_cache = StageOutputCache(
+    DiskCache(
+        settings.LLM_CACHE_DIR,
+        max_bytes=settings.LLM_CACHE_MAX_MB * 1024 * 1024,
+        name="llm_stage_output",
+        ttl_seconds=settings.LLM_CACHE_TTL_HOURS * 3600,
+    )
+)
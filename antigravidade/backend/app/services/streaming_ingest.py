@@ -0,0 +1,403 @@
+import asyncio
+import os
+import shutil
+import subprocess
+import threading
+import time
+from typing import AsyncIterator, Dict, List, Optional
+
+import numpy as np
+
+from app.core.config import settings
+from app.services.audio_extraction import SAMPLE_RATE, audio_artifact_path
+from app.services.media_hash import file_sha256
+from app.services.transcription_checkpoint import TranscriptionCheckpoint
+from app.services.transcription_profiles import TranscriptionProfile
+
+PIPE_READ_BYTES = 64 * 1024
+FINISHED_JOB_TTL_SECONDS = 3600
+
+
+def open_pcm_pipe() -> subprocess.Popen:
+    """Starts ffmpeg reading a media stream on stdin and writing 16 kHz mono float32 PCM on stdout."""
+    ffmpeg = shutil.which("ffmpeg")
+    if not ffmpeg:
+        raise FileNotFoundError("ffmpeg not found")
+    return subprocess.Popen(
+        [
+            ffmpeg, "-nostdin", "-v", "error",
+            "-i", "pipe:0",
+            "-vn", "-ac", "1", "-ar", str(SAMPLE_RATE),
+            "-f", "f32le", "-acodec", "pcm_f32le",
+            "pipe:1",
+        ],
+        stdin=subprocess.PIPE,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.PIPE,
+    )
+
+
+class _Stopped(Exception):
+    """Ends a decode pass once the upload is saved or cancelled."""
+
+
+class IngestJob:
+    """
+    Transcribes an upload while its chunks are still arriving.
+
+    Three threads run per job: the feeder follows the upload's part file and
+    pipes every committed byte into ffmpeg, the reader appends the PCM that
+    ffmpeg produces to a file, and the decoder runs a pass over the audio
+    received so far every AIDO_INGEST_WINDOW_SECONDS of new audio. Each pass
+    decodes like the sequential run of the saved file and journals the 30 s
+    Whisper windows that the audio already covers; their segments are the
+    job's events.
+
+    When the upload is finalized, the pass in progress stops after its current
+    window, the PCM becomes the upload's audio artifact and the journal moves
+    to the transcript's checkpoint key. `transcribe_video_stream` on the saved
+    file (from the listener or a `/pipeline/run` on the same file_token) waits
+    for that hand-over, replays the journaled windows and decodes only the rest.
+
+    Containers that cannot be decoded from a pipe (an MP4 whose index is at
+    the end), a missing ffmpeg, models that live in the transcription daemon,
+    or a transcription mode other than `single` (whose runs do not read a
+    sequential journal) make the job end with `fell_back` set and no events.
+    """
+
+    def __init__(self, upload_id: str, part_path: str, size: int, profile: TranscriptionProfile, pcm_path: str):
+        self.upload_id = upload_id
+        self.part_path = part_path
+        self.size = size
+        self.profile = profile
+        self.pcm_path = pcm_path
+        self.journal_path = os.path.join(os.path.dirname(pcm_path), f"{upload_id}.jsonl")
+        self.media_path: Optional[str] = None
+        self.file_token: Optional[str] = None
+        self.events: List[dict] = []
+        self.done = False
+        self.decoding = False
+        self.fell_back = False
+        self.error: Optional[str] = None
+        self.finished_at: Optional[float] = None
+        self.segments_before_upload_complete = 0
+
+        self._cond = threading.Condition()
+        self._committed = 0
+        self._fed = 0
+        self._feeder_done = False
+        self._pcm_bytes = 0
+        self._pcm_eof = False
+        self._cancelled = False
+        self._upload_complete = False
+        self._process: Optional[subprocess.Popen] = None
+
+    # --- Upload side ---
+
+    def start(self) -> None:
+        if settings.TRANSCRIPTION_DAEMON or settings.TRANSCRIPTION_MODE != "single":
+            # The saved file is transcribed by the daemon, or in windows this job cannot journal.
+            self._finish_fallback()
+            return
+        try:
+            self._process = open_pcm_pipe()
+        except OSError as exc:
+            print(f"--- INGEST: Cannot stream {self.upload_id[:8]} ({exc}); it will be transcribed after the upload ---")
+            self._finish_fallback()
+            return
+        open(self.pcm_path, "wb").close()
+        for target in (self._feed, self._read, self._decode):
+            threading.Thread(target=target, name=f"ingest-{target.__name__[1:]}", daemon=True).start()
+
+    def advance(self, offset: int) -> None:
+        """Called after each committed chunk; bytes before `offset` are verified."""
+        with self._cond:
+            self._committed = offset
+            if offset >= self.size:
+                self._upload_complete = True
+            self._cond.notify_all()
+
+    def wait_fed(self, timeout: Optional[float] = None) -> None:
+        """Waits until every committed byte has left the part file, so it can be moved."""
+        with self._cond:
+            self._cond.wait_for(lambda: self._fed >= self._committed or self._feeder_done or self.fell_back or self._cancelled, timeout)
+
+    def finalize(self, media_path: str, file_token: Optional[str] = None) -> None:
+        """Called once the upload is saved at `media_path`."""
+        with self._cond:
+            self.file_token = file_token
+            self.media_path = media_path
+            self._upload_complete = True
+            self._cond.notify_all()
+
+    def cancel(self) -> None:
+        with self._cond:
+            self._cancelled = True
+            self._cond.notify_all()
+        if self._process is not None and self._process.poll() is None:
+            self._process.kill()
+
+    # --- Threads ---
+
+    def _feed(self) -> None:
+        stdin = self._process.stdin
+        try:
+            with open(self.part_path, "rb") as part:
+                while True:
+                    with self._cond:
+                        self._cond.wait_for(lambda: self._committed > self._fed or self._cancelled)
+                        if self._cancelled:
+                            return
+                        end = self._committed
+                    part.seek(self._fed)
+                    while self._fed < end:
+                        data = part.read(min(PIPE_READ_BYTES, end - self._fed))
+                        stdin.write(data)
+                        with self._cond:
+                            self._fed += len(data)
+                            self._cond.notify_all()
+                    if self._fed >= self.size:
+                        return
+        except (BrokenPipeError, OSError) as exc:
+            # ffmpeg gave up on the stream; the decoder notices through the reader.
+            print(f"--- INGEST: ffmpeg stopped reading {self.upload_id[:8]}: {exc} ---")
+        finally:
+            with self._cond:
+                # Nothing else will be read from the part file.
+                self._feeder_done = True
+                self._cond.notify_all()
+            try:
+                stdin.close()
+            except OSError:
+                pass
+
+    def _read(self) -> None:
+        with open(self.pcm_path, "ab") as pcm:
+            for data in iter(lambda: self._process.stdout.read1(PIPE_READ_BYTES), b""):
+                pcm.write(data)
+                pcm.flush()
+                with self._cond:
+                    self._pcm_bytes += len(data)
+                    self._cond.notify_all()
+        self._process.wait()
+        with self._cond:
+            self._pcm_eof = True
+            if self._process.returncode != 0 and not self._cancelled:
+                self.error = self._process.stderr.read().decode(errors="replace").strip() or f"ffmpeg exited with {self._process.returncode}"
+            self._cond.notify_all()
+
+    def _audio(self, samples: int) -> np.ndarray:
+        """Maps the first `samples` of the PCM received so far."""
+        return np.memmap(self.pcm_path, dtype=np.float32, mode="r", shape=(samples,))
+
+    def _emit(self, event: dict) -> None:
+        with self._cond:
+            self.events.append(event)
+            if not self._upload_complete and event["type"] == "segment":
+                self.segments_before_upload_complete += 1
+            self._cond.notify_all()
+
+    def _on_window(self, unit: dict) -> None:
+        for segment in unit["segments"]:
+            self._emit({"type": "segment", "start": segment["start"], "end": segment["end"], "text": segment["text"]})
+        if self.media_path is not None or self._cancelled:
+            raise _Stopped()
+
+    def _decode(self) -> None:
+        try:
+            self._decode_windows()
+        except Exception as exc:
+            print(f"--- INGEST WARNING: Streaming transcription of {self.upload_id[:8]} failed: {exc} ---")
+            self.error = str(exc)
+            self._finish_fallback()
+
+    def _decode_windows(self) -> None:
+        # Imported here: the tool imports this module for the transcription queue load.
+        from app.create.subagents.transcription.tools.transcribe_video import journal_received_audio, profile_cache_key
+
+        step = int(settings.INGEST_WINDOW_SECONDS * SAMPLE_RATE)
+        decoded = 0
+        while True:
+            with self._cond:
+                self._cond.wait_for(lambda: self._pcm_bytes // 4 - decoded >= step or self._pcm_eof or self._cancelled or self.media_path is not None)
+                # The rest of the audio is decoded by the run on the saved file.
+                if self._cancelled or self.media_path is not None or self.error:
+                    break
+                available = self._pcm_bytes // 4
+                final = self._pcm_eof
+
+            if available > decoded:
+                # Counted in the queue load that picks the "auto" profile.
+                self.decoding = True
+                try:
+                    journal_received_audio(self._audio(available), self.profile, self.journal_path, self._on_window)
+                except _Stopped:
+                    pass
+                finally:
+                    self.decoding = False
+                decoded = available
+            if final:
+                break
+
+        with self._cond:
+            self._cond.wait_for(lambda: self._pcm_eof or self._cancelled)
+        if self._cancelled:
+            self._remove_files()
+            return
+        if self.error:
+            print(f"--- INGEST: ffmpeg could not decode {self.upload_id[:8]} from a pipe: {self.error} ---")
+            self._finish_fallback()
+            return
+
+        with self._cond:
+            # An upload that is never finalized is discarded with its session.
+            self._cond.wait_for(lambda: self.media_path is not None or self._cancelled, settings.UPLOAD_SESSION_TTL_HOURS * 3600)
+            if self.media_path is None:
+                self._remove_files()
+                return
+        try:
+            self._hand_over(profile_cache_key(file_sha256(self.media_path), self.profile))
+        except Exception as exc:
+            print(f"--- INGEST WARNING: Could not hand the windows of {self.media_path} over: {exc} ---")
+            self._remove_files()
+        with self._cond:
+            self.done = True
+            self.finished_at = time.time()
+            self._cond.notify_all()
+
+    def _hand_over(self, checkpoint_key: str) -> None:
+        artifact_path = audio_artifact_path(self.media_path)
+        os.makedirs(os.path.dirname(artifact_path), exist_ok=True)
+        os.replace(self.pcm_path, artifact_path)
+        windows = 0
+        if os.path.exists(self.journal_path):
+            checkpoint_path = TranscriptionCheckpoint.path_for(checkpoint_key)
+            if os.path.exists(checkpoint_path):
+                # A run on the same content left its own journal; it resumes from that.
+                os.remove(self.journal_path)
+            else:
+                with open(self.journal_path, "rb") as journal:
+                    windows = sum(1 for _ in journal) - 1
+                os.makedirs(os.path.dirname(checkpoint_path), exist_ok=True)
+                os.replace(self.journal_path, checkpoint_path)
+        print(f"--- INGEST: Decoded {windows} windows of {self.media_path} while uploading; its transcription resumes after them ---")
+
+    def _finish_fallback(self) -> None:
+        with self._cond:
+            self.fell_back = True
+            self.done = True
+            self.finished_at = time.time()
+            self._cond.notify_all()
+        self._remove_files()
+
+    def _remove_files(self) -> None:
+        for path in (self.pcm_path, self.journal_path):
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+
+    # --- Listeners ---
+
+    def _wait_events(self, cursor: int, timeout: float) -> tuple:
+        with self._cond:
+            self._cond.wait_for(lambda: len(self.events) > cursor or self.done or self._cancelled, timeout)
+            return self.events[cursor:], self.done or self._cancelled
+
+    async def stream(self) -> AsyncIterator[dict]:
+        """Yields every event from the first one; ends once the job is done, fell back or was cancelled."""
+        cursor = 0
+        while True:
+            events, finished = await asyncio.to_thread(self._wait_events, cursor, 1.0)
+            for event in events:
+                yield event
+            cursor += len(events)
+            if finished and not events:
+                return
+
+    async def wait_media_path(self) -> str:
+        """Waits for the upload to be finalized, so the saved file can be transcribed."""
+        while True:
+            with self._cond:
+                if self.media_path is not None:
+                    return self.media_path
+                if self._cancelled:
+                    raise asyncio.CancelledError()
+            await asyncio.sleep(0.2)
+
+    async def wait_done(self) -> None:
+        while True:
+            with self._cond:
+                if self.done or self._cancelled:
+                    return
+            await asyncio.sleep(0.2)
+
+
+class IngestJobs:
+    """Ingest jobs by upload id, with totals for /system/metrics."""
+
+    def __init__(self):
+        self._jobs: Dict[str, IngestJob] = {}
+        self._lock = threading.Lock()
+        self.started = 0
+        self.fallbacks = 0
+        self.segments_before_upload_complete = 0
+
+    def start(self, upload_id: str, part_path: str, size: int, profile: TranscriptionProfile) -> IngestJob:
+        # Finished jobs stay around for late listeners; drop those nobody collected.
+        cutoff = time.time() - FINISHED_JOB_TTL_SECONDS
+        with self._lock:
+            stale = [key for key, job in self._jobs.items() if job.finished_at and job.finished_at < cutoff]
+        for key in stale:
+            self.remove(key)
+
+        pcm_path = os.path.join(os.path.dirname(part_path), f"{upload_id}.f32")
+        job = IngestJob(upload_id, part_path, size, profile, pcm_path)
+        with self._lock:
+            self._jobs[upload_id] = job
+            self.started += 1
+        job.start()
+        return job
+
+    def get(self, upload_id: str) -> Optional[IngestJob]:
+        with self._lock:
+            return self._jobs.get(upload_id)
+
+    def remove(self, upload_id: str, cancel: bool = False) -> None:
+        with self._lock:
+            job = self._jobs.pop(upload_id, None)
+            if job is None:
+                return
+            self.fallbacks += int(job.fell_back)
+            self.segments_before_upload_complete += job.segments_before_upload_complete
+        if cancel:
+            job.cancel()
+
+    async def wait_handoff(self, media_path: str) -> None:
+        """Waits until the jobs of the upload saved at `media_path` have handed their windows over."""
+        media_path = os.path.normcase(os.path.abspath(media_path))
+        with self._lock:
+            jobs = [
+                job for job in self._jobs.values()
+                if job.media_path is not None and os.path.normcase(os.path.abspath(job.media_path)) == media_path
+            ]
+        for job in jobs:
+            await job.wait_done()
+
+    def active_decodes(self) -> int:
+        """Decode passes running right now, for the transcription queue load."""
+        with self._lock:
+            return sum(job.decoding for job in self._jobs.values())
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "active": len(self._jobs),
+                "decoding": sum(job.decoding for job in self._jobs.values()),
+                "started": self.started,
+                "fallbacks": self.fallbacks,
+                "segments_before_upload_complete": self.segments_before_upload_complete,
+            }
+
+
+ingest_jobs = IngestJobs()
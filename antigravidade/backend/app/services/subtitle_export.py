@@ -0,0 +1,74 @@
+import json
+from typing import Iterator, Optional
+
+from app.services.segment_store import SegmentStore
+
+EXPORT_FORMATS = {
+    "srt": ("application/x-subrip; charset=utf-8", "srt"),
+    "vtt": ("text/vtt; charset=utf-8", "vtt"),
+    "json": ("application/json", "json"),
+}
+
+# Cues rendered per chunk of a streamed export.
+EXPORT_CHUNK_SEGMENTS = 256
+
+
+def format_timestamp(seconds: float, separator: str) -> str:
+    milliseconds = max(0, int(round(seconds * 1000)))
+    hours, milliseconds = divmod(milliseconds, 3_600_000)
+    minutes, milliseconds = divmod(milliseconds, 60_000)
+    seconds, milliseconds = divmod(milliseconds, 1000)
+    return f"{hours:02d}:{minutes:02d}:{seconds:02d}{separator}{milliseconds:03d}"
+
+
+def _cue_text(text: str) -> str:
+    # A blank line ends a cue in both formats.
+    return "\n".join(line for line in text.strip().splitlines() if line.strip())
+
+
+def _chunks(store: SegmentStore, render) -> Iterator[str]:
+    for first in range(0, len(store), EXPORT_CHUNK_SEGMENTS):
+        yield "".join(render(index) for index in range(first, min(first + EXPORT_CHUNK_SEGMENTS, len(store))))
+
+
+def iter_srt(store: SegmentStore) -> Iterator[str]:
+    def render(index: int) -> str:
+        start = format_timestamp(float(store.starts[index]), ",")
+        end = format_timestamp(float(store.ends[index]), ",")
+        return f"{index + 1}\n{start} --> {end}\n{_cue_text(store.text_of(index))}\n\n"
+
+    yield from _chunks(store, render)
+
+
+def iter_vtt(store: SegmentStore) -> Iterator[str]:
+    def render(index: int) -> str:
+        start = format_timestamp(float(store.starts[index]), ".")
+        end = format_timestamp(float(store.ends[index]), ".")
+        return f"{start} --> {end}\n{_cue_text(store.text_of(index))}\n\n"
+
+    yield "WEBVTT\n\n"
+    yield from _chunks(store, render)
+
+
+def iter_json(store: SegmentStore, meta: Optional[dict] = None) -> Iterator[str]:
+    """Streams `{"language": ..., "duration": ..., "segments": [...]}` one chunk at a time."""
+    meta = meta or {}
+    header = {"language": meta.get("language"), "duration": meta.get("duration")}
+    yield json.dumps(header, ensure_ascii=False)[:-1] + ', "segments": ['
+
+    def render(index: int) -> str:
+        separator = "," if index else ""
+        return separator + json.dumps(store.segment(index), ensure_ascii=False)
+
+    yield from _chunks(store, render)
+    yield "]}"
+
+
+def iter_export(store: SegmentStore, export_format: str, meta: Optional[dict] = None) -> Iterator[str]:
+    if export_format == "srt":
+        return iter_srt(store)
+    if export_format == "vtt":
+        return iter_vtt(store)
+    if export_format == "json":
+        return iter_json(store, meta)
+    raise ValueError(f"Unknown export format '{export_format}'")
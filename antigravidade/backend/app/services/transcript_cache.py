@@ -0,0 +1,105 @@
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+from typing import Optional
+
+from app.core.config import settings
+from app.services.disk_cache import DiskCache
+from app.services.segment_store import SegmentStore
+
+
+def transcript_cache_key(
+    media_hash: str,
+    model_size: str,
+    beam_size: int,
+    language: Optional[str] = None,
+    vad: Optional[str] = None,
+) -> str:
+    """Builds the cache key of a transcript from the media content and the decoding settings."""
+    material = f"{media_hash}|model={model_size}|beam={beam_size}|language={language or 'auto'}"
+    if vad:
+        # Only speech regions were decoded; other thresholds give another transcript.
+        material += f"|vad={vad}"
+    return hashlib.sha256(material.encode("utf-8")).hexdigest()
+
+
+def transcript_segments_key(transcript_key: str) -> str:
+    """Cache key of the timed segments stored beside a transcript."""
+    return f"{transcript_key}.segments"
+
+
+def load_transcript_segments(transcript_key: str) -> Optional[SegmentStore]:
+    data = transcript_cache.get(transcript_segments_key(transcript_key))
+    return SegmentStore.from_buffer(data) if data is not None else None
+
+
+class TranscriptLinks:
+    """
+    Pointers from a media file to the transcript last produced or reused for it,
+    and from a document to the media it was transcribed from.
+
+    They are a few bytes each, so they live in their own index rather than in
+    the transcript cache: they neither count towards its entries and size nor
+    get evicted on their own. A link whose transcript was evicted finds nothing.
+    """
+
+    def __init__(self, path: str):
+        path = str(path)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS links ("
+            " kind TEXT NOT NULL,"
+            " source TEXT NOT NULL,"
+            " target TEXT NOT NULL,"
+            " updated_at REAL NOT NULL,"
+            " PRIMARY KEY (kind, source))"
+        )
+        self._db.commit()
+
+    def set(self, kind: str, source: str, target: str) -> None:
+        with self._lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO links (kind, source, target, updated_at) VALUES (?, ?, ?, ?)",
+                (kind, source, target, time.time()),
+            )
+            self._db.commit()
+
+    def get(self, kind: str, source: str) -> Optional[str]:
+        with self._lock:
+            row = self._db.execute("SELECT target FROM links WHERE kind = ? AND source = ?", (kind, source)).fetchone()
+        return row[0] if row is not None else None
+
+    def stats(self) -> dict:
+        with self._lock:
+            rows = self._db.execute("SELECT kind, COUNT(*) FROM links GROUP BY kind").fetchall()
+        return {"media": 0, "document": 0, **dict(rows)}
+
+
+def link_media_transcript(media_hash: str, transcript_key: str) -> None:
+    """Records the transcript last produced or reused for a media file."""
+    transcript_links.set("media", media_hash, transcript_key)
+
+
+def link_document_media(doc_id: str, media_hash: str) -> None:
+    """Records which media file a document was transcribed from."""
+    transcript_links.set("document", doc_id, media_hash)
+
+
+def find_media_hash(doc_id: str) -> Optional[str]:
+    return transcript_links.get("document", doc_id)
+
+
+def find_transcript_key(media_hash: str) -> Optional[str]:
+    return transcript_links.get("media", media_hash)
+
+
+transcript_cache = DiskCache(
+    settings.TRANSCRIPT_CACHE_DIR,
+    max_bytes=settings.TRANSCRIPT_CACHE_MAX_MB * 1024 * 1024,
+    name="transcripts",
+)
+transcript_links = TranscriptLinks(settings.TRANSCRIPT_CACHE_DIR / "links.sqlite3")
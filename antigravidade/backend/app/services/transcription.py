@@ -1,15 +1,24 @@
 import os
-from faster_whisper import WhisperModel
+from app.services.segment_store import SegmentStore, SegmentStoreBuilder
+from app.services.whisper_pool import whisper_pool
 
 class TranscriptionService:
-    def __init__(self, model_size="tiny", device="cpu", compute_type="int8"):
-        self.model = WhisperModel(model_size, device=device, compute_type=compute_type)
+    def __init__(self, model_size="tiny", device="cpu", compute_type="int8", cpu_threads=0, beam_size=5):
+        self.model_size = model_size
+        self.device = device
+        self.compute_type = compute_type
+        self.cpu_threads = cpu_threads
+        self.beam_size = beam_size
 
     def transcribe(self, audio_path: str) -> str:
-        segments, info = self.model.transcribe(audio_path, beam_size=5)
-        
-        text = []
-        for segment in segments:
-            text.append(segment.text)
-            
-        return " ".join(text).strip()
+        store = self.transcribe_segments(audio_path)
+        return " ".join(store.text_of(index) for index in range(len(store))).strip()
+
+    def transcribe_segments(self, audio_path: str) -> SegmentStore:
+        """Transcribes and keeps the timing of every segment, in compact arrays."""
+        builder = SegmentStoreBuilder()
+        with whisper_pool.acquire(self.model_size, self.device, self.compute_type, self.cpu_threads) as model:
+            segments, info = model.transcribe(audio_path, beam_size=self.beam_size)
+            for segment in segments:
+                builder.append({"start": segment.start, "end": segment.end, "text": segment.text})
+        return builder.build()
@@ -0,0 +1,110 @@
+import json
+import os
+import threading
+from typing import Callable, List, Optional
+
+from app.core.config import settings
+
+# Whisper resets its prompt after a window decoded above this temperature
+# (faster-whisper's `prompt_reset_on_temperature` default).
+PROMPT_RESET_TEMPERATURE = 0.5
+
+
+class TranscriptionCheckpoint:
+    """
+    Append-only journal of the decode units a transcription has finished.
+
+    The first line describes the decode plan (profile, mode, window sizes); each
+    following line commits one unit: a 30 s Whisper window in sequential mode, or
+    one audio window in parallel mode. Lines are flushed and fsynced as they are
+    written, so after a crash or a failed attempt the next run replays what was
+    committed and decodes only the rest. A journal written under another plan,
+    or a torn last line, is ignored.
+
+    `on_commit` is called with every unit once it is on disk.
+    """
+
+    def __init__(self, path: str, plan: dict, on_commit: Optional[Callable[[dict], None]] = None):
+        self.path = path
+        self.plan = plan
+        self.on_commit = on_commit
+        self._lock = threading.Lock()
+        self._prepared = False
+
+    @staticmethod
+    def path_for(key: str) -> str:
+        return os.path.join(settings.TRANSCRIPTION_CHECKPOINT_DIR, f"{key}.jsonl")
+
+    @classmethod
+    def for_key(cls, key: str, plan: dict) -> "TranscriptionCheckpoint":
+        return cls(cls.path_for(key), plan)
+
+    def load(self) -> List[dict]:
+        """Returns the committed units, or an empty list when there is nothing to resume."""
+        if not os.path.exists(self.path):
+            return []
+        units = []
+        with open(self.path, "r", encoding="utf-8") as f:
+            for index, line in enumerate(f):
+                try:
+                    record = json.loads(line)
+                except json.JSONDecodeError:
+                    # Torn write of the last unit; everything before it is intact.
+                    break
+                if index == 0:
+                    if record != {"plan": self.plan}:
+                        return []
+                    continue
+                units.append(record)
+        return units
+
+    def _prepare(self) -> None:
+        """Drops a journal written under another plan and trims a torn last line."""
+        if not os.path.exists(self.path):
+            return
+        with open(self.path, "rb+") as f:
+            header = f.readline()
+            try:
+                matches = json.loads(header) == {"plan": self.plan}
+            except json.JSONDecodeError:
+                matches = False
+            if matches:
+                data = f.read()
+                if data and not data.endswith(b"\n"):
+                    f.truncate(len(header) + data.rfind(b"\n") + 1)
+        if not matches:
+            os.remove(self.path)
+
+    def commit(self, unit: dict) -> None:
+        with self._lock:
+            if not self._prepared:
+                self._prepare()
+                self._prepared = True
+            fresh = not os.path.exists(self.path)
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            with open(self.path, "a", encoding="utf-8") as f:
+                if fresh:
+                    f.write(json.dumps({"plan": self.plan}) + "\n")
+                f.write(json.dumps(unit) + "\n")
+                f.flush()
+                os.fsync(f.fileno())
+        if self.on_commit is not None:
+            self.on_commit(unit)
+
+    def discard(self) -> None:
+        if os.path.exists(self.path):
+            os.remove(self.path)
+
+
+def resume_prompt(units: List[dict]) -> List[int]:
+    """
+    Rebuilds the token prompt Whisper carried after the committed windows, so the
+    first resumed window is decoded with exactly the context it had originally.
+    """
+    tokens: List[int] = []
+    for unit in units:
+        for segment in unit["segments"]:
+            tokens.extend(segment["tokens"])
+        if unit["temperature"] > PROMPT_RESET_TEMPERATURE:
+            tokens = []
+    return tokens
@@ -0,0 +1,320 @@
+"""
+Out-of-process transcription daemon.
+
+Owns the Whisper models for every web worker on the machine. Web workers send
+jobs over a local socket (a Unix socket, or a named pipe on Windows) and
+receive the segments back as they are decoded. Run it standalone with
+
+    python -m app.services.transcription_daemon
+
+or let the API start and supervise it (AIDO_TRANSCRIPTION_DAEMON=true).
+"""
+import asyncio
+import importlib
+import os
+import secrets
+import socket
+import struct
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from multiprocessing.connection import AuthenticationError, Client, Listener, answer_challenge, deliver_challenge
+from types import SimpleNamespace
+from typing import Callable, Optional
+
+from app.core.config import settings
+from app.services.transcription_profiles import resolve_profile
+from app.services.whisper_pool import whisper_pool
+
+BACKEND_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), "../.."))
+# A client that has not proved it holds the key by then is disconnected.
+HANDSHAKE_TIMEOUT_SECONDS = 10.0
+
+
+class DaemonUnavailableError(RuntimeError):
+    pass
+
+
+class DaemonBusyError(RuntimeError):
+    pass
+
+
+def _family(address: str) -> str:
+    return "AF_PIPE" if address.startswith("\\\\.\\pipe\\") else "AF_UNIX"
+
+
+def _set_timeout(conn, seconds: float) -> None:
+    """Bounds blocking reads and writes on a Unix socket connection; 0 waits forever."""
+    timeval = struct.pack("ll", int(seconds), int(seconds % 1 * 1_000_000))
+    # The duplicate shares the socket, so the options apply to `conn` too.
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM, fileno=os.dup(conn.fileno())) as sock:
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVTIMEO, timeval)
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_SNDTIMEO, timeval)
+
+
+def _authkey() -> bytes:
+    """
+    The key both ends must prove they hold: AIDO_TRANSCRIPTION_DAEMON_AUTHKEY, or
+    a random one generated once into AIDO_TRANSCRIPTION_DAEMON_AUTHKEY_FILE.
+    """
+    if settings.TRANSCRIPTION_DAEMON_AUTHKEY:
+        return settings.TRANSCRIPTION_DAEMON_AUTHKEY.encode()
+    path = str(settings.TRANSCRIPTION_DAEMON_AUTHKEY_FILE)
+    if not os.path.exists(path):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # A private (0600) file under a unique name, so concurrent writers never share one.
+        fd, temp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+        with os.fdopen(fd, "wb") as file:
+            file.write(secrets.token_hex(32).encode())
+        try:
+            # The first process to link its key wins; the others read that one.
+            os.link(temp_path, path)
+        except FileExistsError:
+            pass
+        finally:
+            os.remove(temp_path)
+    with open(path, "rb") as file:
+        key = file.read().strip()
+    if not key:
+        raise RuntimeError(f"Transcription daemon key file {path} is empty")
+    return key
+
+
+# --- Daemon side ---
+
+class TranscriptionDaemon:
+    def __init__(self, address: str, max_jobs: int):
+        self.address = address
+        self.max_jobs = max_jobs
+        # Jobs beyond this bound are rejected with "busy" instead of queueing without limit.
+        self._slots = threading.BoundedSemaphore(max_jobs)
+        self._active = 0
+        self._lock = threading.Lock()
+        self.jobs_completed = 0
+        self.jobs_rejected = 0
+        self.started_at = time.time()
+
+    def _run_job(self, conn, message: dict) -> dict:
+        # Imported lazily: the tool module is the one that imports this daemon's client.
+        tool = importlib.import_module("app.create.subagents.transcription.tools.transcribe_video")
+        # Checked again here: the daemon reads whatever path a client sends.
+        if not tool.is_allowed_media_path(message["media_path"]):
+            raise PermissionError(f"Security Error: Path '{message['media_path']}' is outside the allowed directory.")
+        profile = resolve_profile(message.get("profile"))
+
+        def on_segment(segment: dict) -> None:
+            # Blocks while the client's socket buffer is full, which throttles the decode.
+            conn.send({"op": "segment", **segment})
+
+        text, info = tool._run_transcription_sync(
+            message["media_path"], profile, on_segment, message.get("checkpoint_key")
+        )
+        return {
+            "op": "result",
+            "text": text,
+            "language": info.language,
+            "language_probability": info.language_probability,
+            "duration": info.duration,
+            "speech_seconds": info.speech_seconds,
+        }
+
+    def _handle(self, conn, authkey: bytes) -> None:
+        try:
+            # The handshake runs here rather than in accept(), so a client that
+            # stalls it only holds up its own connection, and only for so long.
+            # Named pipes have no timeout; Windows clients are local and trusted.
+            timeouts = _family(self.address) == "AF_UNIX"
+            try:
+                if timeouts:
+                    _set_timeout(conn, HANDSHAKE_TIMEOUT_SECONDS)
+                deliver_challenge(conn, authkey)
+                answer_challenge(conn, authkey)
+                if timeouts:
+                    _set_timeout(conn, 0)
+            except (OSError, EOFError, AuthenticationError) as exc:
+                print(f"--- DAEMON WARNING: Rejected connection: {exc or type(exc).__name__} ---")
+                return
+
+            while True:
+                try:
+                    message = conn.recv()
+                except EOFError:
+                    return
+
+                if message.get("op") == "ping":
+                    conn.send({"op": "pong", **self.stats()})
+                    continue
+
+                if message.get("op") != "transcribe":
+                    conn.send({"op": "error", "message": f"Unknown operation {message.get('op')!r}"})
+                    continue
+
+                if not self._slots.acquire(blocking=False):
+                    self.jobs_rejected += 1
+                    conn.send({"op": "busy", "max_jobs": self.max_jobs})
+                    continue
+                with self._lock:
+                    self._active += 1
+                try:
+                    result = self._run_job(conn, message)
+                    self.jobs_completed += 1
+                    conn.send(result)
+                except (BrokenPipeError, ConnectionResetError, EOFError):
+                    print("--- DAEMON: Client went away; job abandoned ---")
+                    return
+                except Exception as exc:
+                    conn.send({"op": "error", "message": str(exc)})
+                finally:
+                    with self._lock:
+                        self._active -= 1
+                    self._slots.release()
+        finally:
+            conn.close()
+
+    def stats(self) -> dict:
+        return {
+            "pid": os.getpid(),
+            "uptime_seconds": round(time.time() - self.started_at, 1),
+            "active_jobs": self._active,
+            "max_jobs": self.max_jobs,
+            "jobs_completed": self.jobs_completed,
+            "jobs_rejected": self.jobs_rejected,
+            "whisper_pool": whisper_pool.stats(),
+        }
+
+    def serve_forever(self) -> None:
+        family = _family(self.address)
+        if family == "AF_UNIX":
+            os.makedirs(os.path.dirname(self.address), exist_ok=True)
+            if os.path.exists(self.address):
+                # A live daemon answers pings; anything else is a stale socket file.
+                if ping(self.address) is not None:
+                    print(f"--- DAEMON: Another daemon already serves {self.address}; exiting ---")
+                    return
+                os.remove(self.address)
+
+        authkey = _authkey()
+        with Listener(self.address, family=family) as listener:
+            print(f"--- DAEMON: Listening on {self.address} (pid {os.getpid()}) ---")
+            while True:
+                try:
+                    conn = listener.accept()
+                except OSError as exc:
+                    print(f"--- DAEMON WARNING: Could not accept a connection: {exc} ---")
+                    continue
+                threading.Thread(target=self._handle, args=(conn, authkey), daemon=True).start()
+
+
+# --- Client side ---
+
+def ping(address: Optional[str] = None, timeout: float = 2.0) -> Optional[dict]:
+    """Returns the daemon's stats, or None when it does not answer."""
+    address = address or settings.TRANSCRIPTION_DAEMON_ADDRESS
+    try:
+        with Client(address, family=_family(address), authkey=_authkey()) as conn:
+            conn.send({"op": "ping"})
+            if not conn.poll(timeout):
+                return None
+            return conn.recv()
+    except (OSError, EOFError, ConnectionError):
+        return None
+
+
+def transcribe_remote(
+    media_path: str,
+    profile_name: str,
+    on_segment: Optional[Callable[[dict], None]] = None,
+    checkpoint_key: Optional[str] = None,
+) -> tuple:
+    """
+    Runs a transcription in the daemon. Mirrors the local
+    `_run_transcription_sync` and returns (text, info).
+    """
+    address = settings.TRANSCRIPTION_DAEMON_ADDRESS
+    try:
+        conn = Client(address, family=_family(address), authkey=_authkey())
+    except (OSError, ConnectionError) as exc:
+        raise DaemonUnavailableError(f"Transcription daemon unavailable at {address}: {exc}") from exc
+
+    with conn:
+        conn.send({
+            "op": "transcribe",
+            "media_path": os.path.abspath(media_path),
+            "profile": profile_name,
+            "checkpoint_key": checkpoint_key,
+        })
+        while True:
+            try:
+                message = conn.recv()
+            except EOFError as exc:
+                raise DaemonUnavailableError("Transcription daemon closed the connection mid-job") from exc
+
+            op = message.pop("op")
+            if op == "segment":
+                if on_segment is not None:
+                    on_segment(message)
+            elif op == "result":
+                text = message.pop("text")
+                return text, SimpleNamespace(**message)
+            elif op == "busy":
+                raise DaemonBusyError(f"Transcription daemon is at capacity ({message['max_jobs']} jobs)")
+            else:
+                raise RuntimeError(message.get("message", "Transcription daemon error"))
+
+
+class DaemonSupervisor:
+    """Starts the daemon when nothing answers on its address and restarts it when it dies."""
+
+    def __init__(self, address: str, check_interval: float = 5.0):
+        self.address = address
+        self.check_interval = check_interval
+        self.process: Optional[subprocess.Popen] = None
+        self.restarts = 0
+        self.last_health: Optional[dict] = None
+
+    def _spawn(self) -> None:
+        print(f"--- DAEMON SUPERVISOR: Starting transcription daemon on {self.address} ---")
+        self.process = subprocess.Popen(
+            [sys.executable, "-m", "app.services.transcription_daemon"],
+            cwd=BACKEND_DIR,
+        )
+
+    async def ensure_running(self) -> None:
+        self.last_health = await asyncio.to_thread(ping, self.address)
+        if self.last_health is not None:
+            return
+        if self.process is not None and self.process.poll() is None:
+            # Started but not listening yet (still loading models).
+            return
+        if self.process is not None:
+            self.restarts += 1
+        self._spawn()
+
+    async def run(self) -> None:
+        while True:
+            try:
+                await self.ensure_running()
+            except Exception as exc:
+                print(f"--- DAEMON SUPERVISOR WARNING: {exc} ---")
+            await asyncio.sleep(self.check_interval)
+
+    def stats(self) -> dict:
+        return {
+            "address": self.address,
+            "healthy": self.last_health is not None,
+            "restarts": self.restarts,
+            "daemon": self.last_health,
+        }
+
+
+def main() -> None:
+    if settings.WHISPER_WARMUP:
+        profile = resolve_profile(None)
+        whisper_pool.warm_up(*profile.model_key, instances=settings.WHISPER_POOL_SIZE)
+    TranscriptionDaemon(settings.TRANSCRIPTION_DAEMON_ADDRESS, settings.TRANSCRIPTION_DAEMON_MAX_JOBS).serve_forever()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,77 @@
+from dataclasses import dataclass
+from typing import Dict, Optional
+
+from app.core.config import settings
+
+
+@dataclass(frozen=True)
+class TranscriptionProfile:
+    name: str
+    model_size: str
+    beam_size: int
+    best_of: int
+    cpu_threads: int
+    num_workers: int
+    # Decode only the speech regions found by the VAD pre-pass (AIDO_VAD_* thresholds).
+    vad_filter: bool
+    # Expected decode seconds per second of audio on CPU, used by the `auto` profile.
+    realtime_factor: float
+
+    @property
+    def device(self) -> str:
+        return settings.WHISPER_DEVICE
+
+    @property
+    def compute_type(self) -> str:
+        return settings.WHISPER_COMPUTE
+
+    @property
+    def model_key(self) -> tuple:
+        return (self.model_size, self.device, self.compute_type, self.cpu_threads, self.num_workers)
+
+
+# Ordered from most to least accurate; `auto` picks the first one that meets the deadline.
+PROFILES: Dict[str, TranscriptionProfile] = {
+    "accurate": TranscriptionProfile(
+        name="accurate", model_size="small", beam_size=5, best_of=5,
+        cpu_threads=0, num_workers=1, vad_filter=False, realtime_factor=0.35,
+    ),
+    "balanced": TranscriptionProfile(
+        name="balanced", model_size=settings.WHISPER_MODEL, beam_size=5, best_of=5,
+        cpu_threads=0, num_workers=1, vad_filter=True, realtime_factor=0.12,
+    ),
+    "fast": TranscriptionProfile(
+        name="fast", model_size="tiny", beam_size=1, best_of=1,
+        cpu_threads=0, num_workers=2, vad_filter=True, realtime_factor=0.04,
+    ),
+}
+
+AUTO_PROFILE = "auto"
+
+
+class UnknownProfileError(ValueError):
+    pass
+
+
+def resolve_profile(name: Optional[str], duration: Optional[float] = None, queue_load: int = 0) -> TranscriptionProfile:
+    """
+    Returns the profile for `name`, falling back to AIDO_WHISPER_PROFILE.
+
+    For `auto`, the decode time of each profile is estimated from the media
+    duration and the number of transcriptions already running (which share the
+    CPU), and the most accurate profile that fits AIDO_TRANSCRIPTION_DEADLINE_SECONDS
+    is chosen. Without a known duration, `auto` behaves like `balanced`.
+    """
+    name = (name or settings.WHISPER_PROFILE).lower()
+    if name != AUTO_PROFILE:
+        if name not in PROFILES:
+            raise UnknownProfileError(f"Unknown transcription profile '{name}'. Use one of: {', '.join([*PROFILES, AUTO_PROFILE])}.")
+        return PROFILES[name]
+
+    if not duration:
+        return PROFILES["balanced"]
+
+    for profile in PROFILES.values():
+        if duration * profile.realtime_factor * (1 + queue_load) <= settings.TRANSCRIPTION_DEADLINE_SECONDS:
+            return profile
+    return PROFILES["fast"]
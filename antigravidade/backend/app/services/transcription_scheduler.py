@@ -0,0 +1,259 @@
+import threading
+import time
+from collections import deque
+from types import SimpleNamespace
+from typing import Callable, Deque, List, Optional, Tuple
+
+import numpy as np
+from faster_whisper import BatchedInferencePipeline
+from faster_whisper.vad import get_speech_timestamps
+
+from app.core.config import settings
+from app.services.audio_extraction import SAMPLE_RATE, load_audio
+from app.services.speech_detection import vad_options
+from app.services.transcription_profiles import TranscriptionProfile
+from app.services.whisper_pool import whisper_pool
+
+# Whisper's receptive field; every chunk handed to the batched pipeline must fit in it.
+MAX_CHUNK_SECONDS = 30.0
+
+
+class _Job:
+    def __init__(self, audio_path: str, profile: TranscriptionProfile, on_segment: Optional[Callable[[dict], None]]):
+        self.audio = load_audio(audio_path)
+        self.profile = profile
+        # Chunks can share a batch only when they decode with the same model and options.
+        self.batch_group = (profile.model_key, profile.beam_size)
+        self.duration = len(self.audio) / SAMPLE_RATE
+        self.on_segment = on_segment
+        self.submitted_at = time.perf_counter()
+        self.started_at: Optional[float] = None
+        self.chunks: Deque[Tuple[int, int]] = deque()
+        # Every speech chunk of the job, including those already decoded.
+        self.chunk_spans: List[Tuple[int, int]] = []
+        self.remaining = 0
+        self.segments: List[dict] = []
+        self.languages: List[Tuple[float, str]] = []
+        self.error: Optional[BaseException] = None
+        self.done = threading.Event()
+
+
+class TranscriptionScheduler:
+    """
+    Groups concurrent transcription jobs into shared batched-inference calls.
+
+    Each submitted job is cut into speech chunks of at most 30 seconds. A single
+    worker thread fills batches of up to `batch_size` chunks, taking chunks from
+    pending jobs in turn, and waits at most `max_wait_ms` for a batch to fill.
+    The batch runs through faster-whisper's BatchedInferencePipeline on one
+    pooled model, and its segments are routed back to the jobs they came from.
+    """
+
+    def __init__(self, batch_size: int, max_wait_ms: int):
+        self.batch_size = max(1, batch_size)
+        self.max_wait = max_wait_ms / 1000
+        self._jobs: Deque[_Job] = deque()
+        self._cond = threading.Condition()
+        self._worker: Optional[threading.Thread] = None
+
+        self.jobs_started = 0
+        self.jobs_completed = 0
+        self.batches = 0
+        self.chunks_decoded = 0
+        self.last_batch_size = 0
+        self.wait_seconds_total = 0.0
+        self.last_wait_seconds = 0.0
+
+    def _ensure_worker(self) -> None:
+        if self._worker is None or not self._worker.is_alive():
+            self._worker = threading.Thread(target=self._run, name="transcription-scheduler", daemon=True)
+            self._worker.start()
+
+    def transcribe(
+        self,
+        audio_path: str,
+        profile: TranscriptionProfile,
+        on_segment: Optional[Callable[[dict], None]] = None,
+    ) -> Tuple[str, SimpleNamespace]:
+        """Blocks until the job's chunks have gone through the shared batches."""
+        job = _Job(audio_path, profile, on_segment)
+        # Short pauses are enough to cut chunks here; the other thresholds are the configured ones.
+        speech = get_speech_timestamps(
+            job.audio,
+            vad_options(max_speech_duration_s=MAX_CHUNK_SECONDS, min_silence_duration_ms=160),
+        )
+        job.chunks.extend((chunk["start"], chunk["end"]) for chunk in speech)
+        job.chunk_spans = list(job.chunks)
+        job.remaining = len(job.chunks)
+
+        if job.remaining:
+            with self._cond:
+                self._jobs.append(job)
+                self._ensure_worker()
+                self._cond.notify_all()
+            job.done.wait()
+
+        if job.error is not None:
+            raise job.error
+
+        job.segments.sort(key=lambda segment: segment["start"])
+        probability, language = max(job.languages) if job.languages else (0.0, None)
+        info = SimpleNamespace(
+            language=language,
+            language_probability=probability,
+            duration=job.duration,
+            speech_seconds=sum(end - start for start, end in job.chunk_spans) / SAMPLE_RATE,
+        )
+        return "".join(segment["text"] for segment in job.segments).strip(), info
+
+    def _pending_chunks(self) -> int:
+        return sum(len(job.chunks) for job in self._jobs)
+
+    def _take_batch(self) -> List[Tuple[_Job, int, int]]:
+        """
+        Takes up to `batch_size` chunks, one per job in turn, so a long video cannot
+        starve short ones. Only jobs decoded with the same model and beam size share a batch.
+        """
+        group = next(job.batch_group for job in self._jobs if job.chunks)
+        batch = []
+        while len(batch) < self.batch_size:
+            progressed = False
+            for job in list(self._jobs):
+                if job.chunks and job.batch_group == group and len(batch) < self.batch_size:
+                    start, end = job.chunks.popleft()
+                    batch.append((job, start, end))
+                    progressed = True
+            if not progressed:
+                break
+        return batch
+
+    def _run(self) -> None:
+        while True:
+            batch = []
+            try:
+                with self._cond:
+                    while not self._pending_chunks():
+                        self._cond.wait()
+                    oldest = min(job.submitted_at for job in self._jobs if job.chunks)
+                    deadline = oldest + self.max_wait
+                    while self._pending_chunks() < self.batch_size and time.perf_counter() < deadline:
+                        self._cond.wait(timeout=deadline - time.perf_counter())
+                    batch = self._take_batch()
+
+                self._decode(batch)
+            except Exception as exc:
+                # The worker outlives a failed batch; its jobs (or, when the batch could
+                # not even be formed, every queued job) end with the error instead of
+                # leaving their callers waiting.
+                print(f"--- TRANSCRIPTION SCHEDULER WARNING: Batch failed: {exc} ---")
+                with self._cond:
+                    affected = [job for job, _, _ in batch] or list(self._jobs)
+                for job in {id(job): job for job in affected}.values():
+                    self._finish(job, exc)
+
+    def _decode(self, batch: List[Tuple[_Job, int, int]]) -> None:
+        now = time.perf_counter()
+        for job, _, _ in batch:
+            if job.started_at is None:
+                job.started_at = now
+                self.jobs_started += 1
+                wait = now - job.submitted_at
+                self.wait_seconds_total += wait
+                self.last_wait_seconds = wait
+
+        # Lay the chunks end to end and describe each one with clip timestamps.
+        pieces, clips, offsets = [], [], []
+        position = 0
+        for job, start, end in batch:
+            pieces.append(np.asarray(job.audio[start:end], dtype=np.float32))
+            offsets.append(position / SAMPLE_RATE)
+            clips.append({"start": position / SAMPLE_RATE, "end": (position + end - start) / SAMPLE_RATE})
+            position += end - start
+
+        try:
+            profile = batch[0][0].profile
+            with whisper_pool.acquire(*profile.model_key) as model:
+                segments, info = BatchedInferencePipeline(model).transcribe(
+                    np.concatenate(pieces),
+                    clip_timestamps=clips,
+                    batch_size=len(batch),
+                    beam_size=profile.beam_size,
+                    best_of=profile.best_of,
+                    without_timestamps=False,
+                    multilingual=True,
+                )
+                segments = list(segments)
+                # The seek faster-whisper stamps on a clip's segments, computed the way it
+                # does (clip start rounded down to a sample, then to a frame); rounding the
+                # offset straight to frames can land one frame off.
+                chunk_by_seek = {
+                    int(int(clip["start"] * SAMPLE_RATE) / SAMPLE_RATE * model.frames_per_second): index
+                    for index, clip in enumerate(clips)
+                }
+        except Exception as exc:
+            for job in {id(job): job for job, _, _ in batch}.values():
+                self._finish(job, exc)
+            return
+
+        self.batches += 1
+        self.chunks_decoded += len(batch)
+        self.last_batch_size = len(batch)
+
+        routed = {id(job): [] for job, _, _ in batch}
+        for segment in segments:
+            # Each segment's seek is the frame offset of the chunk it was decoded from;
+            # a seek matching no chunk fails the batch rather than guessing its owner.
+            index = chunk_by_seek.get(segment.seek)
+            if index is None:
+                raise RuntimeError(f"Segment at frame {segment.seek} matches no chunk of the batch")
+            job, start, _ = batch[index]
+            shift = start / SAMPLE_RATE - offsets[index]
+            routed[id(job)].append({"start": segment.start + shift, "end": segment.end + shift, "text": segment.text})
+
+        for job, _, _ in batch:
+            job.remaining -= 1
+        for job in {id(job): job for job, _, _ in batch}.values():
+            job.languages.append((info.language_probability, info.language))
+            for segment in sorted(routed[id(job)], key=lambda s: s["start"]):
+                job.segments.append(segment)
+                if job.on_segment is not None:
+                    try:
+                        job.on_segment({**segment, "progress": min(segment["end"] / job.duration, 1.0)})
+                    except BaseException as exc:
+                        self._finish(job, exc)
+                        break
+            if job.remaining == 0:
+                self._finish(job)
+
+    def _finish(self, job: _Job, error: Optional[BaseException] = None) -> None:
+        with self._cond:
+            if job in self._jobs:
+                self._jobs.remove(job)
+        if job.done.is_set():
+            return
+        job.error = error
+        self.jobs_completed += 1
+        job.done.set()
+
+    def stats(self) -> dict:
+        with self._cond:
+            queued_jobs = len(self._jobs)
+            queued_chunks = self._pending_chunks()
+        return {
+            "batch_size": self.batch_size,
+            "max_wait_ms": int(self.max_wait * 1000),
+            "queued_jobs": queued_jobs,
+            "queued_chunks": queued_chunks,
+            "jobs_completed": self.jobs_completed,
+            "batches": self.batches,
+            "last_batch_size": self.last_batch_size,
+            "avg_batch_size": round(self.chunks_decoded / self.batches, 2) if self.batches else 0.0,
+            "last_wait_seconds": round(self.last_wait_seconds, 3),
+            "avg_wait_seconds": round(self.wait_seconds_total / self.jobs_started, 3) if self.jobs_started else 0.0,
+        }
+
+
+transcription_scheduler = TranscriptionScheduler(
+    batch_size=settings.TRANSCRIPTION_BATCH_SIZE,
+    max_wait_ms=settings.TRANSCRIPTION_BATCH_MAX_WAIT_MS,
+)
@@ -0,0 +1,209 @@
+import hashlib
+import os
+import re
+import shutil
+import sqlite3
+import threading
+import time
+from typing import Optional
+
+from app.core.config import settings
+from app.services.audio_extraction import AUDIO_DIRNAME
+from app.services.media_hash import remember_file_sha256
+
+OBJECTS_DIRNAME = "objects"
+_TOKEN = re.compile(r"^[0-9a-f]{64}$")
+
+
+def is_file_token(token: Optional[str]) -> bool:
+    return bool(token) and _TOKEN.match(token) is not None
+
+
+class HashingWriter:
+    """Writes an incoming upload to a temporary file, hashing it on the way."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self.size = 0
+        self._digest = hashlib.sha256()
+        self._file = open(path, "wb")
+
+    def write(self, data: bytes) -> None:
+        self._digest.update(data)
+        self._file.write(data)
+        self.size += len(data)
+
+    def close(self) -> str:
+        """Closes the file and returns its SHA-256."""
+        self._file.close()
+        return self._digest.hexdigest()
+
+    def discard(self) -> None:
+        self._file.close()
+        try:
+            os.remove(self.path)
+        except FileNotFoundError:
+            pass
+
+
+class UploadStore:
+    """
+    Uploaded files stored once per content, under `objects/<sha256[:2]>/`.
+
+    The SHA-256 of a file is its `file_token`. Documents link to the files they
+    use, and a file is deleted when its last link goes, so the same video
+    uploaded for several documents is kept once and a new upload never replaces
+    a file another job is reading. Files that were never linked are removed
+    by `discard_orphans` after a grace period.
+    """
+
+    def __init__(self, directory: str):
+        self.directory = os.path.join(str(directory), OBJECTS_DIRNAME)
+        self.deduplicated = 0
+        self.bytes_saved = 0
+        os.makedirs(self.directory, exist_ok=True)
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(os.path.join(self.directory, "index.sqlite3"), check_same_thread=False)
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS blobs ("
+            " sha256 TEXT PRIMARY KEY,"
+            " path TEXT NOT NULL,"
+            " size INTEGER NOT NULL,"
+            " filename TEXT NOT NULL,"
+            " created_at REAL NOT NULL)"
+        )
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS links ("
+            " doc_id TEXT NOT NULL,"
+            " sha256 TEXT NOT NULL,"
+            " filename TEXT NOT NULL,"
+            " created_at REAL NOT NULL,"
+            " PRIMARY KEY (doc_id, sha256))"
+        )
+        self._db.execute("CREATE INDEX IF NOT EXISTS links_sha256 ON links (sha256)")
+        self._db.commit()
+
+    def writer(self) -> HashingWriter:
+        return HashingWriter(os.path.join(self.directory, f"incoming.{os.getpid()}.{threading.get_ident()}.{time.monotonic_ns()}.tmp"))
+
+    def path_for(self, sha256: str) -> Optional[str]:
+        if not is_file_token(sha256):
+            return None
+        with self._lock:
+            row = self._db.execute("SELECT path FROM blobs WHERE sha256 = ?", (sha256,)).fetchone()
+        if row is None or not os.path.exists(row[0]):
+            return None
+        return row[0]
+
+    def resolve(self, token: str) -> Optional[str]:
+        """
+        The path of a `file_token`. Tokens issued before uploads were stored by
+        content are paths; they are returned unchanged and checked by the caller.
+        """
+        if is_file_token(token):
+            return self.path_for(token)
+        return token
+
+    def reuse(self, sha256: str) -> Optional[str]:
+        """The stored path of content a client is about to upload again, counted as a saved upload."""
+        path = self.path_for(sha256)
+        if path is not None:
+            with self._lock:
+                self.deduplicated += 1
+                self.bytes_saved += os.path.getsize(path)
+        return path
+
+    def add(self, source_path: str, sha256: str, filename: str) -> str:
+        """Moves a complete upload into the store, or drops it if the content is already there."""
+        extension = os.path.splitext(filename)[1].lower()
+        path = os.path.join(self.directory, sha256[:2], f"{sha256}{extension}")
+        with self._lock:
+            row = self._db.execute("SELECT path FROM blobs WHERE sha256 = ?", (sha256,)).fetchone()
+            if row is not None and os.path.exists(row[0]):
+                size = os.path.getsize(source_path)
+                os.remove(source_path)
+                self.deduplicated += 1
+                self.bytes_saved += size
+                print(f"--- UPLOAD STORE: '{filename}' is already stored as {sha256[:12]}; keeping one copy ---")
+                return row[0]
+
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            shutil.move(source_path, path)
+            self._db.execute(
+                "INSERT OR REPLACE INTO blobs (sha256, path, size, filename, created_at) VALUES (?, ?, ?, ?, ?)",
+                (sha256, path, os.path.getsize(path), os.path.basename(filename), time.time()),
+            )
+            self._db.commit()
+        # The content was just hashed; later lookups by path need not read it again.
+        remember_file_sha256(path, sha256)
+        return path
+
+    def link(self, sha256: str, doc_id: str, filename: Optional[str] = None) -> int:
+        """Records that `doc_id` uses the file; returns the file's reference count."""
+        with self._lock:
+            row = self._db.execute("SELECT filename FROM blobs WHERE sha256 = ?", (sha256,)).fetchone()
+            if row is None:
+                raise KeyError(sha256)
+            self._db.execute(
+                "INSERT OR IGNORE INTO links (doc_id, sha256, filename, created_at) VALUES (?, ?, ?, ?)",
+                (doc_id, sha256, os.path.basename(filename or row[0]), time.time()),
+            )
+            self._db.commit()
+            return self._refcount(sha256)
+
+    def _refcount(self, sha256: str) -> int:
+        return self._db.execute("SELECT COUNT(*) FROM links WHERE sha256 = ?", (sha256,)).fetchone()[0]
+
+    def refcount(self, sha256: str) -> int:
+        with self._lock:
+            return self._refcount(sha256)
+
+    def unlink(self, sha256: str, doc_id: str) -> int:
+        """Drops a document's link; the file is deleted with its last link. Returns the remaining count."""
+        with self._lock:
+            self._db.execute("DELETE FROM links WHERE doc_id = ? AND sha256 = ?", (doc_id, sha256))
+            remaining = self._refcount(sha256)
+            if remaining == 0:
+                self._delete(sha256)
+            self._db.commit()
+            return remaining
+
+    def _delete(self, sha256: str) -> None:
+        row = self._db.execute("SELECT path FROM blobs WHERE sha256 = ?", (sha256,)).fetchone()
+        self._db.execute("DELETE FROM blobs WHERE sha256 = ?", (sha256,))
+        if row is not None:
+            # The extracted audio beside the file is named after the same digest.
+            for path in (row[0], os.path.join(os.path.dirname(row[0]), AUDIO_DIRNAME, f"{sha256}.f32")):
+                try:
+                    os.remove(path)
+                except FileNotFoundError:
+                    pass
+
+    def discard_orphans(self, max_age_seconds: float) -> int:
+        """Deletes files that no document has linked to within `max_age_seconds` of their upload."""
+        cutoff = time.time() - max_age_seconds
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT sha256 FROM blobs WHERE created_at < ?"
+                " AND NOT EXISTS (SELECT 1 FROM links WHERE links.sha256 = blobs.sha256)",
+                (cutoff,),
+            ).fetchall()
+            for (sha256,) in rows:
+                self._delete(sha256)
+            self._db.commit()
+        return len(rows)
+
+    def stats(self) -> dict:
+        with self._lock:
+            files, total = self._db.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM blobs").fetchone()
+            links = self._db.execute("SELECT COUNT(*) FROM links").fetchone()[0]
+        return {
+            "files": files,
+            "bytes": total,
+            "links": links,
+            "deduplicated": self.deduplicated,
+            "bytes_saved": self.bytes_saved,
+        }
+
+
+upload_store = UploadStore(settings.DATA_DIR / "entrada")
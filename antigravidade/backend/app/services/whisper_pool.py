@@ -0,0 +1,169 @@
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, Tuple
+
+from faster_whisper import WhisperModel
+
+from app.core.config import settings
+
+# (model size, device, compute type, cpu threads, num workers)
+ModelKey = Tuple[str, str, str, int, int]
+
+
+class _PoolEntry:
+    def __init__(self):
+        self.idle = []
+        self.created = 0
+        self.in_use = 0
+        self.loads = 0
+        self.load_seconds_total = 0.0
+        self.last_load_seconds = 0.0
+        self.acquisitions = 0
+        self.reuses = 0
+        self.wait_seconds_total = 0.0
+
+
+class WhisperModelPool:
+    """
+    Process-wide registry of faster-whisper models.
+
+    Models are created lazily and kept per (model size, device, compute type,
+    cpu threads, num workers).
+    Each key holds at most `max_instances` models; a caller checks one out with
+    `acquire()` and blocks while every instance of that key is busy.
+    """
+
+    def __init__(self, max_instances: int = 1):
+        self.max_instances = max(1, max_instances)
+        self._entries: Dict[ModelKey, _PoolEntry] = {}
+        self._cond = threading.Condition()
+
+    def _load(self, key: ModelKey) -> WhisperModel:
+        model_size, device, compute_type, cpu_threads, num_workers = key
+        print(f"--- WHISPER POOL: Loading model '{model_size}' ({device}/{compute_type}) ---")
+        started = time.perf_counter()
+        model = WhisperModel(
+            model_size,
+            device=device,
+            compute_type=compute_type,
+            cpu_threads=cpu_threads,
+            num_workers=num_workers,
+        )
+        elapsed = time.perf_counter() - started
+
+        with self._cond:
+            entry = self._entries[key]
+            entry.loads += 1
+            entry.load_seconds_total += elapsed
+            entry.last_load_seconds = elapsed
+        print(f"--- WHISPER POOL: Model '{model_size}' loaded in {elapsed:.2f}s ---")
+        return model
+
+    def _checkout(self, key: ModelKey) -> WhisperModel:
+        started = time.perf_counter()
+        with self._cond:
+            entry = self._entries.setdefault(key, _PoolEntry())
+            while not entry.idle and entry.created >= self.max_instances:
+                self._cond.wait()
+
+            entry.acquisitions += 1
+            entry.wait_seconds_total += time.perf_counter() - started
+            entry.in_use += 1
+            if entry.idle:
+                entry.reuses += 1
+                return entry.idle.pop()
+
+            # Reserve the slot before loading outside the lock.
+            entry.created += 1
+
+        try:
+            return self._load(key)
+        except Exception:
+            with self._cond:
+                entry.created -= 1
+                entry.in_use -= 1
+                self._cond.notify_all()
+            raise
+
+    def _checkin(self, key: ModelKey, model: WhisperModel) -> None:
+        with self._cond:
+            entry = self._entries.get(key)
+            if entry is None:
+                # The pool was cleared while this model was checked out.
+                return
+            entry.in_use -= 1
+            entry.idle.append(model)
+            self._cond.notify_all()
+
+    @contextmanager
+    def acquire(self, model_size: str, device: str, compute_type: str, cpu_threads: int = 0, num_workers: int = 1):
+        """Checks out a model for exclusive use, loading it on first demand."""
+        key = (model_size, device, compute_type, cpu_threads, num_workers)
+        model = self._checkout(key)
+        try:
+            yield model
+        finally:
+            self._checkin(key, model)
+
+    def warm_up(
+        self,
+        model_size: str,
+        device: str,
+        compute_type: str,
+        cpu_threads: int = 0,
+        num_workers: int = 1,
+        instances: int = 1,
+    ) -> None:
+        """Loads up to `instances` models for the key ahead of the first request."""
+        key = (model_size, device, compute_type, cpu_threads, num_workers)
+        instances = min(max(1, instances), self.max_instances)
+        while True:
+            with self._cond:
+                entry = self._entries.setdefault(key, _PoolEntry())
+                if entry.created >= instances:
+                    return
+                entry.created += 1
+            try:
+                model = self._load(key)
+            except Exception:
+                with self._cond:
+                    entry.created -= 1
+                    self._cond.notify_all()
+                raise
+            with self._cond:
+                entry.idle.append(model)
+                self._cond.notify_all()
+
+    def stats(self) -> dict:
+        with self._cond:
+            return {
+                "max_instances": self.max_instances,
+                "models": [
+                    {
+                        "model_size": key[0],
+                        "device": key[1],
+                        "compute_type": key[2],
+                        "cpu_threads": key[3],
+                        "num_workers": key[4],
+                        "instances": entry.created,
+                        "in_use": entry.in_use,
+                        "loads": entry.loads,
+                        "load_seconds_total": round(entry.load_seconds_total, 3),
+                        "last_load_seconds": round(entry.last_load_seconds, 3),
+                        "acquisitions": entry.acquisitions,
+                        "reuses": entry.reuses,
+                        "wait_seconds_total": round(entry.wait_seconds_total, 3),
+                    }
+                    for key, entry in self._entries.items()
+                ],
+            }
+
+    def clear(self) -> None:
+        """Drops every idle model; models currently checked out are released on return."""
+        with self._cond:
+            self._entries.clear()
+            self._cond.notify_all()
+
+
+whisper_pool = WhisperModelPool(max_instances=settings.WHISPER_POOL_SIZE)
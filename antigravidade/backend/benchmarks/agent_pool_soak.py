@@ -0,0 +1,108 @@
+"""
+Soak test for the LLM stage runners: resident memory over thousands of pipeline runs.
+
+Run from antigravidade/backend:
+
+    python -m benchmarks.agent_pool_soak --runs 5000
+    python -m benchmarks.agent_pool_soak --runs 5000 --unpooled
+
+Each run calls the four stages of a pipeline run through the server's
+`_run_adhoc_agent`, against a local echo model, so only the ADK agent, runner and
+session overhead is measured. `--unpooled` builds an agent, runner and session
+per call and never deletes the session, as the server did before the pool, to
+compare memory and per-call overhead. RSS is sampled every `--sample-every`
+runs; a flat series means nothing accumulates per run.
+"""
+import argparse
+import asyncio
+import gc
+import json
+import os
+import resource
+import sys
+import time
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from google.adk.agents import Agent
+from google.adk.models import BaseLlm, LlmResponse
+from google.adk.runners import InMemoryRunner
+from google.genai import types
+
+from app import server
+from app.services.agent_pool import agent_pool
+
+STAGES = ["StructuringAgent", "MasteringAgent", "JsonAgent", "WriterAgent"]
+TRANSCRIPT = "Abra a válvula de entrada, confira a pressão no manômetro e registre o valor. " * 40
+
+
+class EchoLlm(BaseLlm):
+    model: str = "echo"
+
+    async def generate_content_async(self, llm_request, stream=False):
+        text = llm_request.contents[-1].parts[0].text
+        yield LlmResponse(content=types.Content(role="model", parts=[types.Part(text=text)]))
+
+
+def rss_bytes() -> int:
+    try:
+        with open("/proc/self/statm") as file:
+            return int(file.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except OSError:
+        # Peak rather than current RSS, in KiB on Linux and bytes on macOS.
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak if sys.platform == "darwin" else peak * 1024
+
+
+async def run_unpooled(name: str, instruction: str, content: str, model) -> str:
+    runner = InMemoryRunner(agent=Agent(name=name, model=model, instruction=instruction), app_name=name)
+    session_id = f"sess_{name}_{os.urandom(4).hex()}"
+    await runner.session_service.create_session(session_id=session_id, user_id="system", app_name=name)
+    text = ""
+    async for event in runner.run_async(user_id="system", session_id=session_id, new_message=server.SimpleMessage(content)):
+        if event.content and event.content.parts:
+            text += event.content.parts[0].text
+    return text
+
+
+async def soak(runs: int, sample_every: int, unpooled: bool) -> list:
+    model = EchoLlm()
+    call = run_unpooled if unpooled else server._run_adhoc_agent
+    samples = []
+    started = time.perf_counter()
+    for run in range(1, runs + 1):
+        context = f"{run}: {TRANSCRIPT}"
+        for stage in STAGES:
+            result = call(stage, f"Instrução do {stage}.", context, model)
+            context = await result
+        if run % sample_every == 0:
+            gc.collect()
+            samples.append({"runs": run, "rss_mb": round(rss_bytes() / 2**20, 1), "ms_per_run": round((time.perf_counter() - started) / run * 1000, 2)})
+            print(f"{run:>6} runs  rss {samples[-1]['rss_mb']:>8.1f} MB", file=sys.stderr)
+    return samples
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=3000)
+    parser.add_argument("--sample-every", type=int, default=500)
+    parser.add_argument("--unpooled", action="store_true")
+    args = parser.parse_args()
+
+    # The throughput history is not what is being measured.
+    server.throughput_history.record_llm = lambda *call_args: None
+    samples = asyncio.run(soak(args.runs, args.sample_every, args.unpooled))
+    # The first sample absorbs imports and warm-up allocations.
+    first, last = samples[min(1, len(samples) - 1)], samples[-1]
+    growth = (last["rss_mb"] - first["rss_mb"]) / max(last["runs"] - first["runs"], 1) * 1000
+    print(json.dumps({
+        "mode": "unpooled" if args.unpooled else "pooled",
+        "runs": args.runs,
+        "samples": samples,
+        "rss_growth_mb_per_1000_runs": round(growth, 2),
+        "agent_pool": agent_pool.stats(),
+    }, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,101 @@
+"""
+Wall-clock comparison of single-stream and parallel chunked transcription.
+
+Run from antigravidade/backend:
+
+    python -m benchmarks.parallel_transcription ../data/entrada/video.mp4 --workers 2 4 8
+
+Each configuration runs `--repeat` times and the fastest run is reported, so the
+first (cold) run absorbs worker start-up and model loading.
+"""
+import argparse
+import difflib
+import json
+import os
+import sys
+import time
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from faster_whisper import WhisperModel
+
+from app.services.audio_extraction import SAMPLE_RATE, extract_audio, load_audio
+from app.services.parallel_transcription import transcribe_parallel
+
+
+def run_single(audio, model_size, compute_type, beam_size):
+    model = WhisperModel(model_size, device="cpu", compute_type=compute_type, cpu_threads=os.cpu_count() or 1)
+    started = time.perf_counter()
+    segments, _ = model.transcribe(audio, beam_size=beam_size)
+    text = "".join(segment.text for segment in segments).strip()
+    return time.perf_counter() - started, text
+
+
+def run_parallel(audio_path, workers, window, overlap, model_size, compute_type, beam_size):
+    started = time.perf_counter()
+    text, _ = transcribe_parallel(
+        audio_path,
+        workers=workers,
+        window_seconds=window,
+        overlap_seconds=overlap,
+        model_size=model_size,
+        device="cpu",
+        compute_type=compute_type,
+        beam_size=beam_size,
+    )
+    return time.perf_counter() - started, text
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("media", help="Audio or video file to transcribe")
+    parser.add_argument("--workers", type=int, nargs="+", default=[2, 4])
+    parser.add_argument("--window", type=float, default=120.0)
+    parser.add_argument("--overlap", type=float, default=4.0)
+    parser.add_argument("--model", default="tiny")
+    parser.add_argument("--compute-type", default="int8")
+    parser.add_argument("--beam-size", type=int, default=5)
+    parser.add_argument("--repeat", type=int, default=2)
+    parser.add_argument("--json", dest="json_path", help="Write the results to this JSON file")
+    args = parser.parse_args()
+
+    audio_path = extract_audio(args.media)
+    audio = load_audio(audio_path)
+    duration = len(audio) / SAMPLE_RATE
+    print(f"Media: {args.media} ({duration:.1f}s of audio, {os.cpu_count()} CPUs)")
+
+    results = []
+    single_runs = [run_single(audio, args.model, args.compute_type, args.beam_size) for _ in range(args.repeat)]
+    single_seconds = min(seconds for seconds, _ in single_runs)
+    reference_text = single_runs[0][1]
+    results.append({"mode": "single", "workers": 1, "seconds": single_seconds, "speedup": 1.0, "similarity": 1.0})
+
+    for workers in args.workers:
+        runs = [
+            run_parallel(audio_path, workers, args.window, args.overlap, args.model, args.compute_type, args.beam_size)
+            for _ in range(args.repeat)
+        ]
+        seconds = min(seconds for seconds, _ in runs)
+        similarity = difflib.SequenceMatcher(None, reference_text, runs[0][1]).ratio()
+        results.append({
+            "mode": "parallel",
+            "workers": workers,
+            "seconds": seconds,
+            "speedup": single_seconds / seconds if seconds else 0.0,
+            "similarity": similarity,
+        })
+
+    print(f"{'mode':<10}{'workers':>8}{'seconds':>10}{'RTF':>8}{'speedup':>9}{'text sim':>10}")
+    for row in results:
+        print(
+            f"{row['mode']:<10}{row['workers']:>8}{row['seconds']:>10.2f}"
+            f"{row['seconds'] / duration:>8.3f}{row['speedup']:>8.2f}x{row['similarity']:>10.3f}"
+        )
+
+    if args.json_path:
+        with open(args.json_path, "w", encoding="utf-8") as file:
+            json.dump({"media": args.media, "duration": duration, "cpus": os.cpu_count(), "results": results}, file, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,170 @@
+"""
+Compares the standard pipeline (structuring, mastering, writing: three or four
+LLM calls) with the fast one (a single structured-output call): end-to-end
+latency, LLM calls, tokens, and how the generated manuals differ.
+
+Run from antigravidade/backend:
+
+    python -m benchmarks.pipeline_modes --runs 3
+    python -m benchmarks.pipeline_modes --live --text ../data/saida/txt/doc_transcript.txt
+
+Each run posts the same text to /pipeline/run in both modes, with the stage
+cache bypassed. Without `--live` the stages run against a simulated model whose
+latency grows with the tokens it reads and writes (`--first-token-ms`,
+`--prefill-tps`, `--decode-tps`) and which echoes its input, so the timing
+reflects the number of calls and how much context each re-sends; the manual
+comparison is only meaningful with `--live`, which calls Gemini
+(GOOGLE_API_KEY must be set). Tokens are counted as characters / 4, as
+/pipeline/estimate does.
+"""
+import argparse
+import asyncio
+import difflib
+import json
+import os
+import re
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from fastapi.testclient import TestClient
+from google.adk.models import BaseLlm, LlmResponse
+from google.genai import types
+
+from app import server
+from app.services.cost_estimator import CHARS_PER_TOKEN
+from app.services.disk_cache import DiskCache
+from app.services.stage_cache import StageOutputCache
+
+TRANSCRIPT = (
+    "Bom dia, hoje vamos ver a partida da bomba de recirculação da linha três. "
+    "Primeiro, confira se a válvula de entrada está fechada e se o painel mostra pressão zero. "
+    "Depois abra a válvula de entrada devagar, até o manômetro marcar dois bar. "
+    "Ligue a bomba pelo botão verde e espere o ruído estabilizar. "
+    "Se aparecer vibração, desligue e chame a manutenção.\n\n"
+) * 12
+PROMPTS = sorted(
+    [server.STRUCTURING_PROMPT, server.MASTERING_PROMPT, server.JSON_PROMPT, server.WRITER_PROMPT, server.FAST_PROMPT],
+    key=len,
+    reverse=True,
+)
+
+
+class SimulatedLlm(BaseLlm):
+    """Echoes the prompt's content, as JSON when a schema is asked for, after a size-dependent delay."""
+
+    model: str = "simulated"
+    first_token_s: float = 0.4
+    prefill_tps: float = 4000.0
+    decode_tps: float = 150.0
+
+    async def generate_content_async(self, llm_request, stream=False):
+        prompt = llm_request.contents[-1].parts[0].text
+        body = next((prompt[len(prefix):] for prefix in PROMPTS if prompt.startswith(prefix)), prompt)
+        if llm_request.config.response_schema is not None:
+            sentences = [sentence for sentence in re.split(r"(?<=[.!?])\s+", body.strip()) if sentence]
+            chapters = [
+                {"titulo": f"Capítulo {index // 5 + 1}", "conteudo": " ".join(sentences[index:index + 5])}
+                for index in range(0, len(sentences), 5)
+            ]
+            text = json.dumps({"titulo": "Manual", "introducao": sentences[0] if sentences else "", "capitulos": chapters}, ensure_ascii=False)
+        else:
+            text = body
+        delay = self.first_token_s + len(prompt) / CHARS_PER_TOKEN / self.prefill_tps + len(text) / CHARS_PER_TOKEN / self.decode_tps
+        await asyncio.sleep(delay)
+        yield LlmResponse(content=types.Content(role="model", parts=[types.Part(text=text)]))
+
+
+def run_once(client: TestClient, text: str, mode: str, calls: list) -> dict:
+    calls.clear()
+    started = time.perf_counter()
+    response = client.post("/pipeline/run", json={"doc_id": f"bench-{mode}", "text_content": text, "pipeline_mode": mode, "bypass_cache": True})
+    seconds = time.perf_counter() - started
+    complete = next((block for block in response.text.split("\n\n") if block.startswith("event: complete")), None)
+    if complete is None:
+        raise RuntimeError(f"{mode} pipeline failed: {response.text[-500:]}")
+    return {
+        "seconds": seconds,
+        "calls": [name for name, _, _ in calls],
+        "input_tokens": round(sum(input_chars for _, input_chars, _ in calls) / CHARS_PER_TOKEN),
+        "output_tokens": round(sum(output_chars for _, _, output_chars in calls) / CHARS_PER_TOKEN),
+        "manual": json.loads(complete.split("data: ", 1)[1])["manual_content"],
+    }
+
+
+def summary(results: list) -> dict:
+    last = results[-1]
+    return {
+        "seconds_median": round(statistics.median(result["seconds"] for result in results), 2),
+        "seconds_min": round(min(result["seconds"] for result in results), 2),
+        "llm_calls": last["calls"],
+        "input_tokens": last["input_tokens"],
+        "output_tokens": last["output_tokens"],
+        "manual_chars": len(last["manual"]),
+        "chapters": len(re.findall(r"^## ", last["manual"], flags=re.MULTILINE)),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=3)
+    parser.add_argument("--text", help="transcript file to use instead of the built-in sample")
+    parser.add_argument("--live", action="store_true", help="call Gemini instead of the simulated model")
+    parser.add_argument("--first-token-ms", type=float, default=400)
+    parser.add_argument("--prefill-tps", type=float, default=4000)
+    parser.add_argument("--decode-tps", type=float, default=150)
+    args = parser.parse_args()
+
+    text = TRANSCRIPT
+    if args.text:
+        with open(args.text, encoding="utf-8") as file:
+            text = file.read()
+    model = None if args.live else SimulatedLlm(
+        first_token_s=args.first_token_ms / 1000, prefill_tps=args.prefill_tps, decode_tps=args.decode_tps,
+    )
+
+    calls = []
+    stage = server._run_adhoc_agent_stream
+
+    async def measured_stage(name, instruction, content, stage_model):
+        output = ""
+        async for event in stage(name, instruction, content, model or stage_model):
+            if event["type"] == "result":
+                output = event["text"]
+            yield event
+        calls.append((name, len(instruction) + len(content), len(output)))
+
+    # Outputs, throughput and DOCX files stay out of the server's data directory;
+    # simulated outputs must never be served from the stage cache.
+    scratch = tempfile.mkdtemp(prefix="aido-bench-")
+    server._run_adhoc_agent_stream = measured_stage
+    server.throughput_history.record_llm = lambda *call_args: None
+    server.stage_output_cache = StageOutputCache(DiskCache(os.path.join(scratch, "llm"), max_bytes=64 * 1024 * 1024))
+    server.MANUALS_DIR = scratch
+    client = TestClient(server.app)
+
+    results = {"standard": [], "fast": []}
+    for run in range(1, args.runs + 1):
+        for mode in results:
+            results[mode].append(run_once(client, text, mode, calls))
+            print(f"run {run} {mode:>8}: {results[mode][-1]['seconds']:.2f}s", file=sys.stderr)
+
+    standard, fast = summary(results["standard"]), summary(results["fast"])
+    manuals = results["standard"][-1]["manual"], results["fast"][-1]["manual"]
+    print(json.dumps({
+        "model": "gemini-2.5-flash" if args.live else "simulated",
+        "input_chars": len(text),
+        "runs": args.runs,
+        "standard": standard,
+        "fast": fast,
+        "speedup": round(standard["seconds_median"] / max(fast["seconds_median"], 1e-9), 2),
+        "input_token_ratio": round(fast["input_tokens"] / max(standard["input_tokens"], 1), 3),
+        "manual_similarity": round(difflib.SequenceMatcher(None, *manuals).ratio(), 3),
+    }, indent=2, ensure_ascii=False))
+
+
+if __name__ == "__main__":
+    main()
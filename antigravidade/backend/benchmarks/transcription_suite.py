@@ -0,0 +1,329 @@
+"""
+Transcription throughput across model size x compute type x beam size x threads.
+
+Run from antigravidade/backend:
+
+    python -m benchmarks.transcription_suite run --models tiny small --compute-types int8 float32 \\
+        --beam-sizes 1 5 --threads 4 8 --json report.json --csv report.csv
+    python -m benchmarks.transcription_suite compare baseline.json report.json --tolerance 0.10
+
+Without `--media`, a synthetic tone fixture of each `--generate` duration is
+written to benchmarks/.fixtures. It measures decoder throughput, but only real
+speech (pass recordings with `--media`) gives representative numbers.
+
+Each configuration runs in a fresh process, so the model load is cold and the
+peak RSS belongs to that configuration alone. Two targets are measured:
+`service` (TranscriptionService) and `tool` (the decode path behind
+transcribe_video, without the transcript cache). Every run records:
+
+- rtf: decode seconds per second of audio (best of `--repeat`)
+- load_seconds: model load time
+- first_segment_seconds: time from the call to the first streamed segment (tool only)
+- peak_rss_mb: peak resident memory of the process
+
+`compare` matches rows by configuration and exits with status 1 when any
+metric grew by more than the tolerance.
+"""
+import argparse
+import csv
+import datetime
+import importlib
+import itertools
+import json
+import multiprocessing
+import os
+import platform
+import sys
+import time
+import wave
+from concurrent.futures import ProcessPoolExecutor
+from typing import List, Optional
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+import numpy as np
+
+FIXTURES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), ".fixtures")
+CONFIG_FIELDS = ("fixture", "target", "model", "compute_type", "beam_size", "threads")
+# Lower is better for every compared metric.
+METRICS = ("rtf", "load_seconds", "first_segment_seconds", "peak_rss_mb")
+
+
+def generate_fixture(seconds: float, sample_rate: int = 16000) -> str:
+    """Writes a mono WAV of voiced-like harmonic bursts separated by short pauses."""
+    os.makedirs(FIXTURES_DIR, exist_ok=True)
+    path = os.path.join(FIXTURES_DIR, f"synthetic_{int(seconds)}s.wav")
+    if os.path.exists(path):
+        return path
+
+    rng = np.random.default_rng(0)
+    t = np.arange(int(seconds * sample_rate)) / sample_rate
+    pitch = 140 + 30 * np.sin(2 * np.pi * 0.3 * t)
+    phase = 2 * np.pi * np.cumsum(pitch) / sample_rate
+    voiced = sum(np.sin(k * phase) / k for k in range(1, 6))
+    # Syllable-rate envelope with a pause every few seconds.
+    envelope = np.clip(np.sin(2 * np.pi * 4 * t), 0, None) * (np.sin(2 * np.pi * 0.2 * t) > -0.6)
+    audio = 0.3 * voiced * envelope + 0.01 * rng.standard_normal(len(t))
+    pcm = (np.clip(audio, -1, 1) * 32767).astype(np.int16)
+
+    with wave.open(path, "wb") as file:
+        file.setnchannels(1)
+        file.setsampwidth(2)
+        file.setframerate(sample_rate)
+        file.writeframes(pcm.tobytes())
+    return path
+
+
+def peak_rss_mb() -> Optional[float]:
+    try:
+        import resource
+    except ImportError:
+        return _peak_rss_mb_windows()
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Kilobytes on Linux, bytes on macOS.
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+def _peak_rss_mb_windows() -> Optional[float]:
+    import ctypes
+    from ctypes import wintypes
+
+    class PROCESS_MEMORY_COUNTERS(ctypes.Structure):
+        _fields_ = [
+            ("cb", wintypes.DWORD),
+            ("PageFaultCount", wintypes.DWORD),
+            ("PeakWorkingSetSize", ctypes.c_size_t),
+            ("WorkingSetSize", ctypes.c_size_t),
+            ("QuotaPeakPagedPoolUsage", ctypes.c_size_t),
+            ("QuotaPagedPoolUsage", ctypes.c_size_t),
+            ("QuotaPeakNonPagedPoolUsage", ctypes.c_size_t),
+            ("QuotaNonPagedPoolUsage", ctypes.c_size_t),
+            ("PagefileUsage", ctypes.c_size_t),
+            ("PeakPagefileUsage", ctypes.c_size_t),
+        ]
+
+    counters = PROCESS_MEMORY_COUNTERS()
+    counters.cb = ctypes.sizeof(counters)
+    handle = ctypes.windll.kernel32.GetCurrentProcess()
+    if not ctypes.windll.psapi.GetProcessMemoryInfo(handle, ctypes.byref(counters), counters.cb):
+        return None
+    return counters.PeakWorkingSetSize / (1024 * 1024)
+
+
+def measure(config: dict, media_path: str, repeat: int) -> dict:
+    """Runs one configuration. Executed in a fresh worker process."""
+    from app.services.audio_extraction import SAMPLE_RATE, extract_audio, load_audio
+    from app.services.transcription import TranscriptionService
+    from app.services.transcription_profiles import TranscriptionProfile
+    from app.services.whisper_pool import whisper_pool
+
+    tool = importlib.import_module("app.create.subagents.transcription.tools.transcribe_video")
+
+    # Profiles take device and compute type from settings; this process runs one configuration only.
+    tool.settings.WHISPER_DEVICE = "cpu"
+    tool.settings.WHISPER_COMPUTE = config["compute_type"]
+    duration = len(load_audio(extract_audio(media_path))) / SAMPLE_RATE
+    profile = TranscriptionProfile(
+        name="benchmark",
+        model_size=config["model"],
+        beam_size=config["beam_size"],
+        best_of=config["beam_size"],
+        cpu_threads=config["threads"],
+        num_workers=1,
+        vad_filter=False,
+        realtime_factor=0.0,
+    )
+    started = time.perf_counter()
+    whisper_pool.warm_up(*profile.model_key)
+    load_seconds = time.perf_counter() - started
+
+    runs, first_segments = [], []
+    for _ in range(repeat):
+        if config["target"] == "service":
+            service = TranscriptionService(
+                config["model"], "cpu", config["compute_type"],
+                cpu_threads=config["threads"], beam_size=config["beam_size"],
+            )
+            started = time.perf_counter()
+            service.transcribe(media_path)
+            runs.append(time.perf_counter() - started)
+        else:
+            first = []
+            started = time.perf_counter()
+
+            def on_segment(segment, started=started, first=first):
+                if not first:
+                    first.append(time.perf_counter() - started)
+
+            tool._run_transcription_sync(media_path, profile, on_segment)
+            runs.append(time.perf_counter() - started)
+            if first:
+                first_segments.append(first[0])
+
+    best = min(runs)
+    peak = peak_rss_mb()
+    return {
+        **config,
+        "audio_seconds": round(duration, 2),
+        "decode_seconds": round(best, 3),
+        "rtf": round(best / duration, 4) if duration else None,
+        "load_seconds": round(load_seconds, 3),
+        "first_segment_seconds": round(min(first_segments), 3) if first_segments else None,
+        "peak_rss_mb": round(peak, 1) if peak is not None else None,
+    }
+
+
+def run_suite(args) -> dict:
+    from app.services.audio_extraction import extract_audio
+
+    media = list(args.media or []) or [generate_fixture(seconds) for seconds in args.generate]
+    for path in media:
+        # Extract once up front so no configuration pays for the container decode.
+        extract_audio(path)
+
+    configs = [
+        dict(zip(CONFIG_FIELDS, (os.path.basename(path), target, model, compute_type, beam_size, threads)))
+        for path, target, model, compute_type, beam_size, threads in itertools.product(
+            media, args.targets, args.models, args.compute_types, args.beam_sizes, args.threads
+        )
+    ]
+    paths = {os.path.basename(path): path for path in media}
+
+    results = []
+    context = multiprocessing.get_context("spawn")
+    for config in configs:
+        # One process per configuration: cold model load and an unshared RSS peak.
+        with ProcessPoolExecutor(max_workers=1, mp_context=context) as executor:
+            row = executor.submit(measure, config, paths[config["fixture"]], args.repeat).result()
+        results.append(row)
+        print(format_row(row))
+
+    return {
+        "created_at": datetime.datetime.now().isoformat(timespec="seconds"),
+        "host": {
+            "platform": platform.platform(),
+            "python": platform.python_version(),
+            "cpus": os.cpu_count(),
+            "faster_whisper": _version("faster_whisper"),
+            "ctranslate2": _version("ctranslate2"),
+        },
+        "results": results,
+    }
+
+
+def _version(module: str) -> Optional[str]:
+    try:
+        return importlib.import_module(module).__version__
+    except Exception:
+        return None
+
+
+def format_row(row: dict) -> str:
+    def number(value, width, digits):
+        return f"{value:>{width}.{digits}f}" if value is not None else f"{'-':>{width}}"
+
+    return (
+        f"{row['fixture']:<22}{row['target']:<9}{row['model']:<10}{row['compute_type']:<9}"
+        f"{row['beam_size']:>5}{row['threads']:>8}"
+        f"{number(row['rtf'], 9, 4)}{number(row['load_seconds'], 9, 2)}"
+        f"{number(row['first_segment_seconds'], 10, 2)}{number(row['peak_rss_mb'], 10, 1)}"
+    )
+
+
+HEADER = (
+    f"{'fixture':<22}{'target':<9}{'model':<10}{'compute':<9}{'beam':>5}{'threads':>8}"
+    f"{'RTF':>9}{'load s':>9}{'first s':>10}{'RSS MB':>10}"
+)
+
+
+def write_csv(report: dict, path: str) -> None:
+    fields = [*CONFIG_FIELDS, "audio_seconds", "decode_seconds", *METRICS]
+    with open(path, "w", encoding="utf-8", newline="") as file:
+        writer = csv.DictWriter(file, fieldnames=fields, extrasaction="ignore")
+        writer.writeheader()
+        writer.writerows(report["results"])
+
+
+def compare_reports(baseline: dict, current: dict, tolerance: float) -> List[dict]:
+    """Returns one entry per metric that grew by more than `tolerance` (a fraction)."""
+    def key(row):
+        return tuple(row[field] for field in CONFIG_FIELDS)
+
+    previous = {key(row): row for row in baseline["results"]}
+    regressions = []
+    for row in current["results"]:
+        old = previous.get(key(row))
+        if old is None:
+            continue
+        for metric in METRICS:
+            before, after = old.get(metric), row.get(metric)
+            if not before or after is None:
+                continue
+            change = (after - before) / before
+            if change > tolerance:
+                regressions.append({
+                    **{field: row[field] for field in CONFIG_FIELDS},
+                    "metric": metric,
+                    "baseline": before,
+                    "current": after,
+                    "change": round(change, 4),
+                })
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    run = commands.add_parser("run", help="Measure every configuration")
+    run.add_argument("--media", nargs="+", help="Audio or video fixtures (default: generated)")
+    run.add_argument("--generate", type=float, nargs="+", default=[60.0], help="Synthetic fixture durations in seconds")
+    run.add_argument("--targets", nargs="+", choices=["service", "tool"], default=["service", "tool"])
+    run.add_argument("--models", nargs="+", default=["tiny"])
+    run.add_argument("--compute-types", nargs="+", default=["int8"])
+    run.add_argument("--beam-sizes", type=int, nargs="+", default=[1, 5])
+    run.add_argument("--threads", type=int, nargs="+", default=[os.cpu_count() or 1])
+    run.add_argument("--repeat", type=int, default=2)
+    run.add_argument("--json", dest="json_path", help="Write the report to this JSON file")
+    run.add_argument("--csv", dest="csv_path", help="Write the results to this CSV file")
+    run.add_argument("--baseline", help="Compare against this earlier JSON report when done")
+    run.add_argument("--tolerance", type=float, default=0.10)
+
+    compare = commands.add_parser("compare", help="Flag regressions between two JSON reports")
+    compare.add_argument("baseline")
+    compare.add_argument("current")
+    compare.add_argument("--tolerance", type=float, default=0.10, help="Allowed growth per metric (0.10 = 10%%)")
+
+    args = parser.parse_args()
+
+    if args.command == "run":
+        print(HEADER)
+        report = run_suite(args)
+        if args.json_path:
+            with open(args.json_path, "w", encoding="utf-8") as file:
+                json.dump(report, file, indent=2)
+        if args.csv_path:
+            write_csv(report, args.csv_path)
+        if not args.baseline:
+            return
+        with open(args.baseline, encoding="utf-8") as file:
+            baseline = json.load(file)
+    else:
+        with open(args.baseline, encoding="utf-8") as file:
+            baseline = json.load(file)
+        with open(args.current, encoding="utf-8") as file:
+            report = json.load(file)
+
+    regressions = compare_reports(baseline, report, args.tolerance)
+    if not regressions:
+        print(f"No regressions beyond {args.tolerance:.0%}.")
+        return
+    print(f"{len(regressions)} regression(s) beyond {args.tolerance:.0%}:")
+    for item in regressions:
+        config = " ".join(f"{field}={item[field]}" for field in CONFIG_FIELDS)
+        print(f"  {config}: {item['metric']} {item['baseline']} -> {item['current']} (+{item['change']:.0%})")
+    sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -6,6 +6,14 @@ from unittest.mock import MagicMock
 # Add backend to path
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
 
+@pytest.fixture(autouse=True)
+def transcript_links(tmp_path, monkeypatch):
+    """Media and document links written by a test go to a scratch index."""
+    from app.services import transcript_cache
+    links = transcript_cache.TranscriptLinks(tmp_path / "links.sqlite3")
+    monkeypatch.setattr(transcript_cache, "transcript_links", links)
+    return links
+
 @pytest.fixture
 def mock_env(monkeypatch):
     monkeypatch.setenv("POSTGRES_USER", "test_user")
@@ -22,3 +30,50 @@ def mock_env(monkeypatch):
 def mock_db_session():
     session = MagicMock()
     return session
+
+
+class FakeLlm:
+    """
+    Stands in for the model call behind every pipeline stage. Each call is
+    recorded in `calls` as (stage, content) and answered by `reply`, an async
+    generator of stage events taking the same two arguments.
+    """
+
+    def __init__(self):
+        self.calls = []
+        self.reply = self.ready
+
+    @property
+    def stages(self):
+        return [name for name, _ in self.calls]
+
+    @staticmethod
+    async def ready(name, content):
+        yield {"type": "result", "text": f"{name}: pronto"}
+
+    async def __call__(self, name, instruction, content, model):
+        self.calls.append((name, content))
+        async for event in self.reply(name, content):
+            yield event
+
+
+@pytest.fixture
+def llm_sandbox(tmp_path, monkeypatch):
+    """Keeps pipeline stages away from the real stage cache, throughput history and manuals folder."""
+    from app import server
+    from app.services.cost_estimator import ThroughputHistory
+    from app.services.disk_cache import DiskCache
+    from app.services.stage_cache import StageOutputCache
+
+    monkeypatch.setattr(server, "stage_output_cache", StageOutputCache(DiskCache(tmp_path / "llm", max_bytes=1024 * 1024)))
+    monkeypatch.setattr(server, "throughput_history", ThroughputHistory(tmp_path / "throughput.json"))
+    monkeypatch.setattr(server, "MANUALS_DIR", str(tmp_path))
+
+
+@pytest.fixture
+def fake_llm(llm_sandbox, monkeypatch):
+    from app import server
+
+    llm = FakeLlm()
+    monkeypatch.setattr(server, "_run_adhoc_agent_stream", llm)
+    return llm
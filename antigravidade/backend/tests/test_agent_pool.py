@@ -0,0 +1,81 @@
+import asyncio
+
+import pytest
+from google.adk.models import BaseLlm, LlmResponse
+from google.genai import types
+
+from app import server
+from app.services.agent_pool import AgentPool
+from app.services.cost_estimator import ThroughputHistory
+
+
+class EchoLlm(BaseLlm):
+    model: str = "echo"
+    delay: float = 0.0
+    fail: bool = False
+
+    async def generate_content_async(self, llm_request, stream=False):
+        await asyncio.sleep(self.delay)
+        if self.fail:
+            raise RuntimeError("quota exceeded")
+        text = llm_request.contents[-1].parts[0].text
+        yield LlmResponse(content=types.Content(role="model", parts=[types.Part(text=text.upper())]))
+
+
+@pytest.fixture
+def pool(tmp_path, monkeypatch):
+    pool = AgentPool(max_runners=4)
+    monkeypatch.setattr(server, "agent_pool", pool)
+    monkeypatch.setattr(server, "throughput_history", ThroughputHistory(tmp_path / "throughput.json"))
+    return pool
+
+
+def test_stage_runners_are_built_once_and_sessions_deleted(pool):
+    llm = EchoLlm()
+
+    async def run_stages():
+        return [await server._run_adhoc_agent("StructuringAgent", "Estruture.", f"texto {i}", llm) for i in range(3)]
+
+    assert asyncio.run(run_stages()) == ["TEXTO 0", "TEXTO 1", "TEXTO 2"]
+    stats = pool.stats()
+    assert stats["runners"] == 1 and stats["built"] == 1 and stats["reused"] == 2
+    assert stats["sessions_created"] == stats["sessions_deleted"] == 3
+    assert stats["live_sessions"] == 0 and stats["stored_sessions"] == 0
+    assert stats["session_text_bytes_max"] == len("texto 0") + len("TEXTO 0")
+
+
+def test_sessions_are_deleted_when_the_call_fails_or_is_cancelled(pool):
+    with pytest.raises(RuntimeError):
+        asyncio.run(server._run_adhoc_agent("MasteringAgent", "Revise.", "texto", EchoLlm(fail=True)))
+    assert pool.stats()["stored_sessions"] == 0
+
+    async def cancel_midway():
+        task = asyncio.create_task(server._run_adhoc_agent("WriterAgent", "Escreva.", "texto", EchoLlm(delay=5)))
+        await asyncio.sleep(0.1)
+        assert pool.stats()["live_sessions"] == 1
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+
+    asyncio.run(cancel_midway())
+    stats = pool.stats()
+    assert stats["live_sessions"] == 0 and stats["stored_sessions"] == 0
+
+
+def test_concurrent_calls_share_a_runner_with_separate_sessions(pool):
+    llm = EchoLlm(delay=0.05)
+
+    async def run_concurrently():
+        return await asyncio.gather(*(server._run_adhoc_agent("JsonAgent", "Converta.", f"doc {i}", llm) for i in range(8)))
+
+    assert asyncio.run(run_concurrently()) == [f"DOC {i}" for i in range(8)]
+    stats = pool.stats()
+    assert stats["built"] == 1 and stats["peak_live_sessions"] == 8 and stats["stored_sessions"] == 0
+
+
+def test_least_recently_used_runners_are_evicted(pool):
+    llm = EchoLlm()
+    runners = [pool.runner(f"Agent{i}", llm, "Instrução.") for i in range(5)]
+    assert pool.stats()["runners"] == 4
+    assert pool.runner("Agent4", llm, "Instrução.") is runners[4]
+    assert pool.runner("Agent0", llm, "Instrução.") is not runners[0]
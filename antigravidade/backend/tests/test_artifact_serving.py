@@ -0,0 +1,104 @@
+import hashlib
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app import server
+from app.services.artifact_serving import ArtifactServer, RangeNotSatisfiableError, choose_encoding, parse_range
+from app.services.disk_cache import DiskCache
+
+TRANSCRIPT = ("Passo 1: abrir a válvula de entrada e conferir a pressão.\n" * 200).encode("utf-8")
+VIDEO = bytes(range(256)) * 64
+
+
+@pytest.fixture
+def artifacts(tmp_path, monkeypatch):
+    (tmp_path / "saida" / "txt").mkdir(parents=True)
+    (tmp_path / "saida" / "txt" / "doc_transcript.txt").write_bytes(TRANSCRIPT)
+    objects = tmp_path / "entrada" / "objects" / "ab"
+    objects.mkdir(parents=True)
+    (objects / "video.mp4").write_bytes(VIDEO)
+    (objects / ".audio").mkdir()
+    (objects / ".audio" / "video.f32").write_bytes(VIDEO)
+    (tmp_path / "saida" / "cache").mkdir()
+    (tmp_path / "saida" / "cache" / "index.sqlite3").write_bytes(b"private")
+
+    variants = DiskCache(tmp_path / "saida" / "cache" / "compressed", max_bytes=1024 * 1024, name="artifact_variants")
+    artifact_server = ArtifactServer(
+        tmp_path,
+        variants,
+        immutable_dirs=[tmp_path / "entrada" / "objects"],
+        private_dirs=[tmp_path / "saida" / "cache"],
+    )
+    monkeypatch.setattr(server, "artifact_server", artifact_server)
+    return artifact_server
+
+
+@pytest.fixture
+def client(artifacts):
+    return TestClient(server.app)
+
+
+def test_parse_range():
+    assert parse_range(None, 100) is None
+    assert parse_range("bytes=0-9", 100) == (0, 9)
+    assert parse_range("bytes=90-", 100) == (90, 99)
+    assert parse_range("bytes=-10", 100) == (90, 99)
+    assert parse_range("bytes=50-500", 100) == (50, 99)
+    assert parse_range("bytes=0-1,5-6", 100) is None
+    assert parse_range("items=0-1", 100) is None
+    with pytest.raises(RangeNotSatisfiableError):
+        parse_range("bytes=100-", 100)
+
+
+def test_choose_encoding_respects_quality():
+    assert choose_encoding("gzip, deflate") == "gzip"
+    assert choose_encoding("gzip;q=0, identity") is None
+    assert choose_encoding(None) is None
+
+
+def test_revalidation_uses_the_content_hash(client):
+    response = client.get("/data/saida/txt/doc_transcript.txt", headers={"Accept-Encoding": "identity"})
+    assert response.status_code == 200 and response.content == TRANSCRIPT
+    assert response.headers["etag"] == f'"{hashlib.sha256(TRANSCRIPT).hexdigest()}"'
+    assert response.headers["cache-control"] == "no-cache"
+
+    again = client.get("/data/saida/txt/doc_transcript.txt", headers={"Accept-Encoding": "identity", "If-None-Match": response.headers["etag"]})
+    assert again.status_code == 304 and again.content == b""
+
+
+def test_text_artifacts_are_sent_precompressed(client, artifacts):
+    artifacts.precompress(artifacts.root + "/saida/txt/doc_transcript.txt")
+    assert artifacts.variants.stats()["entries"] >= 1
+
+    response = client.get("/data/saida/txt/doc_transcript.txt", headers={"Accept-Encoding": "gzip"})
+    assert response.status_code == 200
+    assert response.headers["content-encoding"] == "gzip"
+    assert response.headers["vary"] == "Accept-Encoding"
+    assert int(response.headers["content-length"]) < len(TRANSCRIPT)
+    assert response.content == TRANSCRIPT
+    assert artifacts.stats()["bytes_saved"] > 0
+
+
+def test_media_supports_ranges_and_is_immutable_in_the_store(client):
+    url = "/data/entrada/objects/ab/video.mp4"
+    response = client.get(url, headers={"Range": "bytes=100-199"})
+    assert response.status_code == 206
+    assert response.content == VIDEO[100:200]
+    assert response.headers["content-range"] == f"bytes 100-199/{len(VIDEO)}"
+    assert response.headers["cache-control"] == "public, max-age=31536000, immutable"
+
+    head = client.head(url)
+    assert head.status_code == 200 and head.headers["content-length"] == str(len(VIDEO))
+    assert head.headers["accept-ranges"] == "bytes"
+
+    unsatisfiable = client.get(url, headers={"Range": f"bytes={len(VIDEO)}-"})
+    assert unsatisfiable.status_code == 416
+    assert unsatisfiable.headers["content-range"] == f"bytes */{len(VIDEO)}"
+
+
+def test_caches_and_paths_outside_the_data_directory_are_not_served(client):
+    assert client.get("/data/saida/cache/index.sqlite3").status_code == 404
+    assert client.get("/data/saida/txt/missing.txt").status_code == 404
+    assert client.get("/data/entrada/objects/ab/.audio/video.f32").status_code == 404
+    assert client.get("/data/..%2F..%2Fetc%2Fpasswd").status_code == 404
@@ -0,0 +1,57 @@
+import os
+import numpy as np
+import pytest
+from unittest.mock import patch
+from app.services import audio_extraction
+from app.services.audio_extraction import SAMPLE_RATE, extract_audio, load_audio
+
+@pytest.fixture
+def upload(tmp_path):
+    media = tmp_path / "entrada" / "treinamento.mp4"
+    media.parent.mkdir()
+    media.write_bytes(b"container bytes")
+    return media
+
+@pytest.fixture
+def no_ffmpeg():
+    waveform = np.linspace(-1, 1, 2 * SAMPLE_RATE, dtype=np.float32)
+    with patch.object(audio_extraction.shutil, "which", return_value=None), \
+         patch.object(audio_extraction, "decode_audio", return_value=waveform) as decode:
+        yield decode, waveform
+
+def test_extracts_once_and_reuses_artifact(upload, no_ffmpeg):
+    decode, waveform = no_ffmpeg
+
+    first = extract_audio(str(upload))
+    second = extract_audio(str(upload))
+
+    assert first == second
+    assert os.path.dirname(first) == str(upload.parent / ".audio")
+    decode.assert_called_once()
+    np.testing.assert_array_equal(load_audio(first), waveform)
+
+def test_artifact_is_content_addressed(upload, no_ffmpeg):
+    copy = upload.parent / "copia.mp4"
+    copy.write_bytes(upload.read_bytes())
+
+    assert extract_audio(str(copy)) == extract_audio(str(upload))
+
+def test_load_audio_is_memory_mapped(upload, no_ffmpeg):
+    audio = load_audio(extract_audio(str(upload)))
+
+    assert isinstance(audio, np.memmap)
+    assert audio.dtype == np.float32
+
+def test_ffmpeg_command_requests_16khz_mono_pcm(upload):
+    def fake_run(command, **kwargs):
+        np.zeros(SAMPLE_RATE, dtype=np.float32).tofile(command[-1])
+
+    with patch.object(audio_extraction.shutil, "which", return_value="/usr/bin/ffmpeg"), \
+         patch.object(audio_extraction.subprocess, "run", side_effect=fake_run) as run:
+        artifact = extract_audio(str(upload))
+
+    command = run.call_args.args[0]
+    assert command[command.index("-ar") + 1] == "16000"
+    assert command[command.index("-ac") + 1] == "1"
+    assert command[command.index("-f") + 1] == "f32le"
+    assert len(load_audio(artifact)) == SAMPLE_RATE
@@ -0,0 +1,159 @@
+import asyncio
+import base64
+import hashlib
+import os
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app import server
+from app.services.chunked_upload import ChunkedUploads, UploadError, UploadOffsetError
+from app.services.upload_store import UploadStore
+
+VIDEO = os.urandom(300_000)
+
+
+def checksum(data: bytes) -> str:
+    return "sha256 " + base64.b64encode(hashlib.sha256(data).digest()).decode()
+
+
+@pytest.fixture
+def client(tmp_path, monkeypatch):
+    uploads = ChunkedUploads(tmp_path / "partial", chunk_size=100_000, ttl_seconds=3600)
+    monkeypatch.setattr(server, "chunked_uploads", uploads)
+    monkeypatch.setattr(server, "upload_store", UploadStore(tmp_path / "entrada"))
+    return TestClient(server.app)
+
+
+def create(client, **overrides):
+    body = {"filename": "linha.mp4", "size": len(VIDEO), "sha256": hashlib.sha256(VIDEO).hexdigest(), **overrides}
+    response = client.post("/upload/sessions", json=body)
+    assert response.status_code == 201
+    return response.json()["upload_id"]
+
+
+def append(client, upload_id, offset, data, digest=None):
+    return client.patch(
+        f"/upload/sessions/{upload_id}",
+        content=data,
+        headers={"Upload-Offset": str(offset), "Upload-Checksum": digest or checksum(data)},
+    )
+
+
+def test_chunked_upload_resumes_after_a_dropped_chunk(client, tmp_path):
+    upload_id = create(client)
+
+    assert append(client, upload_id, 0, VIDEO[:100_000]).json()["offset"] == 100_000
+    # The connection dropped after the server had committed the second chunk; the client resends it.
+    assert append(client, upload_id, 100_000, VIDEO[100_000:200_000]).status_code == 200
+    resent = append(client, upload_id, 100_000, VIDEO[100_000:200_000])
+    assert resent.status_code == 409
+    assert resent.headers["upload-offset"] == "200000"
+
+    # The client asks where to resume from, then sends the rest.
+    head = client.head(f"/upload/sessions/{upload_id}")
+    offset = int(head.headers["upload-offset"])
+    assert append(client, upload_id, offset, VIDEO[offset:]).json()["offset"] == len(VIDEO)
+
+    finalized = client.post(f"/upload/sessions/{upload_id}/finalize").json()
+    assert finalized["sha256"] == finalized["file_token"] == hashlib.sha256(VIDEO).hexdigest()
+    assert finalized["throughput_mbps"] > 0
+    with open(server.upload_store.path_for(finalized["file_token"]), "rb") as file:
+        assert file.read() == VIDEO
+    assert client.get(f"/upload/sessions/{upload_id}").status_code == 404
+
+
+def test_corrupted_chunk_is_rejected_and_cut_off(client):
+    upload_id = create(client)
+
+    bad = append(client, upload_id, 0, VIDEO[:100_000], digest=checksum(b"other"))
+
+    assert bad.status_code == 460
+    assert client.get(f"/upload/sessions/{upload_id}").json()["offset"] == 0
+    assert os.path.getsize(server.chunked_uploads.part_path(upload_id)) == 0
+    assert append(client, upload_id, 0, VIDEO[:100_000]).status_code == 200
+
+
+def test_finalize_checks_completeness_and_whole_file_checksum(client):
+    upload_id = create(client, sha256=hashlib.sha256(b"another file").hexdigest())
+    append(client, upload_id, 0, VIDEO[:100_000])
+
+    assert client.post(f"/upload/sessions/{upload_id}/finalize").status_code == 409
+    append(client, upload_id, 100_000, VIDEO[100_000:])
+    assert client.post(f"/upload/sessions/{upload_id}/finalize").status_code == 460
+    assert client.get(f"/upload/sessions/{upload_id}").status_code == 404
+    assert server.chunked_uploads.stats()["checksum_failures"] == 1
+
+
+def test_chunk_past_declared_size_is_refused(client):
+    upload_id = create(client, size=10, sha256=None)
+
+    assert append(client, upload_id, 0, b"x" * 11).status_code == 400
+    assert client.get(f"/upload/sessions/{upload_id}").json()["offset"] == 0
+
+
+def test_sessions_survive_restart_and_expire(tmp_path):
+    uploads = ChunkedUploads(tmp_path, chunk_size=10, ttl_seconds=3600)
+    session = uploads.create("a.mp4", 4)
+
+    async def chunks():
+        yield b"ab"
+
+    asyncio.run(uploads.append(session.upload_id, 0, chunks()))
+
+    restarted = ChunkedUploads(tmp_path, chunk_size=10, ttl_seconds=0)
+    assert restarted.get(session.upload_id).offset == 2
+    assert restarted.discard_expired() == 1
+    with pytest.raises(UploadError):
+        restarted.get(session.upload_id)
+
+
+def test_chunks_handled_by_another_worker_are_hashed_into_the_file(tmp_path):
+    # Two workers share the session directory; each sees only some of the chunks.
+    first = ChunkedUploads(tmp_path / "partial", chunk_size=10, ttl_seconds=3600)
+    second = ChunkedUploads(tmp_path / "partial", chunk_size=10, ttl_seconds=3600)
+    store = UploadStore(tmp_path / "entrada")
+    session = first.create("a.mp4", 8)
+
+    async def chunk(data):
+        yield data
+
+    async def main():
+        await first.append(session.upload_id, 0, chunk(b"AAAA"))
+        await second.append(session.upload_id, 4, chunk(b"BBBB"))
+        return await first.finalize(session.upload_id, store)
+
+    path, sha256, _ = asyncio.run(main())
+    assert sha256 == hashlib.sha256(b"AAAABBBB").hexdigest()
+    with open(path, "rb") as file:
+        assert file.read() == b"AAAABBBB"
+
+
+def test_a_chunk_another_worker_is_still_writing_is_refused(tmp_path):
+    first = ChunkedUploads(tmp_path / "partial", chunk_size=10, ttl_seconds=3600)
+    second = ChunkedUploads(tmp_path / "partial", chunk_size=10, ttl_seconds=3600)
+    session = first.create("a.mp4", 8)
+
+    async def main():
+        release = asyncio.Event()
+
+        async def slow_chunk():
+            yield b"AA"
+            await release.wait()
+            yield b"AA"
+
+        async def chunk(data):
+            yield data
+
+        writing = asyncio.create_task(first.append(session.upload_id, 0, slow_chunk()))
+        await asyncio.sleep(0.1)
+        # The client retried the same chunk on another worker while the first is mid-write.
+        with pytest.raises(UploadOffsetError) as refused:
+            await second.append(session.upload_id, 0, chunk(b"BBBB"))
+        assert refused.value.offset == 0
+        release.set()
+        assert (await writing).offset == 4
+
+    asyncio.run(main())
+    with open(first.part_path(session.upload_id), "rb") as file:
+        assert file.read() == b"AAAA"
@@ -0,0 +1,69 @@
+import os
+import pytest
+from app.services.disk_cache import DiskCache
+from app.services.media_hash import file_sha256
+
+@pytest.fixture
+def cache(tmp_path):
+    return DiskCache(tmp_path / "cache", max_bytes=100, name="test")
+
+def test_put_and_get_roundtrip(cache):
+    cache.put_text("a" * 64, "olá mundo", {"model_size": "tiny"})
+
+    assert cache.get_text("a" * 64) == "olá mundo"
+    assert cache.get_meta("a" * 64) == {"model_size": "tiny"}
+    assert cache.get_text("b" * 64) is None
+
+    stats = cache.stats()
+    assert stats["hits"] == 1
+    assert stats["misses"] == 1
+    assert stats["entries"] == 1
+
+def test_corrupted_entry_is_dropped(cache):
+    key = "c" * 64
+    cache.put_text(key, "transcrição original")
+    with open(cache.path_for(key), "w", encoding="utf-8") as file:
+        file.write("editado")
+
+    assert cache.get_text(key) is None
+    assert cache.stats()["integrity_failures"] == 1
+    assert cache.stats()["entries"] == 0
+    assert not os.path.exists(cache.path_for(key))
+
+def test_least_recently_used_entries_are_evicted(cache):
+    cache.put("1" * 64, b"x" * 40)
+    cache.put("2" * 64, b"x" * 40)
+    # Touch the first entry so the second becomes the eviction candidate.
+    assert cache.get("1" * 64) is not None
+    cache.put("3" * 64, b"x" * 40)
+
+    assert cache.get("2" * 64) is None
+    assert cache.get("1" * 64) is not None
+    assert cache.get("3" * 64) is not None
+    assert cache.stats()["evictions"] == 1
+    assert cache.stats()["bytes"] <= 100
+
+def test_index_survives_reopen(tmp_path):
+    DiskCache(tmp_path / "cache", max_bytes=100).put_text("d" * 64, "persistido")
+    assert DiskCache(tmp_path / "cache", max_bytes=100).get_text("d" * 64) == "persistido"
+
+def test_file_hash_depends_on_content_only(tmp_path):
+    first = tmp_path / "treinamento.mp4"
+    second = tmp_path / "outro_nome.mp4"
+    first.write_bytes(b"same video")
+    second.write_bytes(b"same video")
+
+    assert file_sha256(str(first)) == file_sha256(str(second))
+
+    first.write_bytes(b"another video")
+    assert file_sha256(str(first)) != file_sha256(str(second))
+
+def test_entries_past_their_ttl_are_misses(tmp_path):
+    cache = DiskCache(tmp_path / "cache", max_bytes=100, name="test", ttl_seconds=60)
+    cache.put_text("d" * 64, "resposta")
+    assert cache.get_text("d" * 64) == "resposta"
+
+    cache._db.execute("UPDATE entries SET created_at = created_at - 61")
+    assert cache.get_text("d" * 64) is None
+    assert cache.stats()["expirations"] == 1
+    assert cache.stats()["entries"] == 0
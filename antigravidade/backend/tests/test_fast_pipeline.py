@@ -0,0 +1,106 @@
+import asyncio
+import json
+import os
+
+import pytest
+from fastapi.testclient import TestClient
+from google.adk.models import BaseLlm, LlmResponse
+from google.genai import types
+
+from app import server
+from app.services.agent_pool import AgentPool
+
+MANUAL = {
+    "titulo": "Manual da Bomba",
+    "introducao": "Procedimento de partida.",
+    "capitulos": [
+        {"titulo": "Preparação", "conteudo": "- Abra a **válvula** de entrada."},
+        {"titulo": "Partida", "conteudo": "Ligue a bomba e confira a pressão."},
+    ],
+}
+
+
+class ManualLlm(BaseLlm):
+    """Answers with the manual as JSON and records the output schema it was asked for."""
+
+    model: str = "manual-json"
+    schemas: list = []
+
+    async def generate_content_async(self, llm_request, stream=False):
+        self.schemas.append(llm_request.config.response_schema)
+        yield LlmResponse(content=types.Content(role="model", parts=[types.Part(text=json.dumps(MANUAL))]))
+
+
+@pytest.fixture
+def calls(fake_llm):
+    async def manual(name, content):
+        text = json.dumps(MANUAL)
+        yield {"type": "delta", "text": text[:10]}
+        yield {"type": "delta", "text": text[10:]}
+        yield {"type": "result", "text": f"```json\n{text}\n```"}
+
+    fake_llm.reply = manual
+    return fake_llm.calls
+
+
+def complete_event(body: str) -> dict:
+    block = next(block for block in body.split("\n\n") if block.startswith("event: complete"))
+    return json.loads(block.split("data: ", 1)[1])
+
+
+def test_fast_mode_makes_one_call_and_renders_the_manual_from_its_json(calls, tmp_path):
+    response = TestClient(server.app).post(
+        "/pipeline/run",
+        json={"doc_id": "doc-fast", "text_content": "Abra a válvula. Ligue a bomba.", "instructions": "Seja breve.", "pipeline_mode": "fast"},
+    )
+
+    assert [name for name, _ in calls] == ["FastManualAgent"]
+    content = calls[0][1]
+    assert content.startswith(server.FAST_PROMPT) and content.endswith("Seja breve.")
+    complete = complete_event(response.text)
+    assert complete["manual_content"] == server._manual_markdown(MANUAL)
+    assert "## Preparação" in complete["manual_content"]
+    assert os.path.exists(tmp_path / "manual_doc-fast.docx")
+    stages = [
+        (block.split("\n", 1)[0], json.loads(block.split("data: ", 1)[1])["stage"])
+        for block in response.text.split("\n\n")
+        if block.startswith(("event: progress", "event: stage_delta"))
+    ]
+    # The one call is reported as structuring, from its first delta to its end;
+    # mastering is skipped and step 4 only renders its output.
+    assert stages[1:5] == [("event: progress", "STRUCTURING")] + [("event: stage_delta", "STRUCTURING")] * 2 + [("event: progress", "STRUCTURING")]
+    assert "MASTERING" not in {stage for _, stage in stages}
+
+
+def test_standard_mode_is_the_default(calls):
+    response = TestClient(server.app).post("/pipeline/run", json={"doc_id": "doc-standard", "text_content": "Passo 1."})
+    assert "event: complete" in response.text
+    assert [name for name, _ in calls] == ["StructuringAgent", "MasteringAgent", "WriterAgent"]
+
+
+def test_unknown_mode_is_rejected(calls):
+    client = TestClient(server.app)
+    assert client.post("/pipeline/run", json={"doc_id": "x", "text_content": "a", "pipeline_mode": "turbo"}).status_code == 422
+    assert calls == []
+
+
+def test_fast_stage_asks_the_model_for_the_manual_schema(llm_sandbox, monkeypatch):
+    monkeypatch.setattr(server, "agent_pool", AgentPool())
+    model = ManualLlm()
+
+    async def main():
+        fast = await server.run_adhoc_agent("FastManualAgent", server.FAST_INSTRUCTION, "texto", model)
+        await server.run_adhoc_agent("WriterAgent", server.WRITER_INSTRUCTION, "texto", model)
+        return fast
+
+    assert json.loads(asyncio.run(main())) == MANUAL
+    assert model.schemas == [server.ManualDocument, None]
+
+
+def test_estimate_for_fast_mode_counts_one_call(calls):
+    client = TestClient(server.app)
+    body = {"text_content": "passo " * 200, "pipeline_mode": "fast"}
+    fast = client.post("/pipeline/estimate", json=body).json()["llm"]
+    standard = client.post("/pipeline/estimate", json={**body, "pipeline_mode": "standard"}).json()["llm"]
+    assert [stage["stage"] for stage in fast["stages"]] == ["FastManualAgent"]
+    assert fast["input_tokens"] < standard["input_tokens"]
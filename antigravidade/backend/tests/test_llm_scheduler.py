@@ -0,0 +1,158 @@
+import asyncio
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app import server
+from app.services.llm_scheduler import LlmScheduler, UnknownPriorityError, is_rate_limit_error, retry_delay
+
+
+class QuotaError(Exception):
+    code = 429
+
+
+def scheduler(**overrides) -> LlmScheduler:
+    options = {"requests_per_minute": 6000, "tokens_per_minute": 600000, "max_retries": 2, "backoff_max_seconds": 0.2}
+    return LlmScheduler(**{**options, **overrides})
+
+
+def result_only(text):
+    async def call():
+        yield {"type": "result", "text": text}
+    return call
+
+
+def test_request_and_token_buckets_hold_calls_until_they_refill():
+    async def main():
+        limited = scheduler(requests_per_minute=600, tokens_per_minute=6000)
+        limited.requests.level = 0
+        by_requests = await limited.acquire("StructuringAgent", "ana", "interactive", 10)
+        limited.requests.level = limited.requests.capacity
+        limited.tokens.level = 0
+        by_tokens = await limited.acquire("StructuringAgent", "ana", "interactive", 20)
+        return by_requests, by_tokens
+
+    by_requests, by_tokens = asyncio.run(main())
+    # 600 requests/minute is one every 0.1 s; 6000 tokens/minute is 20 tokens in 0.2 s.
+    assert 0.08 <= by_requests < 0.5
+    assert 0.18 <= by_tokens < 0.6
+
+
+def test_interactive_calls_go_first_and_users_take_turns():
+    order = []
+
+    async def main():
+        queue = scheduler()
+        queue.requests.level = 0
+
+        async def call(user, priority):
+            await queue.acquire("StructuringAgent", user, priority, 1)
+            order.append((user, priority))
+
+        calls = [("ana", "batch")] * 2 + [("ana", "interactive")] * 3 + [("bia", "interactive")]
+        await asyncio.gather(*(call(user, priority) for user, priority in calls))
+        return queue.stats()
+
+    stats = asyncio.run(main())
+    assert order == [
+        ("ana", "interactive"), ("bia", "interactive"), ("ana", "interactive"), ("ana", "interactive"),
+        ("ana", "batch"), ("ana", "batch"),
+    ]
+    assert stats["queue_wait_seconds"]["batch"]["max"] >= stats["queue_wait_seconds"]["interactive"]["max"]
+
+
+def test_a_429_pauses_every_caller_and_the_call_is_retried():
+    attempts = []
+
+    def flaky():
+        async def call():
+            attempts.append(1)
+            if len(attempts) == 1:
+                raise QuotaError('429 RESOURCE_EXHAUSTED {"retryDelay": "0.1s"}')
+            yield {"type": "delta", "text": "Capítulo"}
+            yield {"type": "result", "text": "Capítulo 1"}
+        return call
+
+    async def main():
+        queue = scheduler()
+        events = [event async for event in queue.stream("StructuringAgent", "ana", "interactive", 5, flaky(), len)]
+        # Another user's call right after the 429 also waits out the pause.
+        queue.backoff(QuotaError('{"retryDelay": "0.15s"}'))
+        other = [event async for event in queue.stream("MasteringAgent", "bia", "interactive", 5, result_only("ok"), len)]
+        return queue, events, other
+
+    queue, events, other = asyncio.run(main())
+    assert [event["type"] for event in events] == ["delta", "result"]
+    assert events[-1]["queue_wait"] >= 0.09
+    assert other[-1]["queue_wait"] >= 0.1
+    stats = queue.stats()
+    assert stats["rate_limited"] == 2 and stats["retries"] == 1
+    assert stats["limits"]["rate_factor"] < 1
+    assert stats["recent_calls"][0]["attempts"] == 2
+
+
+def test_quota_errors_after_output_or_past_the_retries_are_raised():
+    def fails_midway():
+        async def call():
+            yield {"type": "delta", "text": "Cap"}
+            raise QuotaError("429")
+        return call
+
+    def always_limited():
+        async def call():
+            raise QuotaError("429")
+            yield
+        return call
+
+    async def consume(queue, call):
+        return [event async for event in queue.stream("WriterAgent", "ana", "batch", 5, call, len)]
+
+    queue = scheduler(backoff_max_seconds=0.01)
+    with pytest.raises(QuotaError):
+        asyncio.run(consume(queue, fails_midway()))
+    assert queue.retries == 0
+    with pytest.raises(QuotaError):
+        asyncio.run(consume(queue, always_limited()))
+    assert queue.retries == 2
+
+
+def test_token_reservations_are_corrected_to_what_the_call_used():
+    async def main():
+        queue = scheduler(tokens_per_minute=1000)
+        await queue.acquire("WriterAgent", "ana", "interactive", 300)
+        queue.settle(300, 100)
+        return queue.tokens.level
+
+    assert asyncio.run(main()) == pytest.approx(900, abs=1)
+
+
+def test_rate_limit_errors_and_retry_delays_are_recognized():
+    assert is_rate_limit_error(QuotaError())
+    assert is_rate_limit_error(RuntimeError("429 RESOURCE_EXHAUSTED. Quota exceeded"))
+    assert not is_rate_limit_error(RuntimeError("500 INTERNAL"))
+    assert retry_delay(RuntimeError("{'@type': 'type.googleapis.com/google.rpc.RetryInfo', 'retryDelay': '23s'}")) == 23
+    assert retry_delay(RuntimeError("429")) is None
+    with pytest.raises(UnknownPriorityError):
+        asyncio.run(scheduler().acquire("WriterAgent", "ana", "urgent", 1))
+
+
+@pytest.fixture
+def queue(fake_llm, monkeypatch):
+    queue = scheduler()
+    monkeypatch.setattr(server, "llm_scheduler", queue)
+    return queue
+
+
+def test_pipeline_calls_are_scheduled_per_user_and_priority(queue):
+    client = TestClient(server.app)
+    client.post("/pipeline/run", json={"doc_id": "doc-a", "text_content": "Passo 1.", "priority": "batch"})
+    client.post("/pipeline/run", json={"doc_id": "doc-b", "text_content": "Passo 1.", "user_id": "ana", "bypass_cache": True})
+
+    calls = queue.stats()["recent_calls"]
+    assert [(call["stage"], call["user"], call["priority"]) for call in calls] == [
+        ("StructuringAgent", "doc-a", "batch"), ("MasteringAgent", "doc-a", "batch"), ("WriterAgent", "doc-a", "batch"),
+        ("StructuringAgent", "ana", "interactive"), ("MasteringAgent", "ana", "interactive"), ("WriterAgent", "ana", "interactive"),
+    ]
+    assert all(call["queue_wait_seconds"] >= 0 for call in calls)
+    assert "llm_scheduler" in client.get("/system/metrics").json()
+    assert client.post("/pipeline/run", json={"doc_id": "x", "text_content": "a", "priority": "urgent"}).status_code == 422
@@ -0,0 +1,136 @@
+import asyncio
+import json
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app import server
+from app.core.config import settings
+from app.services.map_reduce import map_bounded, split_transcript
+
+SENTENCES = [f"Frase número {i} sobre a bomba {i % 7}." for i in range(200)]
+TEXT = "\n\n".join(" ".join(SENTENCES[start:start + 10]) for start in range(0, len(SENTENCES), 10))
+
+
+def test_chunks_fit_keep_every_sentence_whole_and_preserve_the_text():
+    chunks = split_transcript(TEXT, 1000)
+
+    assert len(chunks) > 1
+    assert all(len(chunk) <= 1000 for chunk in chunks)
+    rejoined = " ".join(chunks)
+    for sentence in SENTENCES:
+        assert sum(sentence in chunk for chunk in chunks) == 1
+    assert rejoined.split() == TEXT.split()
+
+
+def test_chunks_are_of_similar_size():
+    sizes = [len(chunk) for chunk in split_transcript(TEXT, 1000)]
+    assert min(sizes) > max(sizes) / 2
+
+
+def test_run_on_text_is_cut_between_words():
+    text = " ".join(["palavra"] * 500)
+    chunks = split_transcript(text, 300)
+    assert all(len(chunk) <= 300 for chunk in chunks)
+    assert " ".join(chunks).split() == text.split()
+
+
+def test_short_text_is_one_chunk():
+    assert split_transcript("  Passo 1: ligar a bomba.  ", 1000) == ["Passo 1: ligar a bomba."]
+    assert split_transcript("", 1000) == []
+
+
+def test_map_bounded_limits_concurrency_and_yields_as_workers_finish():
+    running = 0
+    peak = 0
+
+    async def worker(index, item):
+        nonlocal running, peak
+        running += 1
+        peak = max(peak, running)
+        await asyncio.sleep(0.01 * (5 - index))
+        running -= 1
+        return item * 2
+
+    async def main():
+        return [result async for result in map_bounded([1, 2, 3, 4, 5], worker, concurrency=2)]
+
+    results = asyncio.run(main())
+    assert peak == 2
+    assert sorted(results) == [(0, 2), (1, 4), (2, 6), (3, 8), (4, 10)]
+    assert [index for index, _ in results] != [0, 1, 2, 3, 4]
+
+
+def test_map_bounded_cancels_the_remaining_calls_on_failure():
+    started = []
+
+    async def worker(index, item):
+        started.append(index)
+        if index == 0:
+            raise RuntimeError("falhou")
+        await asyncio.sleep(1)
+
+    async def main():
+        async for _ in map_bounded(range(6), worker, concurrency=2):
+            pass
+
+    with pytest.raises(RuntimeError):
+        asyncio.run(main())
+    assert len(started) < 6
+
+
+@pytest.fixture
+def calls(fake_llm, monkeypatch):
+    async def outline(name, content):
+        if name == "StructuringMergeAgent":
+            for word in ("Capítulo ", "único"):
+                yield {"type": "delta", "text": word}
+            yield {"type": "result", "text": "Capítulo único"}
+            return
+        yield {"type": "result", "text": f"{name}: {content[-20:]}"}
+
+    fake_llm.reply = outline
+    monkeypatch.setattr(settings, "STRUCTURING_MAP_REDUCE_MIN_CHARS", 2000)
+    monkeypatch.setattr(settings, "STRUCTURING_CHUNK_CHARS", 1000)
+    monkeypatch.setattr(settings, "STRUCTURING_CONCURRENCY", 2)
+    return fake_llm.calls
+
+
+def test_pipeline_run_structures_long_text_in_chunks_and_merges_them(calls):
+    response = TestClient(server.app).post(
+        "/pipeline/run",
+        json={"doc_id": "doc-long", "text_content": TEXT, "instructions": "Use tom formal."},
+    )
+    body = response.text
+
+    chunk_calls = [content for name, content in calls if name == "StructuringChunkAgent"]
+    merge_calls = [content for name, content in calls if name == "StructuringMergeAgent"]
+    assert len(chunk_calls) == len(split_transcript(TEXT, 1000))
+    assert all(content.endswith("Use tom formal.") for content in chunk_calls)
+    assert len(merge_calls) == 1
+    # Chunk calls keep their own throughput history, apart from whole-transcript structuring.
+    assert "StructuringAgent" not in {name for name, _ in calls}
+    assert merge_calls[0].index("--- PARTE 1 ---") < merge_calls[0].index(f"--- PARTE {len(chunk_calls)} ---")
+
+    stage_deltas = [
+        json.loads(block.split("data: ", 1)[1])
+        for block in body.split("\n\n")
+        if block.startswith("event: stage_delta")
+    ]
+    assert "".join(event["text"] for event in stage_deltas if event["stage"] == "STRUCTURING") == "Capítulo único"
+    assert f"Parte {len(chunk_calls)} de {len(chunk_calls)} estruturada." in body
+    # Mastering works from the merged outline, as it does from a single structuring call.
+    assert any(name == "MasteringAgent" and "Capítulo único" in content for name, content in calls)
+    assert "event: complete" in body
+
+
+def test_short_text_keeps_the_single_structuring_call(calls):
+    response = TestClient(server.app).post("/pipeline/run", json={"doc_id": "doc-short", "text_content": "Passo 1."})
+    assert "event: complete" in response.text
+    assert [name for name, _ in calls] == ["StructuringAgent", "MasteringAgent", "WriterAgent"]
+
+
+def test_estimate_counts_the_chunk_and_merge_calls(calls):
+    stages = [name for name, _ in server._pipeline_llm_stages(False, len(TEXT))]
+    assert stages == ["StructuringChunkAgent", "StructuringMergeAgent", "MasteringAgent", "WriterAgent"]
+    assert [name for name, _ in server._pipeline_llm_stages(False)] == ["StructuringAgent", "MasteringAgent", "WriterAgent"]
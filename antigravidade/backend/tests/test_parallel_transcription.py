@@ -0,0 +1,109 @@
+import numpy as np
+import pytest
+from concurrent.futures import ThreadPoolExecutor
+from unittest.mock import MagicMock, patch
+from app.services import parallel_transcription as parallel
+from app.services.parallel_transcription import SAMPLE_RATE, plan_windows, stitch_segments
+
+def test_plan_windows_covers_duration_with_overlap():
+    windows = plan_windows(250.0, window_seconds=100.0, overlap_seconds=10.0)
+
+    assert windows == [(0.0, 100.0), (90.0, 190.0), (180.0, 250.0)]
+
+def test_short_media_is_a_single_window():
+    assert plan_windows(30.0, window_seconds=100.0, overlap_seconds=10.0) == [(0.0, 30.0)]
+
+def test_stitch_keeps_overlapping_segments_once():
+    windows = [(0.0, 100.0), (90.0, 190.0)]
+    duplicated = {"start": 92.0, "end": 96.0, "text": " dup"}
+    results = [
+        [{"start": 0.0, "end": 50.0, "text": " a"}, dict(duplicated)],
+        [dict(duplicated), {"start": 120.0, "end": 150.0, "text": " b"}],
+    ]
+
+    stitched = stitch_segments(windows, results)
+
+    assert [s["text"] for s in stitched] == [" a", " dup", " b"]
+
+class FakeModel:
+    """Emits one segment for every 2 seconds of the window it receives."""
+    def transcribe(self, audio, **kwargs):
+        seconds = len(audio) / SAMPLE_RATE
+        segments = []
+        for start in np.arange(0.0, seconds - 1.0, 2.0):
+            segment = MagicMock()
+            segment.start, segment.end = float(start), float(start + 2.0)
+            segment.text = ""
+            segments.append(segment)
+        return iter(segments), MagicMock(language="pt", language_probability=0.8)
+
+@pytest.fixture
+def thread_pool():
+    executor = ThreadPoolExecutor(max_workers=3)
+    with patch.object(parallel, "_get_executor", return_value=executor), \
+         patch.object(parallel, "_worker_model", FakeModel()):
+        yield
+    executor.shutdown()
+
+def test_transcribe_parallel_restores_timeline_in_order(thread_pool, tmp_path):
+    audio_path = tmp_path / "audio.f32"
+    np.zeros(int(60 * SAMPLE_RATE), dtype=np.float32).tofile(audio_path)
+    received = []
+
+    _, info = parallel.transcribe_parallel(
+        str(audio_path), workers=3, window_seconds=20.0, overlap_seconds=4.0,
+        model_size="tiny", device="cpu", compute_type="int8",
+        on_segment=received.append,
+    )
+
+    starts = [segment["start"] for segment in received]
+    assert starts == sorted(starts)
+    # Every 2-second slot of the original timeline is reported exactly once.
+    assert len(starts) == len(set(round(s, 3) for s in starts))
+    assert starts[0] == 0.0 and received[-1]["end"] >= 58.0
+    assert received[-1]["progress"] == pytest.approx(received[-1]["end"] / 60.0)
+    assert info.duration == 60.0
+    assert info.language == "pt"
+
+def test_transcribe_parallel_resumes_committed_windows(thread_pool, tmp_path):
+    from app.services.transcription_checkpoint import TranscriptionCheckpoint
+
+    audio_path = tmp_path / "audio.f32"
+    np.zeros(int(60 * SAMPLE_RATE), dtype=np.float32).tofile(audio_path)
+    checkpoint = TranscriptionCheckpoint(str(tmp_path / "job.jsonl"), {"mode": "parallel"})
+    kwargs = dict(workers=3, window_seconds=20.0, overlap_seconds=4.0, model_size="tiny", device="cpu", compute_type="int8")
+
+    first = []
+    parallel.transcribe_parallel(str(audio_path), on_segment=first.append, checkpoint=checkpoint, **kwargs)
+    committed = len(checkpoint.load())
+    assert committed == len(plan_windows(60.0, 20.0, 4.0))
+
+    resumed = []
+    with patch.object(parallel, "_get_executor", side_effect=AssertionError("decoded again")):
+        parallel.transcribe_parallel(str(audio_path), on_segment=resumed.append, checkpoint=checkpoint, **kwargs)
+
+    assert resumed == first
+
+def test_a_new_worker_configuration_lets_running_jobs_finish(monkeypatch):
+    class FakePool:
+        def __init__(self, **kwargs):
+            self.shutdowns = []
+
+        def shutdown(self, **kwargs):
+            self.shutdowns.append(kwargs)
+
+    monkeypatch.setattr(parallel, "ProcessPoolExecutor", FakePool)
+    monkeypatch.setattr(parallel, "_pools", {})
+    monkeypatch.setattr(parallel, "_current_config", None)
+
+    small = parallel._get_executor(2, "small", "cpu", "int8")
+    medium = parallel._get_executor(2, "medium", "cpu", "int8")
+    # The small-model job is still running, so its pool and queued windows stay.
+    assert medium is not small and small.shutdowns == []
+    assert parallel._get_executor(2, "medium", "cpu", "int8") is medium
+
+    parallel._release_executor(small)
+    assert small.shutdowns == [{"wait": False}]
+    parallel._release_executor(medium)
+    parallel._release_executor(medium)
+    assert medium.shutdowns == [] and list(parallel._pools) == [(2, "medium", "cpu", "int8")]
@@ -0,0 +1,137 @@
+import importlib
+import io
+import wave
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app import server
+from app.services import media_probe
+from app.services.cost_estimator import ThroughputHistory, estimate_llm_stages, estimate_transcription
+from app.services.disk_cache import DiskCache
+from app.services.speech_detection import vad_signature
+from app.services.transcript_cache import transcript_cache_key
+from app.services.transcription_profiles import PROFILES
+from app.services.upload_store import UploadStore
+
+tool = importlib.import_module("app.create.subagents.transcription.tools.transcribe_video")
+
+
+def wav_bytes(seconds: float, sample_rate: int = 16000) -> bytes:
+    buffer = io.BytesIO()
+    with wave.open(buffer, "wb") as file:
+        file.setnchannels(1)
+        file.setsampwidth(2)
+        file.setframerate(sample_rate)
+        file.writeframes(b"\x00\x00" * int(seconds * sample_rate))
+    return buffer.getvalue()
+
+
+@pytest.fixture
+def probe_cache(tmp_path, monkeypatch):
+    # Exercise the PyAV path whether or not ffprobe is installed.
+    monkeypatch.setattr(media_probe.shutil, "which", lambda name: None)
+    cache = DiskCache(tmp_path / "probe", max_bytes=1024 * 1024, name="media_probe")
+    monkeypatch.setattr(media_probe, "media_probe_cache", cache)
+    return cache
+
+
+@pytest.fixture
+def client(tmp_path, monkeypatch, probe_cache):
+    monkeypatch.setattr(server, "upload_store", UploadStore(tmp_path / "entrada"))
+    monkeypatch.setattr(server, "transcript_cache", DiskCache(tmp_path / "transcripts", max_bytes=1024 * 1024, name="transcripts"))
+    monkeypatch.setattr(server, "throughput_history", ThroughputHistory(tmp_path / "throughput.json"))
+    return TestClient(server.app)
+
+
+def test_probe_reads_audio_headers_and_caches_by_content(tmp_path, probe_cache, monkeypatch):
+    path = tmp_path / "fala.wav"
+    path.write_bytes(wav_bytes(2.0))
+
+    info = media_probe.get_media_info(str(path))
+    assert info["duration"] == pytest.approx(2.0)
+    assert info["audio"]["sample_rate"] == 16000 and info["audio"]["channels"] == 1
+    assert info["video"] is None
+
+    def fail(media_path):
+        raise AssertionError("the cached probe should have been used")
+
+    monkeypatch.setattr(media_probe, "probe_media", fail)
+    assert media_probe.get_media_info(str(path)) == info
+    assert probe_cache.stats()["entries"] == 1
+
+
+def test_files_that_are_not_media_probe_as_none(tmp_path, probe_cache):
+    path = tmp_path / "template.docx"
+    path.write_bytes(b"PK not really a zip")
+    assert media_probe.get_media_info(str(path)) is None
+    assert probe_cache.stats()["entries"] == 0
+
+
+def test_history_replaces_the_profile_prior_and_survives_reload(tmp_path):
+    history = ThroughputHistory(tmp_path / "throughput.json")
+    fast = PROFILES["fast"]
+    assert estimate_transcription(100, fast, history)["seconds"] == pytest.approx(100 * fast.realtime_factor)
+
+    history.record_transcription("fast", audio_seconds=100, wall_seconds=20, transcript_chars=1000)
+    history.record_transcription("fast", audio_seconds=100, wall_seconds=30, transcript_chars=1000)
+
+    estimate = estimate_transcription(100, fast, ThroughputHistory(tmp_path / "throughput.json"))
+    assert estimate["realtime_factor"] == pytest.approx(0.22)
+    assert estimate["transcript_chars"] == 1000
+    assert estimate["based_on_runs"] == 2
+
+
+def test_llm_stages_chain_each_output_into_the_next_prompt(tmp_path):
+    history = ThroughputHistory(tmp_path / "throughput.json")
+    history.record_llm("StructuringAgent", input_chars=4000, output_chars=2000, seconds=5)
+
+    estimate = estimate_llm_stages([("StructuringAgent", 0), ("WriterAgent", 400)], 4000, history)
+    structuring, writer = estimate["stages"]
+    assert structuring == {"stage": "StructuringAgent", "input_tokens": 1000, "output_tokens": 500, "seconds": 5.0, "based_on_runs": 1}
+    # The writer reads its prompt plus the structured text, and has no history yet.
+    assert writer["input_tokens"] == (400 + 2000) // 4
+    assert writer["output_tokens"] == (400 + 2000) // 4
+    assert estimate["input_tokens"] == 1000 + 600
+
+
+def test_upload_reports_the_probe_and_estimate_uses_it(client):
+    response = client.post("/upload", files={"file": ("aula.wav", wav_bytes(10.0))}, data={"doc_id": "doc-1"})
+    assert response.status_code == 200
+    upload = response.json()
+    assert upload["media"]["duration"] == pytest.approx(10.0)
+
+    estimate = client.post("/pipeline/estimate", json={"file_token": upload["file_token"], "transcription_profile": "fast"}).json()
+    transcription = estimate["transcription"]
+    assert transcription["profile"] == "fast" and transcription["cached"] is False
+    assert transcription["seconds"] == pytest.approx(10 * PROFILES["fast"].realtime_factor, abs=0.05)
+    assert [stage["stage"] for stage in estimate["llm"]["stages"]] == ["StructuringAgent", "MasteringAgent", "WriterAgent"]
+    assert estimate["total_seconds"] == pytest.approx(transcription["seconds"] + estimate["llm"]["seconds"], abs=0.1)
+
+    # A transcript cached for this profile costs nothing to reuse.
+    fast = PROFILES["fast"]
+    key = transcript_cache_key(upload["file_token"], fast.model_size, fast.beam_size, vad=vad_signature() if fast.vad_filter else None)
+    server.transcript_cache.put_text(key, "x" * 800)
+    estimate = client.post("/pipeline/estimate", json={"file_token": upload["file_token"], "transcription_profile": "fast"}).json()
+    assert estimate["transcription"]["cached"] is True and estimate["transcription"]["seconds"] == 0
+    structuring = estimate["llm"]["stages"][0]
+    assert structuring["input_tokens"] == round((800 + server._pipeline_llm_stages(False)[0][1]) / 4)
+
+
+def test_estimate_for_text_with_a_template(client):
+    estimate = client.post("/pipeline/estimate", json={"text_content": "passo " * 200, "template_token": "modelo.docx"}).json()
+    assert estimate["media"] is None and estimate["transcription"] is None
+    assert estimate["llm"]["stages"][-1]["stage"] == "JsonAgent"
+
+    assert client.post("/pipeline/estimate", json={}).status_code == 400
+    assert client.post("/pipeline/estimate", json={"file_token": "0" * 64}).status_code == 404
+
+
+def test_estimate_refuses_paths_beside_the_upload_directory(client, tmp_path, monkeypatch):
+    monkeypatch.setattr(tool, "data_dir", str(tmp_path))
+    # Shares the upload directory's name as a prefix, but is not inside it.
+    sibling = tmp_path / "entrada-antiga"
+    sibling.mkdir()
+    (sibling / "aula.wav").write_bytes(wav_bytes(1.0))
+
+    assert client.post("/pipeline/estimate", json={"file_token": str(sibling / "aula.wav")}).status_code == 403
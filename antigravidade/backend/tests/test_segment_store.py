@@ -0,0 +1,113 @@
+import asyncio
+import importlib
+import sys
+from contextlib import contextmanager
+from unittest.mock import MagicMock, patch
+
+import numpy as np
+import pytest
+
+from app.services.disk_cache import DiskCache
+from app.services.segment_store import SegmentStore, SegmentStoreBuilder
+from app.services.speech_detection import SpeechPlan
+
+tool = importlib.import_module("app.create.subagents.transcription.tools.transcribe_video")
+
+SEGMENTS = [
+    {"start": 0.0, "end": 2.5, "text": " Ligue a prensa."},
+    {"start": 3.0, "end": 5.0, "text": " Verifique a pressão."},
+    {"start": 7.0, "end": 9.5, "text": " Aguarde o sinal."},
+]
+
+
+def test_round_trip_through_a_memory_mapped_file(tmp_path):
+    store = SegmentStore.from_segments(SEGMENTS)
+    path = str(tmp_path / "t.seg")
+    store.save(path)
+
+    mapped = SegmentStore.open(path)
+
+    assert list(mapped) == [pytest.approx(segment) for segment in SEGMENTS]
+    assert mapped.full_text() == "".join(segment["text"] for segment in SEGMENTS)
+    assert mapped.starts.dtype == np.float32 and not mapped.starts.flags.owndata
+
+
+def test_time_range_and_time_lookups():
+    store = SegmentStore.from_segments(SEGMENTS)
+
+    assert list(store.indices_between(2.0, 3.5)) == [0, 1]
+    assert list(store.indices_between(5.5, 6.5)) == []
+    assert [s["text"] for s in store.between(4.0, 100.0)] == [" Verifique a pressão.", " Aguarde o sinal."]
+    assert store.index_at_time(8.0) == 2
+    assert store.index_at_time(6.0) is None
+
+
+def test_char_offsets_index_the_decoded_text_despite_multibyte_characters():
+    store = SegmentStore.from_segments(SEGMENTS)
+    text = store.full_text()
+    offset = text.index("sinal")
+
+    assert store.index_at_char(offset) == 2
+    # "pressão" has a two-byte character; the next segment still starts where expected.
+    assert store.index_at_char(text.index(" Aguarde")) == 2
+    assert store.index_at_char(text.index(" Aguarde") - 1) == 1
+    assert store.index_at_char(len(text)) is None
+
+
+def test_words_survive_serialization():
+    builder = SegmentStoreBuilder()
+    builder.append({
+        "start": 0.0, "end": 1.0, "text": " Olá mundo",
+        "words": [
+            {"start": 0.0, "end": 0.4, "word": " Olá", "probability": 0.9},
+            {"start": 0.5, "end": 1.0, "word": " mundo", "probability": 0.8},
+        ],
+    })
+    builder.append({"start": 1.0, "end": 2.0, "text": " fim", "words": [{"start": 1.1, "end": 1.9, "word": " fim", "probability": 0.7}]})
+
+    store = SegmentStore.from_buffer(builder.build().to_bytes())
+
+    assert [word["word"] for word in store.segment(0)["words"]] == [" Olá", " mundo"]
+    assert store.segment(1)["words"][0]["probability"] == pytest.approx(0.7)
+
+
+def test_long_transcript_is_far_smaller_than_python_objects():
+    segments = [{"start": i * 3.0, "end": i * 3.0 + 2.5, "text": f" Segmento número {i} da transcrição."} for i in range(20_000)]
+
+    data = SegmentStore.from_segments(segments).to_bytes()
+    objects = sum(sys.getsizeof(s) + sum(sys.getsizeof(v) for v in s.values()) for s in segments)
+
+    assert len(data) * 4 < objects
+
+
+def test_transcription_caches_timed_segments_beside_the_text(tmp_path, monkeypatch):
+    (tmp_path / "entrada").mkdir()
+    video = tmp_path / "entrada" / "linha.mp4"
+    video.write_bytes(b"video")
+    cache = DiskCache(tmp_path / "cache", max_bytes=100_000)
+    monkeypatch.setattr(tool, "data_dir", str(tmp_path))
+    monkeypatch.setattr(tool, "transcript_cache", cache)
+    monkeypatch.setattr(tool.settings, "TRANSCRIPTION_CHECKPOINT_DIR", tmp_path / "checkpoints")
+    monkeypatch.setattr(tool, "extract_audio", lambda path: path)
+    monkeypatch.setattr(tool, "load_audio", lambda path: np.zeros(10 * 16000, dtype=np.float32))
+    monkeypatch.setattr(tool, "detect_speech", lambda audio: SpeechPlan([{"start": 0, "end": len(audio)}], len(audio) / 16000))
+
+    model = MagicMock(frames_per_second=100)
+    decoded = []
+    for segment in SEGMENTS:
+        fake = MagicMock(seek=0, temperature=0.0, tokens=[1])
+        fake.start, fake.end, fake.text = segment["start"], segment["end"], segment["text"]
+        decoded.append(fake)
+    model.transcribe.return_value = (iter(decoded), MagicMock(language="pt", language_probability=0.9, duration=10.0))
+    pool = MagicMock()
+
+    @contextmanager
+    def acquire(*args):
+        yield model
+
+    pool.acquire = acquire
+    with patch.object(tool, "whisper_pool", pool), patch.object(tool, "transcript_segments_key", wraps=tool.transcript_segments_key) as key:
+        asyncio.run(tool._transcribe(str(video)))
+
+    store = SegmentStore.from_buffer(cache.get(key.call_args[0][0] + ".segments"))
+    assert [(s["start"], s["end"]) for s in store] == [(s["start"], s["end"]) for s in SEGMENTS]
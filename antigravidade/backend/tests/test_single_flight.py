@@ -0,0 +1,144 @@
+import asyncio
+import importlib
+
+from app.services.single_flight import SingleFlight
+
+tool = importlib.import_module("app.create.subagents.transcription.tools.transcribe_video")
+
+
+def test_concurrent_identical_calls_compute_once():
+    flights = SingleFlight("test")
+    calls = []
+
+    async def compute():
+        calls.append(1)
+        await asyncio.sleep(0.05)
+        return "manual"
+
+    async def main():
+        return await asyncio.gather(*(flights.run("k", compute) for _ in range(3)), flights.run("other", compute))
+
+    assert asyncio.run(main()) == ["manual"] * 4
+    assert len(calls) == 2
+    stats = flights.stats()
+    assert stats["started"] == 2 and stats["coalesced"] == 2 and stats["in_flight"] == 0
+    assert stats["avoided_seconds"] >= 0.1 - 0.01
+
+
+def test_errors_reach_every_caller_and_are_not_remembered():
+    flights = SingleFlight("test")
+
+    async def fail():
+        await asyncio.sleep(0.01)
+        raise RuntimeError("quota")
+
+    async def main():
+        return await asyncio.gather(flights.run("k", fail), flights.run("k", fail), return_exceptions=True)
+
+    assert [str(result) for result in asyncio.run(main())] == ["quota", "quota"]
+    assert asyncio.run(flights.run("k", lambda: asyncio.sleep(0, result="ok"))) == "ok"
+
+
+def test_late_stream_caller_receives_missed_events():
+    flights = SingleFlight("test")
+    produced = []
+
+    async def produce():
+        for index in range(4):
+            produced.append(index)
+            yield index
+            await asyncio.sleep(0.01)
+
+    async def late():
+        await asyncio.sleep(0.025)
+        return [event async for event in flights.stream("k", produce)]
+
+    async def first():
+        return [event async for event in flights.stream("k", produce)]
+
+    async def both():
+        return await asyncio.gather(first(), late())
+
+    early, joined = asyncio.run(both())
+    assert early == joined == [0, 1, 2, 3]
+    assert produced == [0, 1, 2, 3]
+
+
+def test_stream_producer_is_cancelled_only_when_every_caller_leaves():
+    flights = SingleFlight("test")
+    async def main():
+        stopped = asyncio.Event()
+
+        async def produce():
+            try:
+                for index in range(100):
+                    yield index
+                    await asyncio.sleep(0.01)
+            finally:
+                stopped.set()
+
+        async def take(count):
+            taken = []
+            async for event in flights.stream("k", produce):
+                taken.append(event)
+                if len(taken) == count:
+                    break
+            return taken
+
+        short, longer = await asyncio.gather(take(2), take(5))
+        await asyncio.wait_for(stopped.wait(), 1)
+        return short, longer
+
+    short, longer = asyncio.run(main())
+    assert short == [0, 1] and longer == [0, 1, 2, 3, 4]
+    assert flights.stats()["in_flight"] == 0
+
+
+def test_same_video_submitted_twice_is_transcribed_once(tmp_path, monkeypatch):
+    (tmp_path / "entrada").mkdir()
+    video = tmp_path / "entrada" / "linha.mp4"
+    video.write_bytes(b"video")
+    monkeypatch.setattr(tool, "data_dir", str(tmp_path))
+    calls = []
+
+    async def fake_transcribe(video_path, on_segment=None, profile_name=None):
+        calls.append(video_path)
+        for index in range(3):
+            await asyncio.sleep(0.01)
+            await asyncio.to_thread(on_segment, {"start": index * 2.0, "end": index * 2.0 + 2.0, "text": f" s{index}", "progress": (index + 1) / 3})
+        return "s0 s1 s2"
+
+    monkeypatch.setattr(tool, "_transcribe", fake_transcribe)
+
+    async def collect():
+        return [event async for event in tool.transcribe_video_stream(str(video), "fast")]
+
+    async def main():
+        return await asyncio.gather(collect(), collect())
+
+    first, second = asyncio.run(main())
+    assert len(calls) == 1
+    assert first == second
+    assert first[-1] == {"type": "result", "text": "s0 s1 s2"}
+    assert len(first) == 4
+
+
+def test_identical_stage_calls_share_one_model_call(fake_llm):
+    import app.server as server
+
+    async def slow_echo(name, content):
+        await asyncio.sleep(0.02)
+        yield {"type": "result", "text": f"{name}: {content}"}
+
+    # The fresh stage-output cache keeps the coalescing, not the cache, under test.
+    fake_llm.reply = slow_echo
+
+    async def main():
+        return await asyncio.gather(
+            server.run_adhoc_agent("StructuringAgent", "Estruture.", "texto"),
+            server.run_adhoc_agent("StructuringAgent", "Estruture.", "texto"),
+            server.run_adhoc_agent("StructuringAgent", "Estruture.", "outro texto"),
+        )
+
+    assert asyncio.run(main()) == ["StructuringAgent: texto", "StructuringAgent: texto", "StructuringAgent: outro texto"]
+    assert len(fake_llm.calls) == 2
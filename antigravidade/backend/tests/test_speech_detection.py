@@ -0,0 +1,122 @@
+import asyncio
+import importlib
+from contextlib import contextmanager
+from unittest.mock import MagicMock, patch
+
+import numpy as np
+import pytest
+
+from app.services.disk_cache import DiskCache
+from app.services.speech_detection import SpeechPlan, VadStats
+from app.services.transcription_profiles import PROFILES
+
+tool = importlib.import_module("app.create.subagents.transcription.tools.transcribe_video")
+
+SAMPLE_RATE = 16000
+
+
+def seconds(value):
+    return int(value * SAMPLE_RATE)
+
+
+# 60 s recording: speech at 10-20 s and 40-45 s, machine noise elsewhere.
+PLAN = SpeechPlan(
+    chunks=[{"start": seconds(10), "end": seconds(20)}, {"start": seconds(40), "end": seconds(45)}],
+    duration=60.0,
+)
+
+
+def test_plan_reports_speech_share():
+    assert PLAN.speech_seconds == 15.0
+    assert PLAN.speech_ratio == 0.25
+
+
+def test_collapse_keeps_only_speech_and_maps_back():
+    audio = np.arange(seconds(60), dtype=np.float32)
+
+    collapsed = PLAN.collapse(audio)
+
+    assert len(collapsed) == seconds(15)
+    assert collapsed[0] == seconds(10) and collapsed[seconds(10)] == seconds(40)
+    # 12 s into the collapsed audio is 2 s into the second speech region.
+    assert PLAN.to_original(1.0, 12.0) == (11.0, 42.0)
+
+
+class SpeechModel:
+    frames_per_second = 100
+
+    def __init__(self):
+        self.audio_lengths = []
+        self.kwargs = []
+
+    def transcribe(self, audio, **kwargs):
+        self.audio_lengths.append(len(audio))
+        self.kwargs.append(kwargs)
+        segments = []
+        for start, end, text in [(0.0, 9.0, " Ligue a prensa."), (10.5, 14.5, " Aguarde.")]:
+            segment = MagicMock(seek=0, temperature=0.0, tokens=[1])
+            segment.start, segment.end, segment.text = start, end, text
+            segments.append(segment)
+        return iter(segments), MagicMock(language="pt", language_probability=0.9, duration=len(audio) / SAMPLE_RATE)
+
+
+def pool_of(model):
+    pool = MagicMock()
+
+    @contextmanager
+    def acquire(*args):
+        yield model
+
+    pool.acquire = acquire
+    return pool
+
+
+def test_decoder_only_sees_speech_and_timestamps_use_the_original_timeline():
+    model = SpeechModel()
+    received = []
+    with patch.object(tool, "whisper_pool", pool_of(model)):
+        text, info = tool._decode_sequential(
+            np.zeros(seconds(60), dtype=np.float32), PROFILES["balanced"], received.append, None, PLAN
+        )
+
+    assert model.audio_lengths == [seconds(15)]
+    assert model.kwargs[0]["vad_filter"] is False
+    assert text == "Ligue a prensa. Aguarde."
+    assert [(s["start"], s["end"]) for s in received] == [(10.0, 19.0), (40.5, 44.5)]
+    assert received[-1]["progress"] == pytest.approx(44.5 / 60)
+    assert (info.duration, info.speech_seconds) == (60.0, 15.0)
+
+
+def test_silent_recording_is_not_decoded():
+    model = SpeechModel()
+    with patch.object(tool, "whisper_pool", pool_of(model)):
+        text, info = tool._decode_sequential(
+            np.zeros(seconds(60), dtype=np.float32), PROFILES["balanced"], None, None, SpeechPlan([], 60.0)
+        )
+
+    assert text == "" and info.speech_seconds == 0.0
+    assert model.audio_lengths == []
+
+
+def test_vad_job_reports_time_saved_and_keys_cache_by_thresholds(tmp_path, monkeypatch):
+    (tmp_path / "entrada").mkdir()
+    video = tmp_path / "entrada" / "turno.mp4"
+    video.write_bytes(b"video")
+    monkeypatch.setattr(tool, "data_dir", str(tmp_path))
+    monkeypatch.setattr(tool, "transcript_cache", DiskCache(tmp_path / "cache", max_bytes=10_000))
+    monkeypatch.setattr(tool.settings, "TRANSCRIPTION_CHECKPOINT_DIR", tmp_path / "checkpoints")
+    monkeypatch.setattr(tool, "extract_audio", lambda path: path)
+    monkeypatch.setattr(tool, "load_audio", lambda path: np.zeros(seconds(60), dtype=np.float32))
+    monkeypatch.setattr(tool, "detect_speech", lambda audio: PLAN)
+    monkeypatch.setattr(tool, "vad_stats", VadStats())
+    model = SpeechModel()
+
+    with patch.object(tool, "whisper_pool", pool_of(model)):
+        asyncio.run(tool._transcribe(str(video), profile_name="balanced"))
+        monkeypatch.setattr(tool.settings, "VAD_THRESHOLD", 0.7)
+        asyncio.run(tool._transcribe(str(video), profile_name="balanced"))
+
+    # Other thresholds decode other regions, so they do not reuse the first transcript.
+    assert len(model.audio_lengths) == 2
+    stats = tool.vad_stats.stats()
+    assert (stats["jobs"], stats["audio_seconds"], stats["skipped_seconds"], stats["speech_ratio"]) == (2, 120.0, 90.0, 0.25)
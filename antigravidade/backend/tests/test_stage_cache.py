@@ -0,0 +1,64 @@
+import asyncio
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app import server
+from app.services.stage_cache import stage_cache_key
+
+
+@pytest.fixture
+def llm(fake_llm):
+    async def numbered(name, content):
+        yield {"type": "result", "text": f"{name} ({len(fake_llm.calls)})" if "vazio" not in content else ""}
+
+    fake_llm.reply = numbered
+    return fake_llm
+
+
+def test_key_covers_stage_model_instruction_version_and_input():
+    base = ("StructuringAgent", "gemini-2.5-flash", "Estruture.", 1, "texto")
+    key = stage_cache_key(*base)
+    assert stage_cache_key(*base) == key
+    for index, other in enumerate(["MasteringAgent", "gemini-2.5-pro", "Revise.", 2, "texto novo"]):
+        changed = list(base)
+        changed[index] = other
+        assert stage_cache_key(*changed) != key
+
+
+def test_repeated_stage_input_is_answered_from_the_cache(llm):
+    async def main():
+        first = await server.run_adhoc_agent("StructuringAgent", "Estruture.", "texto")
+        second = await server.run_adhoc_agent("StructuringAgent", "Estruture.", "texto")
+        bypassed = await server.run_adhoc_agent("StructuringAgent", "Estruture.", "texto", use_cache=False)
+        refreshed = await server.run_adhoc_agent("StructuringAgent", "Estruture.", "texto")
+        return first, second, bypassed, refreshed
+
+    first, second, bypassed, refreshed = asyncio.run(main())
+    assert first == second == "StructuringAgent (1)"
+    # A bypass calls the model and its output replaces the cached one.
+    assert bypassed == refreshed == "StructuringAgent (2)"
+    stats = server.stage_output_cache.stats()["stages"]["StructuringAgent"]
+    assert stats == {"hits": 2, "misses": 1, "bypassed": 1, "hit_rate": 0.667}
+
+
+def test_empty_outputs_are_not_cached(llm):
+    async def main():
+        for _ in range(2):
+            await server.run_adhoc_agent("WriterAgent", "Escreva.", "vazio")
+
+    asyncio.run(main())
+    assert llm.stages == ["WriterAgent", "WriterAgent"]
+
+
+def test_pipeline_run_reuses_stage_outputs_unless_bypassed(llm):
+    client = TestClient(server.app)
+    body = {"doc_id": "doc-cache", "text_content": "Passo 1: ligar a bomba."}
+
+    for request in (body, body, {**body, "bypass_cache": True}):
+        response = client.post("/pipeline/run", json=request)
+        assert "event: complete" in response.text
+
+    stages = ["StructuringAgent", "MasteringAgent", "WriterAgent"]
+    assert llm.stages == stages + stages
+    assert server.stage_output_cache.stats()["stages"]["MasteringAgent"]["hits"] == 1
@@ -0,0 +1,97 @@
+import asyncio
+import json
+import time
+
+import pytest
+from fastapi.testclient import TestClient
+from google.adk.models import BaseLlm, LlmResponse
+from google.genai import types
+
+from app import server
+from app.services.agent_pool import AgentPool
+from app.services.delta_coalescing import coalesce_deltas
+
+
+class StreamingLlm(BaseLlm):
+    """Streams its answer in words, then sends the aggregated text, as Gemini does."""
+
+    model: str = "streaming-echo"
+
+    async def generate_content_async(self, llm_request, stream=False):
+        words = ["Capítulo ", "1: ", "ligar ", "a ", "bomba."]
+        if stream:
+            for word in words:
+                yield LlmResponse(content=types.Content(role="model", parts=[types.Part(text=word)]), partial=True)
+        yield LlmResponse(content=types.Content(role="model", parts=[types.Part(text="".join(words))]))
+
+
+async def source(events):
+    for delay, event in events:
+        await asyncio.sleep(delay)
+        yield event
+
+
+def delta(text):
+    return {"type": "delta", "text": text}
+
+
+@pytest.fixture
+def sandbox(llm_sandbox, monkeypatch):
+    monkeypatch.setattr(server, "agent_pool", AgentPool())
+
+
+def test_bursts_are_merged_after_the_first_delta():
+    async def main():
+        events = [(0, delta("a"))] + [(0.001, delta(str(i))) for i in range(20)] + [(0, {"type": "result", "text": "fim"})]
+        return [event async for event in coalesce_deltas(source(events), interval=0.5)]
+
+    events = asyncio.run(main())
+    assert events[0] == delta("a")
+    assert events[1] == delta("".join(str(i) for i in range(20)))
+    assert events[2] == {"type": "result", "text": "fim"}
+
+
+def test_buffered_text_is_flushed_while_the_model_pauses():
+    async def main():
+        started = time.monotonic()
+        events = [(0, delta("a")), (0, delta("b")), (0.5, {"type": "result", "text": "ab"})]
+        return [(event, time.monotonic() - started) async for event in coalesce_deltas(source(events), interval=0.05)]
+
+    (first, _), (second, flushed_at), (result, _) = asyncio.run(main())
+    assert (first, second) == (delta("a"), delta("b"))
+    assert flushed_at < 0.3
+    assert result["type"] == "result"
+
+
+def test_stage_deltas_come_from_partial_events_and_the_result_is_whole(sandbox):
+    async def main():
+        return [event async for event in server.run_adhoc_agent_stream("StructuringAgent", "Estruture.", "texto", StreamingLlm())]
+
+    events = asyncio.run(main())
+    deltas = [event["text"] for event in events if event["type"] == "delta"]
+    assert deltas == ["Capítulo ", "1: ", "ligar ", "a ", "bomba."]
+    assert events[-1]["type"] == "result" and events[-1]["text"] == "Capítulo 1: ligar a bomba."
+    assert events[-1]["queue_wait"] >= 0
+    assert server.agent_pool.stats()["stored_sessions"] == 0
+
+
+def test_pipeline_run_streams_stage_text_before_each_stage_completes(fake_llm):
+    async def words(name, content):
+        for word in ("Texto ", "da ", "etapa"):
+            yield delta(word)
+        yield {"type": "result", "text": f"{name}: Texto da etapa"}
+
+    fake_llm.reply = words
+    response = TestClient(server.app).post("/pipeline/run", json={"doc_id": "doc-delta", "text_content": "Passo 1."})
+    body = response.text
+
+    stage_deltas = [
+        json.loads(block.split("data: ", 1)[1])
+        for block in body.split("\n\n")
+        if block.startswith("event: stage_delta")
+    ]
+    structuring = "".join(event["text"] for event in stage_deltas if event["stage"] == "STRUCTURING")
+    assert structuring == "Texto da etapa"
+    assert {event["stage"] for event in stage_deltas} == {"STRUCTURING", "MASTERING", "JSON_CONVERTER"}
+    assert body.index("event: stage_delta") < body.index("Estruturação concluída")
+    assert "event: complete" in body
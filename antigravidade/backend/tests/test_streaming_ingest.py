@@ -0,0 +1,252 @@
+import asyncio
+import importlib
+import json
+import subprocess
+import sys
+import time
+from contextlib import contextmanager
+from types import SimpleNamespace
+
+import numpy as np
+import pytest
+from fastapi.testclient import TestClient
+
+from app import server
+from app.services import streaming_ingest
+from app.services.audio_extraction import SAMPLE_RATE, audio_artifact_path
+from app.services.chunked_upload import ChunkedUploads
+from app.services.cost_estimator import ThroughputHistory
+from app.services.disk_cache import DiskCache
+from app.services.speech_detection import SpeechPlan
+from app.services.streaming_ingest import IngestJobs
+from app.services.transcription_profiles import PROFILES
+from app.services.upload_store import UploadStore
+
+tool = importlib.import_module("app.create.subagents.transcription.tools.transcribe_video")
+
+# 150 s of "audio" whose samples hold the second they belong to, so the fake
+# model can tell which part of the recording it was given.
+AUDIO = np.repeat(np.arange(150, dtype=np.float32), SAMPLE_RATE)
+MEDIA = AUDIO.tobytes()
+CHUNK = 5 * SAMPLE_RATE * 4
+CHUNKS = len(MEDIA) // CHUNK
+
+
+class WindowModel:
+    """
+    Decodes 30 s windows like Whisper, two 15 s segments each. A segment's text
+    names the recording's second and the prompt carried over from earlier
+    windows, so a resume with the wrong context shows up in the transcript.
+    """
+    frames_per_second = 100
+
+    def __init__(self):
+        self.calls = []
+
+    def transcribe(self, audio, clip_timestamps=None, initial_prompt=None, language=None, **kwargs):
+        duration = len(audio) / SAMPLE_RATE
+        self.calls.append({"duration": duration, "clip_timestamps": clip_timestamps, "initial_prompt": initial_prompt})
+
+        def generate():
+            prompt = list(initial_prompt or [])
+            start = clip_timestamps[0] if clip_timestamps else 0.0
+            for offset in np.arange(start, duration, 30.0):
+                for half in (0.0, 15.0):
+                    if offset + half >= duration:
+                        return
+                    segment = SimpleNamespace(
+                        seek=int(offset * 100), temperature=0.0,
+                        start=float(offset + half), end=float(min(offset + half + 15.0, duration)),
+                        text=f" s{int(audio[int((offset + half) * SAMPLE_RATE)])} ctx={sum(prompt[-4:])}",
+                        tokens=[int(offset + half) + 1],
+                    )
+                    prompt.extend(segment.tokens)
+                    yield segment
+
+        return generate(), SimpleNamespace(language=language or "pt", language_probability=0.9, duration=duration)
+
+
+def uninterrupted_text():
+    texts, prompt = [], []
+    for second in range(0, 150, 15):
+        texts.append(f" s{second} ctx={sum(prompt[-4:])}")
+        prompt.append(second + 1)
+    return "".join(texts).strip()
+
+
+@pytest.fixture
+def ingest(tmp_path, monkeypatch):
+    model = WindowModel()
+
+    @contextmanager
+    def acquire(*args):
+        yield model
+
+    # A pipe that passes the upload through unchanged stands in for ffmpeg.
+    monkeypatch.setattr(streaming_ingest, "open_pcm_pipe", lambda: subprocess.Popen(
+        [sys.executable, "-c", "import shutil, sys; shutil.copyfileobj(sys.stdin.buffer, sys.stdout.buffer, 4096)"],
+        stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+    ))
+    monkeypatch.setattr(streaming_ingest.settings, "INGEST_WINDOW_SECONDS", 20.0)
+    monkeypatch.setattr(streaming_ingest.settings, "TRANSCRIPTION_CHECKPOINT_DIR", tmp_path / "checkpoints")
+    jobs = IngestJobs()
+    monkeypatch.setattr(server, "chunked_uploads", ChunkedUploads(tmp_path / "partial", chunk_size=CHUNK, ttl_seconds=3600))
+    monkeypatch.setattr(server, "ingest_jobs", jobs)
+    monkeypatch.setattr(server, "upload_store", UploadStore(tmp_path / "entrada"))
+    monkeypatch.setattr(tool, "ingest_jobs", jobs)
+    monkeypatch.setattr(tool, "whisper_pool", SimpleNamespace(acquire=acquire))
+    monkeypatch.setattr(tool, "data_dir", str(tmp_path))
+    monkeypatch.setattr(tool, "transcript_cache", DiskCache(tmp_path / "cache", max_bytes=1024 * 1024))
+    monkeypatch.setattr(tool, "throughput_history", ThroughputHistory(tmp_path / "throughput.json"))
+    return SimpleNamespace(client=TestClient(server.app), model=model, tmp_path=tmp_path)
+
+
+def saved_file_transcription(calls):
+    """Stands in for transcribe_video_stream, recording what it was asked to transcribe."""
+    async def fake_stream(media_path, profile=None):
+        calls.append((media_path, profile))
+        yield {"type": "segment", "start": 0.0, "end": 150.0, "text": " tudo", "progress": 1.0}
+        yield {"type": "result", "text": "tudo"}
+    return fake_stream
+
+
+def upload_chunks(client, upload_id, chunks):
+    for index in chunks:
+        response = client.patch(
+            f"/upload/sessions/{upload_id}",
+            content=MEDIA[index * CHUNK:(index + 1) * CHUNK],
+            headers={"Upload-Offset": str(index * CHUNK)},
+        )
+        assert response.status_code == 200
+
+
+def wait_for(condition, timeout=10.0):
+    deadline = time.time() + timeout
+    while not condition():
+        assert time.time() < deadline
+        time.sleep(0.02)
+
+
+def sse_blocks(body):
+    return [
+        (event[len("event: "):], json.loads(data[len("data: "):]))
+        for event, data in (block.split("\n", 1) for block in body.strip().split("\n\n"))
+    ]
+
+
+def test_saved_file_transcription_resumes_after_the_streamed_windows(ingest):
+    client = ingest.client
+    created = client.post("/upload/sessions", json={"filename": "linha.wav", "size": len(MEDIA), "transcribe": True, "transcription_profile": "accurate"}).json()
+    upload_id = created["upload_id"]
+    assert created["transcribing"] is True
+
+    upload_chunks(client, upload_id, range(9))
+    job = server.ingest_jobs.get(upload_id)
+    # The first 30 s window is complete in the pass over the first 40 s.
+    wait_for(lambda: len(job.events) >= 2)
+    assert job.segments_before_upload_complete >= 2
+
+    upload_chunks(client, upload_id, range(9, CHUNKS))
+    file_token = client.post(f"/upload/sessions/{upload_id}/finalize").json()["file_token"]
+    with client.stream("GET", f"/upload/sessions/{upload_id}/transcript") as response:
+        blocks = sse_blocks("".join(response.iter_text()))
+
+    # Every segment reaches the listener once, whether it was decoded during the
+    # upload or by the run on the saved file.
+    assert [data["start"] for event, data in blocks[:-1]] == list(range(0, 150, 15))
+    assert blocks[-1] == ("transcript_complete", {"text": uninterrupted_text(), "file_token": file_token})
+
+    # That run replayed the journaled windows and decoded only the rest, with
+    # the prompt they left behind.
+    resumed = ingest.model.calls[-1]
+    assert resumed["duration"] == 150.0 and resumed["clip_timestamps"][0] >= 30.0
+    assert resumed["initial_prompt"] == [second + 1 for second in range(0, int(resumed["clip_timestamps"][0]), 15)]
+    media_path = server.upload_store.path_for(file_token)
+    with open(media_path, "rb") as file:
+        assert file.read() == MEDIA
+    assert np.array_equal(np.fromfile(audio_artifact_path(media_path), dtype=np.float32), AUDIO)
+    assert not list(ingest.tmp_path.rglob("*.jsonl"))
+
+
+def test_pipeline_run_on_the_file_token_picks_up_the_streamed_windows(ingest):
+    client = ingest.client
+    upload_id = client.post("/upload/sessions", json={"filename": "linha.wav", "size": len(MEDIA), "transcribe": True, "transcription_profile": "accurate"}).json()["upload_id"]
+    upload_chunks(client, upload_id, range(9))
+    job = server.ingest_jobs.get(upload_id)
+    wait_for(lambda: len(job.events) >= 2)
+    upload_chunks(client, upload_id, range(9, CHUNKS))
+    file_token = client.post(f"/upload/sessions/{upload_id}/finalize").json()["file_token"]
+
+    async def run():
+        # What /pipeline/run does with the file_token, without the listener.
+        return [event async for event in tool.transcribe_video_stream(server.upload_store.path_for(file_token), "accurate")]
+
+    events = asyncio.run(run())
+
+    assert events[-1] == {"type": "result", "text": uninterrupted_text()}
+    assert ingest.model.calls[-1]["clip_timestamps"][0] >= 30.0
+
+
+def test_only_final_speech_regions_are_decoded_while_uploading(ingest, monkeypatch, tmp_path):
+    regions = [{"start": start * SAMPLE_RATE, "end": (start + 20) * SAMPLE_RATE} for start in (0, 30, 60, 90)]
+    monkeypatch.setattr(tool, "detect_speech", lambda audio: SpeechPlan(regions, len(audio) / SAMPLE_RATE))
+    windows = []
+
+    tool.journal_received_audio(AUDIO[:120 * SAMPLE_RATE], PROFILES["fast"], str(tmp_path / "journal.jsonl"), windows.append)
+
+    # The last two regions can still change as audio arrives, so only the first
+    # two (40 s of speech) are decoded, and only their first window is complete.
+    assert ingest.model.calls[0]["duration"] == 40.0
+    assert len(windows) == 1
+    # Timestamps are on the recording's timeline: the second segment ends 10 s into the region at 30 s.
+    assert [(segment["start"], segment["end"]) for segment in windows[0]["segments"]] == [(0.0, 15.0), (15.0, 40.0)]
+
+
+def test_falls_back_to_transcribing_the_saved_file(ingest, monkeypatch):
+    def no_ffmpeg():
+        raise FileNotFoundError("ffmpeg not found")
+
+    monkeypatch.setattr(streaming_ingest, "open_pcm_pipe", no_ffmpeg)
+    monkeypatch.setattr(server, "transcribe_video_stream", saved_file_transcription([]))
+    client = ingest.client
+    upload_id = client.post("/upload/sessions", json={"filename": "linha.mp4", "size": len(MEDIA), "transcribe": True}).json()["upload_id"]
+    upload_chunks(client, upload_id, range(CHUNKS))
+    file_token = client.post(f"/upload/sessions/{upload_id}/finalize").json()["file_token"]
+
+    with client.stream("GET", f"/upload/sessions/{upload_id}/transcript") as response:
+        body = "".join(response.iter_text())
+
+    assert '"text": " tudo"' in body
+    assert json.dumps({"text": "tudo", "file_token": file_token}) in body
+    assert server.ingest_jobs.stats()["fallbacks"] == 1
+
+
+def test_cancelled_upload_stops_the_transcription(ingest):
+    client = ingest.client
+    upload_id = client.post("/upload/sessions", json={"filename": "linha.wav", "size": len(MEDIA), "transcribe": True}).json()["upload_id"]
+    upload_chunks(client, upload_id, range(2))
+    job = server.ingest_jobs.get(upload_id)
+
+    assert client.delete(f"/upload/sessions/{upload_id}").status_code == 204
+
+    assert server.ingest_jobs.get(upload_id) is None
+    wait_for(lambda: job._process.poll() is not None)
+    assert client.get(f"/upload/sessions/{upload_id}/transcript").status_code == 404
+
+
+@pytest.mark.parametrize("setting, value", [("TRANSCRIPTION_DAEMON", True), ("TRANSCRIPTION_MODE", "parallel")])
+def test_nothing_is_decoded_while_uploading_when_the_run_cannot_resume(ingest, monkeypatch, setting, value):
+    transcribed = []
+    monkeypatch.setattr(streaming_ingest.settings, setting, value)
+    monkeypatch.setattr(server, "transcribe_video_stream", saved_file_transcription(transcribed))
+    client = ingest.client
+    upload_id = client.post("/upload/sessions", json={"filename": "linha.wav", "size": len(MEDIA), "transcribe": True, "transcription_profile": "fast"}).json()["upload_id"]
+    upload_chunks(client, upload_id, range(CHUNKS))
+    file_token = client.post(f"/upload/sessions/{upload_id}/finalize").json()["file_token"]
+
+    with client.stream("GET", f"/upload/sessions/{upload_id}/transcript") as response:
+        body = "".join(response.iter_text())
+
+    assert ingest.model.calls == []
+    assert transcribed == [(server.upload_store.path_for(file_token), "fast")]
+    assert json.dumps({"text": "tudo", "file_token": file_token}) in body
@@ -0,0 +1,100 @@
+import importlib
+import json
+from unittest.mock import patch
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app import server
+from app.services import transcript_cache as transcript_cache_module
+from app.services import subtitle_export
+from app.services.disk_cache import DiskCache
+from app.services.media_hash import file_sha256
+from app.services.segment_store import SegmentStore
+from app.services.subtitle_export import format_timestamp, iter_export
+from app.services.transcript_cache import link_document_media, link_media_transcript, transcript_segments_key
+
+tool = importlib.import_module("app.create.subagents.transcription.tools.transcribe_video")
+
+SEGMENTS = [
+    {"start": 0.0, "end": 2.5, "text": " Ligue a prensa."},
+    {"start": 3661.25, "end": 3663.0, "text": " Verifique a pressão.\n\nAguarde."},
+]
+
+
+def test_timestamps():
+    assert format_timestamp(3661.25, ",") == "01:01:01,250"
+    assert format_timestamp(0.0004, ".") == "00:00:00.000"
+
+
+def test_srt_and_vtt_cues():
+    store = SegmentStore.from_segments(SEGMENTS)
+
+    srt = "".join(iter_export(store, "srt"))
+    vtt = "".join(iter_export(store, "vtt"))
+
+    assert srt == (
+        "1\n00:00:00,000 --> 00:00:02,500\nLigue a prensa.\n\n"
+        "2\n01:01:01,250 --> 01:01:03,000\nVerifique a pressão.\nAguarde.\n\n"
+    )
+    assert vtt.startswith("WEBVTT\n\n00:00:00.000 --> 00:00:02.500\nLigue a prensa.\n\n")
+
+
+def test_json_export_is_streamed_in_chunks(monkeypatch):
+    monkeypatch.setattr(subtitle_export, "EXPORT_CHUNK_SEGMENTS", 1)
+    store = SegmentStore.from_segments(SEGMENTS)
+
+    chunks = list(iter_export(store, "json", {"language": "pt", "duration": 3663.0}))
+    document = json.loads("".join(chunks))
+
+    assert len(chunks) == 4
+    assert document["language"] == "pt"
+    assert [segment["text"] for segment in document["segments"]] == [s["text"] for s in SEGMENTS]
+
+
+@pytest.fixture
+def cached_upload(tmp_path, monkeypatch):
+    cache = DiskCache(tmp_path / "cache", max_bytes=100_000)
+    monkeypatch.setattr(transcript_cache_module, "transcript_cache", cache)
+    monkeypatch.setattr(server, "transcript_cache", cache)
+    monkeypatch.setattr(tool, "data_dir", str(tmp_path))
+    (tmp_path / "entrada").mkdir()
+    video = tmp_path / "entrada" / "linha.mp4"
+    video.write_bytes(b"video")
+
+    media_hash = file_sha256(str(video))
+    cache.put_text("k1", "Ligue a prensa. Verifique a pressão.", {"language": "pt", "duration": 3663.0})
+    cache.put(transcript_segments_key("k1"), SegmentStore.from_segments(SEGMENTS).to_bytes())
+    link_media_transcript(media_hash, "k1")
+    link_document_media("doc-1", media_hash)
+    return str(video)
+
+
+def test_export_by_doc_id_and_upload_never_transcribes(cached_upload):
+    client = TestClient(server.app)
+    with patch.object(server, "transcribe_video_stream", side_effect=AssertionError("transcribed")):
+        by_doc = client.get("/transcript/export", params={"doc_id": "doc-1", "format": "srt"})
+        by_upload = client.get("/transcript/export", params={"file_token": cached_upload, "format": "json"})
+
+    assert by_doc.status_code == 200
+    assert by_doc.headers["content-disposition"] == 'attachment; filename="doc-1.srt"'
+    assert "01:01:01,250 --> 01:01:03,000" in by_doc.text
+    assert by_upload.json()["duration"] == 3663.0
+    # The links live in their own index, not among the cached transcripts.
+    assert server.transcript_cache.stats()["entries"] == 2
+
+
+def test_export_errors(cached_upload, tmp_path):
+    client = TestClient(server.app)
+
+    assert client.get("/transcript/export", params={"doc_id": "doc-1", "format": "ass"}).status_code == 400
+    assert client.get("/transcript/export", params={"format": "srt"}).status_code == 400
+    assert client.get("/transcript/export", params={"doc_id": "unknown"}).status_code == 404
+    outside = tmp_path / "outside.mp4"
+    outside.write_bytes(b"x")
+    assert client.get("/transcript/export", params={"file_token": str(outside)}).status_code == 403
+    # A sibling whose name starts with the upload directory's is outside it too.
+    (tmp_path / "entrada-antiga").mkdir()
+    sibling = tmp_path / "entrada-antiga" / "linha.mp4"
+    sibling.write_bytes(b"video")
+    assert client.get("/transcript/export", params={"file_token": str(sibling)}).status_code == 403
@@ -0,0 +1,50 @@
+import asyncio
+import importlib
+import pytest
+from unittest.mock import MagicMock, patch
+from app.services.disk_cache import DiskCache
+
+# The tools package re-exports the function under the module's name.
+tool = importlib.import_module("app.create.subagents.transcription.tools.transcribe_video")
+
+@pytest.fixture
+def sandbox(tmp_path, monkeypatch):
+    (tmp_path / "entrada").mkdir()
+    monkeypatch.setattr(tool, "data_dir", str(tmp_path))
+    monkeypatch.setattr(tool, "transcript_cache", DiskCache(tmp_path / "cache", max_bytes=10_000))
+    info = MagicMock(language="pt", language_probability=0.99, duration=60.0, speech_seconds=None)
+    with patch.object(tool, "_run_transcription_sync", return_value=("texto transcrito", info)) as run:
+        yield tmp_path, run
+
+def test_same_content_under_new_name_hits_cache(sandbox):
+    tmp_path, run = sandbox
+    first = tmp_path / "entrada" / "treinamento.mp4"
+    renamed = tmp_path / "entrada" / "treinamento_v2.mp4"
+    first.write_bytes(b"video bytes")
+    renamed.write_bytes(b"video bytes")
+
+    assert asyncio.run(tool.transcribe_video(str(first))) == "texto transcrito"
+    assert asyncio.run(tool.transcribe_video(str(renamed))) == "texto transcrito"
+    assert run.call_count == 1
+
+def test_same_name_different_content_does_not_collide(sandbox):
+    tmp_path, run = sandbox
+    video = tmp_path / "entrada" / "treinamento.mp4"
+    video.write_bytes(b"first video")
+    asyncio.run(tool.transcribe_video(str(video)))
+
+    video.write_bytes(b"second, longer video")
+    asyncio.run(tool.transcribe_video(str(video)))
+
+    assert run.call_count == 2
+
+def test_only_media_inside_the_upload_directory_is_read(sandbox):
+    tmp_path, run = sandbox
+    sibling = tmp_path / "entrada_antiga"
+    sibling.mkdir()
+    (sibling / "video.mp4").write_bytes(b"video bytes")
+
+    assert tool.is_allowed_media_path(str(tmp_path / "entrada" / "objects" / "ab" / "video.mp4"))
+    assert not tool.is_allowed_media_path(str(sibling / "video.mp4"))
+    assert asyncio.run(tool.transcribe_video(str(sibling / "video.mp4"))).startswith("Error: Security Error")
+    assert run.call_count == 0
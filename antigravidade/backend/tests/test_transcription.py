@@ -1,11 +1,14 @@
 import pytest
 from unittest.mock import MagicMock, patch
 from app.services.transcription import TranscriptionService
+from app.services.whisper_pool import whisper_pool
 
 @pytest.fixture
 def mock_whisper():
-    with patch("app.services.transcription.WhisperModel") as mock:
+    whisper_pool.clear()
+    with patch("app.services.whisper_pool.WhisperModel") as mock:
         yield mock
+    whisper_pool.clear()
 
 def test_transcribe_audio_success(mock_whisper):
     # Setup mock
@@ -0,0 +1,41 @@
+import csv
+import wave
+
+from benchmarks import transcription_suite as suite
+
+
+def row(rtf, load=1.0, first=0.5, rss=300.0, **config):
+    base = {"fixture": "a.wav", "target": "tool", "model": "tiny", "compute_type": "int8", "beam_size": 5, "threads": 4}
+    return {**base, **config, "rtf": rtf, "load_seconds": load, "first_segment_seconds": first, "peak_rss_mb": rss}
+
+
+def test_compare_flags_only_metrics_beyond_tolerance():
+    baseline = {"results": [row(0.10), row(0.05, beam_size=1)]}
+    current = {"results": [row(0.12, rss=310.0), row(0.05, beam_size=1, first=None), row(0.5, model="small")]}
+
+    regressions = suite.compare_reports(baseline, current, tolerance=0.10)
+
+    # RTF grew 20% (flagged); RSS grew ~3% (within tolerance); new configurations have no baseline.
+    assert [(r["beam_size"], r["metric"]) for r in regressions] == [(5, "rtf")]
+    assert regressions[0]["change"] == 0.2
+
+
+def test_generated_fixture_is_16k_mono_wav(tmp_path, monkeypatch):
+    monkeypatch.setattr(suite, "FIXTURES_DIR", str(tmp_path))
+
+    path = suite.generate_fixture(3.0)
+
+    with wave.open(path) as file:
+        assert (file.getnchannels(), file.getframerate(), file.getnframes()) == (1, 16000, 48000)
+    assert suite.generate_fixture(3.0) == path
+
+
+def test_csv_report_has_one_line_per_configuration(tmp_path):
+    report = {"results": [{**row(0.1), "audio_seconds": 60.0, "decode_seconds": 6.0}]}
+    path = tmp_path / "report.csv"
+
+    suite.write_csv(report, str(path))
+
+    with open(path, newline="") as file:
+        rows = list(csv.DictReader(file))
+    assert rows[0]["rtf"] == "0.1" and rows[0]["model"] == "tiny"
@@ -0,0 +1,156 @@
+import asyncio
+import importlib
+from contextlib import contextmanager
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import numpy as np
+import pytest
+
+from app.services.disk_cache import DiskCache
+from app.services.speech_detection import SpeechPlan
+from app.services.transcription_checkpoint import TranscriptionCheckpoint, resume_prompt
+
+tool = importlib.import_module("app.create.subagents.transcription.tools.transcribe_video")
+
+PLAN = {"mode": "sequential", "model_size": "tiny"}
+
+
+def test_commit_and_load_round_trip(tmp_path):
+    checkpoint = TranscriptionCheckpoint(str(tmp_path / "a.jsonl"), PLAN)
+    checkpoint.commit({"seek": 0})
+    checkpoint.commit({"seek": 3000})
+
+    assert [unit["seek"] for unit in checkpoint.load()] == [0, 3000]
+    checkpoint.discard()
+    assert checkpoint.load() == []
+
+
+def test_journal_from_another_plan_is_ignored_and_replaced(tmp_path):
+    path = str(tmp_path / "a.jsonl")
+    TranscriptionCheckpoint(path, {"mode": "parallel"}).commit({"index": 0})
+
+    checkpoint = TranscriptionCheckpoint(path, PLAN)
+    assert checkpoint.load() == []
+    checkpoint.commit({"seek": 0})
+    assert checkpoint.load() == [{"seek": 0}]
+
+
+def test_torn_last_line_is_dropped(tmp_path):
+    path = tmp_path / "a.jsonl"
+    TranscriptionCheckpoint(str(path), PLAN).commit({"seek": 0})
+    with open(path, "a") as f:
+        f.write('{"seek": 30')
+
+    checkpoint = TranscriptionCheckpoint(str(path), PLAN)
+    assert checkpoint.load() == [{"seek": 0}]
+    checkpoint.commit({"seek": 3000})
+    assert checkpoint.load() == [{"seek": 0}, {"seek": 3000}]
+
+
+def test_resume_prompt_honours_prompt_resets():
+    units = [
+        {"temperature": 0.0, "segments": [{"tokens": [1, 2]}]},
+        {"temperature": 0.8, "segments": [{"tokens": [3]}]},
+        {"temperature": 0.2, "segments": [{"tokens": [4]}, {"tokens": [5]}]},
+    ]
+    assert resume_prompt(units) == [4, 5]
+
+
+class ContextModel:
+    """
+    Decodes 30 s windows like Whisper: each segment's text depends on the prompt
+    carried over from earlier windows, so a resume with the wrong context shows up
+    in the transcript. Optionally fails once after `fail_after` windows.
+    """
+    frames_per_second = 100
+
+    def __init__(self, duration, fail_after=None):
+        self.duration = duration
+        self.fail_after = fail_after
+        self.calls = []
+
+    def transcribe(self, audio, clip_timestamps=None, initial_prompt=None, language=None, **kwargs):
+        self.calls.append({"clip_timestamps": clip_timestamps, "initial_prompt": initial_prompt, "language": language})
+        info = MagicMock(language=language or "pt", language_probability=0.9, duration=self.duration)
+
+        def generate():
+            prompt = list(initial_prompt or [])
+            start = clip_timestamps[0] if clip_timestamps else 0.0
+            for window, offset in enumerate(np.arange(start, self.duration, 30.0)):
+                if self.fail_after is not None and window == self.fail_after:
+                    self.fail_after = None
+                    raise RuntimeError("decoder crashed")
+                for half in (0.0, 15.0):
+                    segment = MagicMock(seek=int(offset * 100), temperature=0.0)
+                    segment.start, segment.end = offset + half, offset + half + 15.0
+                    segment.text = f" [{offset + half:.0f}s ctx={sum(prompt[-4:])}]"
+                    segment.tokens = [int(offset + half) + 1]
+                    prompt.extend(segment.tokens)
+                    yield segment
+
+        return generate(), info
+
+
+@pytest.fixture
+def sandbox(tmp_path, monkeypatch):
+    (tmp_path / "entrada").mkdir()
+    video = tmp_path / "entrada" / "turno.mp4"
+    video.write_bytes(b"video")
+    monkeypatch.setattr(tool, "data_dir", str(tmp_path))
+    monkeypatch.setattr(tool, "transcript_cache", DiskCache(tmp_path / "cache", max_bytes=100_000))
+    monkeypatch.setattr(tool.settings, "TRANSCRIPTION_CHECKPOINT_DIR", tmp_path / "checkpoints")
+    monkeypatch.setattr(tool, "extract_audio", lambda path: path)
+    monkeypatch.setattr(tool, "load_audio", lambda path: np.zeros(150 * 16000, dtype=np.float32))
+    # The whole recording is speech; the VAD pre-pass keeps every sample.
+    monkeypatch.setattr(tool, "detect_speech", lambda audio: SpeechPlan([{"start": 0, "end": len(audio)}], len(audio) / 16000))
+    return video
+
+
+def pool_of(model):
+    pool = MagicMock()
+
+    @contextmanager
+    def acquire(*args):
+        yield model
+
+    pool.acquire = acquire
+    return pool
+
+
+def run_with(model, video, on_segment=None):
+    with patch.object(tool, "whisper_pool", pool_of(model)), patch.object(tool.asyncio, "sleep", AsyncMock()):
+        return asyncio.run(tool._transcribe(str(video), on_segment))
+
+
+def test_retry_resumes_from_last_committed_window(sandbox, tmp_path, monkeypatch):
+    uninterrupted = run_with(ContextModel(150.0), sandbox)
+    monkeypatch.setattr(tool, "transcript_cache", DiskCache(tmp_path / "cache-retry", max_bytes=100_000))
+    model = ContextModel(150.0, fail_after=3)
+    received = []
+    resumed = run_with(model, sandbox, received.append)
+
+    assert resumed == uninterrupted
+    # A window is committed once the next one starts producing segments, so the
+    # retry restarts at the third window with the prompt of the first two.
+    assert len(model.calls) == 2
+    assert model.calls[1]["clip_timestamps"] == [60.0]
+    assert model.calls[1]["initial_prompt"] == [1, 16, 31, 46]
+    assert model.calls[1]["language"] == "pt"
+    # The listener saw every segment exactly once, in order.
+    assert [segment["start"] for segment in received] == [float(s) for s in range(0, 150, 15)]
+    # Nothing is left to resume once the transcript is cached.
+    assert not list((tmp_path / "checkpoints").glob("*.jsonl"))
+
+
+def test_server_restart_resumes_from_checkpoint_on_disk(sandbox, tmp_path):
+    profile = tool.resolve_profile("balanced")
+    with patch.object(tool, "whisper_pool", pool_of(ContextModel(150.0, fail_after=4))), pytest.raises(RuntimeError):
+        tool._run_transcription_sync(str(sandbox), profile, None, "job-key")
+
+    # A new process picks the journal up by the same key.
+    fresh = ContextModel(150.0)
+    with patch.object(tool, "whisper_pool", pool_of(fresh)):
+        text, _ = tool._run_transcription_sync(str(sandbox), profile, None, "job-key")
+
+    assert fresh.calls[0]["clip_timestamps"] == [90.0]
+    assert text == run_with(ContextModel(150.0), sandbox)
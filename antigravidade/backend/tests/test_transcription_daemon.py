@@ -0,0 +1,179 @@
+import asyncio
+import importlib
+import os
+import socket
+import threading
+import time
+from multiprocessing.connection import AuthenticationError, Client
+from types import SimpleNamespace
+from unittest.mock import MagicMock, patch
+
+import pytest
+
+from app.services import transcription_daemon as daemon_module
+from app.services.transcription_daemon import (
+    DaemonBusyError,
+    DaemonSupervisor,
+    TranscriptionDaemon,
+    _authkey,
+    ping,
+    transcribe_remote,
+)
+
+tool = importlib.import_module("app.create.subagents.transcription.tools.transcribe_video")
+
+
+def fake_run_transcription(media_path, profile, on_segment=None, checkpoint_key=None):
+    for index in range(3):
+        if on_segment is not None:
+            on_segment({"start": index * 2.0, "end": index * 2.0 + 2.0, "text": f" s{index}", "progress": (index + 1) / 3})
+    return f"{profile.name}: s0 s1 s2", SimpleNamespace(language="pt", language_probability=0.9, duration=6.0, speech_seconds=None)
+
+
+def media(name):
+    return os.path.join(tool.data_dir, "entrada", name)
+
+
+def start_daemon(address, max_jobs=2):
+    daemon = TranscriptionDaemon(address, max_jobs=max_jobs)
+    threading.Thread(target=daemon.serve_forever, daemon=True).start()
+    for _ in range(100):
+        if ping(address) is not None:
+            return daemon
+        time.sleep(0.02)
+    raise RuntimeError("daemon did not start")
+
+
+@pytest.fixture
+def address(tmp_path):
+    path = str(tmp_path / "run" / "t.sock")
+    with patch.object(daemon_module.settings, "TRANSCRIPTION_DAEMON_ADDRESS", path), \
+         patch.object(daemon_module.settings, "TRANSCRIPTION_DAEMON_AUTHKEY", ""), \
+         patch.object(daemon_module.settings, "TRANSCRIPTION_DAEMON_AUTHKEY_FILE", tmp_path / "run" / "transcription.key"), \
+         patch.object(tool, "data_dir", str(tmp_path)):
+        yield path
+
+
+def test_streams_segments_and_result(address):
+    start_daemon(address)
+    received = []
+    with patch.object(tool, "_run_transcription_sync", fake_run_transcription):
+        text, info = transcribe_remote(media("video.mp4"), "fast", received.append)
+
+    assert text == "fast: s0 s1 s2"
+    assert info.language == "pt" and info.duration == 6.0
+    assert [segment["text"] for segment in received] == [" s0", " s1", " s2"]
+    assert received[-1]["progress"] == 1.0
+
+
+def test_rejects_jobs_beyond_capacity(address):
+    daemon = start_daemon(address, max_jobs=1)
+    release = threading.Event()
+
+    def slow(media_path, profile, on_segment=None, checkpoint_key=None):
+        release.wait(5)
+        return "done", SimpleNamespace(language="pt", language_probability=1.0, duration=1.0, speech_seconds=None)
+
+    with patch.object(tool, "_run_transcription_sync", slow):
+        first = threading.Thread(target=transcribe_remote, args=(media("a.mp4"), "fast"))
+        first.start()
+        for _ in range(100):
+            if daemon.stats()["active_jobs"]:
+                break
+            time.sleep(0.02)
+
+        with pytest.raises(DaemonBusyError):
+            transcribe_remote(media("b.mp4"), "fast")
+        release.set()
+        first.join(5)
+
+    health = ping(address)
+    assert health["jobs_rejected"] == 1
+    assert health["jobs_completed"] == 1
+
+
+def test_daemon_errors_reach_the_client(address):
+    start_daemon(address)
+    with patch.object(tool, "_run_transcription_sync", side_effect=RuntimeError("decode failed")):
+        with pytest.raises(RuntimeError, match="decode failed"):
+            transcribe_remote(media("video.mp4"), "fast")
+    # The connection handler survives the failure.
+    assert ping(address)["jobs_completed"] == 0
+
+
+def test_daemon_refuses_media_outside_the_upload_directory(address):
+    start_daemon(address)
+    with patch.object(tool, "_run_transcription_sync", side_effect=AssertionError("transcribed")):
+        with pytest.raises(RuntimeError, match="outside the allowed directory"):
+            transcribe_remote(os.path.join(tool.data_dir, "saida", "video.mp4"), "fast")
+
+
+def test_connections_need_the_generated_key(address):
+    key = _authkey()
+    key_file = daemon_module.settings.TRANSCRIPTION_DAEMON_AUTHKEY_FILE
+    assert _authkey() == key and len(key) == 64
+    assert os.stat(key_file).st_mode & 0o077 == 0
+    start_daemon(address)
+
+    with pytest.raises(AuthenticationError):
+        Client(address, family="AF_UNIX", authkey=b"not the key")
+    assert ping(address) is not None
+
+
+def test_a_stalled_handshake_does_not_block_other_clients(address):
+    start_daemon(address)
+
+    with patch.object(daemon_module, "HANDSHAKE_TIMEOUT_SECONDS", 0.5):
+        # Connects but never answers the challenge.
+        stalled = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        stalled.connect(address)
+        assert ping(address) is not None
+
+        # The daemon hangs up once the handshake times out.
+        stalled.settimeout(5)
+        while stalled.recv(1024):
+            pass
+        stalled.close()
+
+
+def test_ping_without_daemon_returns_none(address):
+    assert ping(address) is None
+
+
+def test_supervisor_spawns_and_restarts_dead_daemon(address):
+    supervisor = DaemonSupervisor(address)
+    process = MagicMock()
+    process.poll.return_value = None
+    with patch.object(daemon_module.subprocess, "Popen", return_value=process) as popen:
+        asyncio.run(supervisor.ensure_running())
+        assert popen.call_count == 1
+        # Still starting up: no second process.
+        asyncio.run(supervisor.ensure_running())
+        assert popen.call_count == 1
+
+        process.poll.return_value = 1
+        asyncio.run(supervisor.ensure_running())
+        assert popen.call_count == 2
+    assert supervisor.restarts == 1
+    assert supervisor.stats()["healthy"] is False
+
+
+def test_tool_routes_to_daemon_when_enabled(tmp_path):
+    video = tmp_path / "entrada" / "clip.mp4"
+    video.parent.mkdir()
+    video.write_bytes(b"video")
+    received = []
+    with patch.object(tool, "data_dir", str(tmp_path)), \
+         patch.object(tool.settings, "TRANSCRIPTION_DAEMON", True), \
+         patch.object(tool.transcript_cache, "get_text", return_value=None), \
+         patch.object(tool.transcript_cache, "put_text") as put_text, \
+         patch.object(tool.transcript_cache, "put"), \
+         patch.object(tool, "transcribe_remote", side_effect=lambda path, profile, cb, key: fake_run_transcription(path, SimpleNamespace(name=profile), cb)) as remote, \
+         patch.object(tool, "_run_transcription_sync") as local:
+        text = asyncio.run(tool._transcribe(str(video), received.append, "fast"))
+
+    assert text == "fast: s0 s1 s2"
+    assert remote.call_args[0][1] == "fast"
+    local.assert_not_called()
+    assert put_text.call_args_list[0][0][1] == text
+    assert len(received) == 3
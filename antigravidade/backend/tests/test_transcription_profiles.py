@@ -0,0 +1,62 @@
+import asyncio
+import importlib
+import pytest
+from unittest.mock import MagicMock, patch
+from app.core.config import settings
+from app.services.disk_cache import DiskCache
+from app.services.transcription_profiles import PROFILES, UnknownProfileError, resolve_profile
+
+tool = importlib.import_module("app.create.subagents.transcription.tools.transcribe_video")
+
+def test_named_profiles_are_returned_as_is():
+    assert resolve_profile("fast").beam_size == 1
+    assert resolve_profile("ACCURATE").model_size == "small"
+
+def test_default_profile_comes_from_settings(monkeypatch):
+    monkeypatch.setattr(settings, "WHISPER_PROFILE", "fast")
+    assert resolve_profile(None).name == "fast"
+
+def test_unknown_profile_is_rejected():
+    with pytest.raises(UnknownProfileError):
+        resolve_profile("turbo")
+
+def test_auto_picks_most_accurate_profile_that_meets_deadline(monkeypatch):
+    monkeypatch.setattr(settings, "TRANSCRIPTION_DEADLINE_SECONDS", 120)
+
+    assert resolve_profile("auto", duration=5 * 60).name == "accurate"
+    assert resolve_profile("auto", duration=15 * 60).name == "balanced"
+    assert resolve_profile("auto", duration=40 * 60).name == "fast"
+    # Two jobs already decoding triple the expected time.
+    assert resolve_profile("auto", duration=5 * 60, queue_load=2).name == "balanced"
+
+def test_auto_without_duration_is_balanced():
+    assert resolve_profile("auto").name == "balanced"
+
+@pytest.fixture
+def sandbox(tmp_path, monkeypatch):
+    (tmp_path / "entrada").mkdir()
+    video = tmp_path / "entrada" / "video.mp4"
+    video.write_bytes(b"video")
+    monkeypatch.setattr(tool, "data_dir", str(tmp_path))
+    monkeypatch.setattr(tool, "transcript_cache", DiskCache(tmp_path / "cache", max_bytes=10_000))
+    return video
+
+def test_transcribe_video_decodes_with_profile_settings(sandbox):
+    info = MagicMock(language="pt", language_probability=0.9, duration=60.0, speech_seconds=None)
+    with patch.object(tool, "_run_transcription_sync", return_value=("texto", info)) as run:
+        asyncio.run(tool._transcribe(str(sandbox), profile_name="fast"))
+
+    assert run.call_args.args[1] is PROFILES["fast"]
+
+def test_profiles_are_cached_separately(sandbox):
+    info = MagicMock(language="pt", language_probability=0.9, duration=60.0, speech_seconds=None)
+    with patch.object(tool, "_run_transcription_sync", return_value=("texto", info)) as run:
+        asyncio.run(tool._transcribe(str(sandbox), profile_name="fast"))
+        asyncio.run(tool._transcribe(str(sandbox), profile_name="accurate"))
+        asyncio.run(tool._transcribe(str(sandbox), profile_name="fast"))
+
+    assert run.call_count == 2
+
+def test_unknown_profile_is_reported_as_tool_error(sandbox):
+    result = asyncio.run(tool._transcribe(str(sandbox), profile_name="turbo"))
+    assert result.startswith("Error: Unknown transcription profile")
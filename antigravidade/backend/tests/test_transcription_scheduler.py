@@ -0,0 +1,150 @@
+import threading
+import numpy as np
+import pytest
+from contextlib import contextmanager
+from unittest.mock import MagicMock, patch
+from app.services import transcription_scheduler as scheduler_module
+from app.services.transcription_profiles import PROFILES
+from app.services.transcription_scheduler import TranscriptionScheduler
+
+PROFILE = PROFILES["balanced"]
+
+SAMPLE_RATE = 16000
+
+class FakePipeline:
+    """Returns one segment per clip whose text is the clip's (constant) sample value."""
+    calls = []
+
+    def __init__(self, model):
+        pass
+
+    def transcribe(self, audio, clip_timestamps, batch_size, **kwargs):
+        FakePipeline.calls.append(batch_size)
+        segments = []
+        for clip in clip_timestamps:
+            # Sample, then frame, as faster-whisper stamps the seek of a clip's segments.
+            start = int(clip["start"] * SAMPLE_RATE)
+            value = audio[int((clip["start"] + clip["end"]) / 2 * SAMPLE_RATE)]
+            segment = MagicMock(start=clip["start"], end=clip["end"], seek=int(start / SAMPLE_RATE * 100))
+            segment.text = f" {value:.0f}"
+            segments.append(segment)
+        return iter(segments), MagicMock(language="pt", language_probability=0.9)
+
+class FakePool:
+    @contextmanager
+    def acquire(self, *args):
+        yield MagicMock(frames_per_second=100)
+
+def write_audio(path, seconds, value):
+    np.full(int(seconds * SAMPLE_RATE), value, dtype=np.float32).tofile(path)
+    return str(path)
+
+def speech_every_10s(audio, options):
+    return [
+        {"start": start, "end": start + 5 * SAMPLE_RATE}
+        for start in range(0, len(audio) - 5 * SAMPLE_RATE + 1, 10 * SAMPLE_RATE)
+    ]
+
+@pytest.fixture(autouse=True)
+def fakes():
+    FakePipeline.calls = []
+    with patch.object(scheduler_module, "BatchedInferencePipeline", FakePipeline), \
+         patch.object(scheduler_module, "whisper_pool", FakePool()), \
+         patch.object(scheduler_module, "get_speech_timestamps", side_effect=speech_every_10s):
+        yield
+
+def test_single_job_keeps_original_timeline(tmp_path):
+    scheduler = TranscriptionScheduler(batch_size=8, max_wait_ms=10)
+    received = []
+
+    text, info = scheduler.transcribe(write_audio(tmp_path / "a.f32", 30, 7), PROFILE, on_segment=received.append)
+
+    assert [(s["start"], s["end"]) for s in received] == [(0.0, 5.0), (10.0, 15.0), (20.0, 25.0)]
+    assert text == "7 7 7"
+    assert info.duration == 30.0
+    assert received[-1]["progress"] == pytest.approx(25 / 30)
+
+def test_concurrent_jobs_share_batches_and_get_their_own_segments(tmp_path):
+    scheduler = TranscriptionScheduler(batch_size=6, max_wait_ms=300)
+    paths = [write_audio(tmp_path / f"{value}.f32", 30, value) for value in (1, 2)]
+    results = {}
+
+    def run(path):
+        results[path] = scheduler.transcribe(path, PROFILE)[0]
+
+    threads = [threading.Thread(target=run, args=(path,)) for path in paths]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(timeout=5)
+
+    assert results[paths[0]] == "1 1 1"
+    assert results[paths[1]] == "2 2 2"
+    # Six chunks from two jobs fit into a single batched call.
+    assert FakePipeline.calls == [6]
+
+    stats = scheduler.stats()
+    assert stats["batches"] == 1
+    assert stats["jobs_completed"] == 2
+    assert stats["queued_jobs"] == 0
+    assert stats["avg_batch_size"] == 6
+
+def test_batch_size_is_bounded(tmp_path):
+    scheduler = TranscriptionScheduler(batch_size=2, max_wait_ms=10)
+
+    text, _ = scheduler.transcribe(write_audio(tmp_path / "long.f32", 50, 3), PROFILE)
+
+    assert text == "3 3 3 3 3"
+    assert max(FakePipeline.calls) <= 2
+
+def test_decode_errors_reach_the_caller(tmp_path):
+    scheduler = TranscriptionScheduler(batch_size=2, max_wait_ms=10)
+
+    with patch.object(FakePipeline, "transcribe", side_effect=RuntimeError("decoder crashed")):
+        with pytest.raises(RuntimeError, match="decoder crashed"):
+            scheduler.transcribe(write_audio(tmp_path / "a.f32", 20, 1), PROFILE)
+
+def test_jobs_with_different_profiles_do_not_share_a_batch(tmp_path):
+    scheduler = TranscriptionScheduler(batch_size=8, max_wait_ms=300)
+    jobs = [
+        (write_audio(tmp_path / "1.f32", 20, 1), PROFILES["balanced"]),
+        (write_audio(tmp_path / "2.f32", 20, 2), PROFILES["fast"]),
+    ]
+    threads = [threading.Thread(target=scheduler.transcribe, args=job) for job in jobs]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(timeout=5)
+
+    assert sorted(FakePipeline.calls) == [2, 2]
+
+def test_chunks_whose_offset_rounds_down_a_frame_stay_with_their_job(tmp_path):
+    # The second chunk starts at sample 129760: faster-whisper stamps it with seek
+    # 810, while 129760 / 16000 * 100 rounds to 811.
+    scheduler = TranscriptionScheduler(batch_size=2, max_wait_ms=300)
+    paths = [write_audio(tmp_path / f"{value}.f32", 10, value) for value in (1, 2)]
+    results = {}
+
+    def run(path):
+        results[path] = scheduler.transcribe(path, PROFILE)[0]
+
+    with patch.object(scheduler_module, "get_speech_timestamps", return_value=[{"start": 0, "end": 129760}]):
+        threads = [threading.Thread(target=run, args=(path,)) for path in paths]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join(timeout=5)
+
+    assert FakePipeline.calls == [2]
+    assert results == {paths[0]: "1", paths[1]: "2"}
+
+def test_worker_survives_a_failure_outside_the_decode(tmp_path):
+    scheduler = TranscriptionScheduler(batch_size=2, max_wait_ms=10)
+    path = write_audio(tmp_path / "a.f32", 20, 4)
+
+    with patch.object(scheduler, "_take_batch", side_effect=RuntimeError("bad batch")):
+        with pytest.raises(RuntimeError, match="bad batch"):
+            scheduler.transcribe(path, PROFILE)
+
+    assert scheduler.transcribe(path, PROFILE)[0] == "4 4"
+    assert scheduler.stats()["queued_jobs"] == 0
@@ -0,0 +1,87 @@
+import asyncio
+import importlib
+import json
+import numpy as np
+import pytest
+from contextlib import contextmanager
+from unittest.mock import MagicMock, patch
+from app.services.disk_cache import DiskCache
+from app.services.speech_detection import SpeechPlan
+
+tool = importlib.import_module("app.create.subagents.transcription.tools.transcribe_video")
+
+def make_segment(start, end, text):
+    segment = MagicMock()
+    segment.start, segment.end, segment.text = start, end, text
+    # Whisper windows are 30 s (3000 frames); every segment carries its window's seek.
+    segment.seek, segment.temperature, segment.tokens = int(start // 30) * 3000, 0.0, [len(text)]
+    return segment
+
+class FakePool:
+    def __init__(self, segments, duration):
+        self.model = MagicMock(frames_per_second=100)
+        info = MagicMock(language="pt", language_probability=0.9, duration=duration)
+        self.model.transcribe.side_effect = lambda *args, **kwargs: (iter(segments), info)
+
+    @contextmanager
+    def acquire(self, *args):
+        yield self.model
+
+@pytest.fixture
+def sandbox(tmp_path, monkeypatch):
+    (tmp_path / "entrada").mkdir()
+    video = tmp_path / "entrada" / "linha.mp4"
+    video.write_bytes(b"video")
+    monkeypatch.setattr(tool, "data_dir", str(tmp_path))
+    monkeypatch.setattr(tool, "transcript_cache", DiskCache(tmp_path / "cache", max_bytes=10_000))
+    monkeypatch.setattr(tool.settings, "TRANSCRIPTION_CHECKPOINT_DIR", tmp_path / "checkpoints")
+    segments = [make_segment(0.0, 5.0, " Ligue a prensa."), make_segment(5.0, 10.0, " Aguarde o sinal.")]
+    monkeypatch.setattr(tool, "whisper_pool", FakePool(segments, duration=10.0))
+    monkeypatch.setattr(tool, "extract_audio", lambda path: path)
+    monkeypatch.setattr(tool, "load_audio", lambda path: np.zeros(10 * 16000, dtype=np.float32))
+    # The whole recording is speech; the VAD pre-pass keeps every sample.
+    monkeypatch.setattr(tool, "detect_speech", lambda audio: SpeechPlan([{"start": 0, "end": len(audio)}], len(audio) / 16000))
+    return video
+
+async def collect(video):
+    return [event async for event in tool.transcribe_video_stream(str(video))]
+
+def test_stream_yields_segments_then_result(sandbox):
+    events = asyncio.run(collect(sandbox))
+
+    assert [e["type"] for e in events] == ["segment", "segment", "result"]
+    assert events[0]["start"] == 0.0 and events[0]["end"] == 5.0
+    assert events[0]["progress"] == 0.5
+    assert events[1]["progress"] == 1.0
+    assert events[-1]["text"] == "Ligue a prensa. Aguarde o sinal."
+
+def test_stream_persists_transcript(sandbox):
+    asyncio.run(collect(sandbox))
+    # Served from cache the second time: no segments, same text.
+    events = asyncio.run(collect(sandbox))
+
+    assert events == [{"type": "result", "text": "Ligue a prensa. Aguarde o sinal."}]
+
+def test_pipeline_run_forwards_segments_before_structuring(sandbox):
+    from fastapi.testclient import TestClient
+    import app.server as server
+
+    async def fake_stage(*args, **kwargs):
+        yield {"type": "result", "text": "# Manual"}
+
+    with patch.object(server, "transcribe_video_stream", tool.transcribe_video_stream), \
+         patch.object(server, "run_adhoc_agent_stream", fake_stage), \
+         patch.object(server, "build_docx_from_markdown"), \
+         patch.object(server, "TRANSCRIPTS_DIR", str(sandbox.parent.parent)):
+        client = TestClient(server.app)
+        with client.stream("POST", "/pipeline/run", json={"doc_id": "stream-test", "file_token": str(sandbox)}) as response:
+            body = "".join(response.iter_text())
+
+    segment_events = [
+        json.loads(block.split("data: ", 1)[1])
+        for block in body.split("\n\n")
+        if block.startswith("event: transcript_segment")
+    ]
+    assert [e["text"] for e in segment_events] == [" Ligue a prensa.", " Aguarde o sinal."]
+    assert segment_events[-1]["progress"] == 25
+    assert body.index("transcript_segment") < body.index("STRUCTURING")
@@ -0,0 +1,99 @@
+import hashlib
+import os
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app import server
+from app.services.audio_extraction import audio_artifact_path
+from app.services.chunked_upload import ChunkedUploads
+from app.services.media_hash import file_sha256
+from app.services.upload_store import UploadStore, is_file_token
+
+VIDEO = b"video bytes" * 1000
+TOKEN = hashlib.sha256(VIDEO).hexdigest()
+
+
+@pytest.fixture
+def client(tmp_path, monkeypatch):
+    monkeypatch.setattr(server, "upload_store", UploadStore(tmp_path / "entrada"))
+    monkeypatch.setattr(server, "chunked_uploads", ChunkedUploads(tmp_path / "partial", chunk_size=1024, ttl_seconds=3600))
+    return TestClient(server.app)
+
+
+def upload(client, filename, data, doc_id):
+    response = client.post("/upload", files={"file": (filename, data)}, data={"doc_id": doc_id})
+    assert response.status_code == 200
+    return response.json()["file_token"]
+
+
+def test_same_content_is_stored_once_under_an_opaque_token(client):
+    first = upload(client, "linha.mp4", VIDEO, "doc-1")
+    second = upload(client, "copia.MP4", VIDEO, "doc-2")
+
+    assert first == second == TOKEN and is_file_token(first)
+    store = server.upload_store
+    path = store.path_for(TOKEN)
+    assert path.endswith(f"{TOKEN}.mp4")
+    assert store.refcount(TOKEN) == 2
+    stats = store.stats()
+    assert stats["files"] == 1 and stats["deduplicated"] == 1 and stats["bytes_saved"] == len(VIDEO)
+    # The digest computed while storing is reused instead of reading the file again.
+    assert file_sha256(path) == TOKEN
+
+
+def test_same_name_different_content_does_not_overwrite(client):
+    first = upload(client, "linha.mp4", VIDEO, "doc-1")
+    second = upload(client, "linha.mp4", b"other video", "doc-2")
+
+    assert first != second
+    with open(server.upload_store.path_for(first), "rb") as file:
+        assert file.read() == VIDEO
+
+
+def test_file_is_deleted_with_its_last_reference(client):
+    upload(client, "linha.mp4", VIDEO, "doc-1")
+    upload(client, "linha.mp4", VIDEO, "doc-2")
+    path = server.upload_store.path_for(TOKEN)
+    audio_path = audio_artifact_path(path)
+    os.makedirs(os.path.dirname(audio_path))
+    open(audio_path, "wb").close()
+
+    assert client.delete(f"/upload/{TOKEN}", params={"doc_id": "doc-1"}).json()["references"] == 1
+    assert os.path.exists(path)
+    assert client.delete(f"/upload/{TOKEN}", params={"doc_id": "doc-2"}).json()["references"] == 0
+    assert not os.path.exists(path) and not os.path.exists(audio_path)
+    assert server.upload_store.path_for(TOKEN) is None
+
+
+def test_known_content_completes_without_uploading(client):
+    upload(client, "linha.mp4", VIDEO, "doc-1")
+
+    response = client.post("/upload/sessions", json={"filename": "linha.mp4", "size": len(VIDEO), "sha256": TOKEN, "doc_id": "doc-2"})
+
+    assert response.status_code == 200
+    assert response.json()["complete"] is True and response.json()["file_token"] == TOKEN
+    assert server.upload_store.refcount(TOKEN) == 2
+
+
+def test_chunked_upload_hashes_while_streaming(client, monkeypatch):
+    session = client.post("/upload/sessions", json={"filename": "linha.mp4", "size": len(VIDEO), "doc_id": "doc-1"}).json()
+    for offset in range(0, len(VIDEO), 4096):
+        client.patch(f"/upload/sessions/{session['upload_id']}", content=VIDEO[offset:offset + 4096], headers={"Upload-Offset": str(offset)})
+    monkeypatch.setattr(server.chunked_uploads, "_file_sha256", lambda path: pytest.fail("file read again"))
+
+    finalized = client.post(f"/upload/sessions/{session['upload_id']}/finalize").json()
+
+    assert finalized["file_token"] == TOKEN
+    assert server.upload_store.refcount(TOKEN) == 1
+
+
+def test_unlinked_files_are_discarded_after_the_grace_period(tmp_path):
+    store = UploadStore(tmp_path)
+    writer = store.writer()
+    writer.write(VIDEO)
+    store.add(writer.path, writer.close(), "linha.mp4")
+
+    assert store.discard_orphans(3600) == 0
+    assert store.discard_orphans(0) == 1
+    assert store.path_for(TOKEN) is None
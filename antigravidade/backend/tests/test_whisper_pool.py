@@ -0,0 +1,90 @@
+import threading
+import pytest
+from unittest.mock import MagicMock, patch
+from app.services.whisper_pool import WhisperModelPool
+
+@pytest.fixture
+def mock_whisper():
+    with patch("app.services.whisper_pool.WhisperModel") as mock:
+        mock.side_effect = lambda *args, **kwargs: MagicMock()
+        yield mock
+
+def test_model_is_loaded_once_and_reused(mock_whisper):
+    pool = WhisperModelPool(max_instances=1)
+
+    with pool.acquire("tiny", "cpu", "int8") as first:
+        pass
+    with pool.acquire("tiny", "cpu", "int8") as second:
+        pass
+
+    assert first is second
+    mock_whisper.assert_called_once_with("tiny", device="cpu", compute_type="int8", cpu_threads=0, num_workers=1)
+
+    stats = pool.stats()["models"][0]
+    assert stats["loads"] == 1
+    assert stats["acquisitions"] == 2
+    assert stats["reuses"] == 1
+    assert stats["in_use"] == 0
+
+def test_models_are_keyed_by_settings(mock_whisper):
+    pool = WhisperModelPool(max_instances=1)
+
+    with pool.acquire("tiny", "cpu", "int8") as tiny:
+        pass
+    with pool.acquire("small", "cpu", "int8") as small:
+        pass
+
+    assert tiny is not small
+    assert mock_whisper.call_count == 2
+
+def test_pool_never_exceeds_max_instances(mock_whisper):
+    pool = WhisperModelPool(max_instances=2)
+    inside = threading.Barrier(2, timeout=5)
+    release = threading.Event()
+
+    def worker():
+        with pool.acquire("tiny", "cpu", "int8"):
+            inside.wait()
+            release.wait(timeout=5)
+
+    threads = [threading.Thread(target=worker) for _ in range(2)]
+    for t in threads:
+        t.start()
+
+    # A third caller must wait until one of the two instances is returned.
+    waiter_done = threading.Event()
+    def waiter():
+        with pool.acquire("tiny", "cpu", "int8"):
+            waiter_done.set()
+    third = threading.Thread(target=waiter)
+    third.start()
+
+    assert not waiter_done.wait(timeout=0.2)
+    release.set()
+    for t in threads + [third]:
+        t.join(timeout=5)
+
+    assert waiter_done.is_set()
+    assert mock_whisper.call_count == 2
+
+def test_failed_load_releases_slot(mock_whisper):
+    pool = WhisperModelPool(max_instances=1)
+    mock_whisper.side_effect = [RuntimeError("download failed"), MagicMock()]
+
+    with pytest.raises(RuntimeError):
+        with pool.acquire("tiny", "cpu", "int8"):
+            pass
+
+    with pool.acquire("tiny", "cpu", "int8") as model:
+        assert model is not None
+
+def test_warm_up_preloads_instances(mock_whisper):
+    pool = WhisperModelPool(max_instances=2)
+    pool.warm_up("tiny", "cpu", "int8", instances=2)
+
+    assert mock_whisper.call_count == 2
+    with pool.acquire("tiny", "cpu", "int8"):
+        pass
+    stats = pool.stats()["models"][0]
+    assert stats["instances"] == 2
+    assert stats["reuses"] == 1